@@ -11,6 +11,8 @@ sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 from utils.base_api_connection import CoinbaseConnection, TaapiConnection
 from utils.db import log_trade, get_params, set_param
+from utils.indicators import LocalIndicatorEngine
+from utils.websocket_client import get_realtime_price, is_feed_fresh
 from utils.sentiment import get_combined_sentiment
 
 class Bot1(threading.Thread):
@@ -37,6 +39,8 @@ class Bot1(threading.Thread):
         # Initialize API connections using new pattern
         self.coinbase = CoinbaseConnection()
         self.taapi = TaapiConnection()
+        self.indicators = LocalIndicatorEngine(fallback=self.taapi)  # TAAPI only when local history is missing
+        self.indicators.declare('bot1', '1h', ['rsi', 'macd', 'bbands'])
         
         # Verify connections
         if not self.coinbase.is_connected:
@@ -76,6 +80,12 @@ class Bot1(threading.Thread):
             # Convert format: BTC/USD -> BTC-USD
             product_id = coin.replace('/', '-')
             
+            # Prefer the WebSocket feed while it passes the staleness guard
+            if is_feed_fresh(coin):
+                price = get_realtime_price(coin)
+                if price:
+                    return price
+            
             # Try direct API call
             if self.exchange:
                 try:
@@ -107,18 +117,18 @@ class Bot1(threading.Thread):
             indicators = {}
             
             # Get RSI
-            rsi_data = self.taapi.get_indicator('rsi', 'binance', symbol, '1h')
+            rsi_data = self.indicators.get_indicator('rsi', 'binance', symbol, '1h')
             if rsi_data and 'value' in rsi_data:
                 indicators['rsi'] = rsi_data['value']
             
             # Get MACD
-            macd_data = self.taapi.get_indicator('macd', 'binance', symbol, '1h')
+            macd_data = self.indicators.get_indicator('macd', 'binance', symbol, '1h')
             if macd_data:
                 indicators['macd'] = macd_data.get('valueMACD', 0)
                 indicators['macd_signal'] = macd_data.get('valueMACDSignal', 0)
                 
             # Get Bollinger Bands
-            bb_data = self.taapi.get_indicator('bbands', 'binance', symbol, '1h')
+            bb_data = self.indicators.get_indicator('bbands', 'binance', symbol, '1h')
             if bb_data:
                 indicators['bb_upper'] = bb_data.get('valueUpperBand', 0)
                 indicators['bb_lower'] = bb_data.get('valueLowerBand', 0)
@@ -10,7 +10,13 @@ sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 from utils.base_api_connection import CoinbaseConnection, TaapiConnection
 from utils.db import log_trade, get_params, set_param
+from utils.indicators import LocalIndicatorEngine
+from utils.websocket_client import get_realtime_price, is_feed_fresh
 from utils.sentiment import get_twitter_sentiment, get_combined_sentiment
+from utils.microstructure import feature_engine
+
+# Order-flow gate: |trade_imbalance| above this is one-sided flow, not noise to fade
+MAX_TRADE_IMBALANCE = 0.6
 
 class Bot2(threading.Thread):
     """
@@ -40,6 +46,8 @@ class Bot2(threading.Thread):
         # Initialize API connections using new pattern
         self.coinbase = CoinbaseConnection()
         self.taapi = TaapiConnection()
+        self.indicators = LocalIndicatorEngine(fallback=self.taapi)  # TAAPI only when local history is missing
+        self.indicators.declare('bot2', '15m', [('bbands', {'period': 20, 'stddev': 2}), ('atr', {'period': 14})])
         
         # Verify connections
         if not self.coinbase.is_connected:
@@ -95,6 +103,12 @@ class Bot2(threading.Thread):
             # Convert format: SOL/USD -> SOL-USD
             product_id = coin.replace('/', '-')
             
+            # Prefer the WebSocket feed while it passes the staleness guard
+            if is_feed_fresh(coin):
+                price = get_realtime_price(coin)
+                if price:
+                    return price
+            
             # Try direct API call
             if self.exchange:
                 try:
@@ -124,7 +138,7 @@ class Bot2(threading.Thread):
             symbol = coin  # Already in correct format
             
             # Get BB data
-            bb_data = self.taapi.get_indicator('bbands', 'binance', symbol, '15m', period=20, stddev=2)
+            bb_data = self.indicators.get_indicator('bbands', 'binance', symbol, '15m', period=20, stddev=2)
             
             if bb_data:
                 return {
@@ -142,7 +156,7 @@ class Bot2(threading.Thread):
         """Get ATR (Average True Range) for volatility filter"""
         try:
             symbol = coin
-            atr_data = self.taapi.get_indicator('atr', 'binance', symbol, '15m', period=14)
+            atr_data = self.indicators.get_indicator('atr', 'binance', symbol, '15m', period=14)
             
             if atr_data and 'value' in atr_data:
                 return atr_data['value']
@@ -170,6 +184,13 @@ class Bot2(threading.Thread):
             if atr == 0:
                 return
                 
+            # Don't fade a breakout: skip while volume is surging or one-sided
+            micro = feature_engine.get_features(coin)
+            if micro['volume_surge'] or abs(micro['trade_imbalance']) > MAX_TRADE_IMBALANCE:
+                log_trade('bot2', 'info', f"Skipping {coin} - order flow not mean-reverting "
+                         f"(volume ratio {micro['volume_ratio']:.2f}, imbalance {micro['trade_imbalance']:.2f})")
+                return
+                
             # Calculate band width for volatility
             band_width = (bb['upper'] - bb['lower']) / bb['middle']
             
@@ -12,6 +12,16 @@ sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 from utils.base_api_connection import CoinbaseConnection, TaapiConnection
 from utils.db import log_trade, get_params, set_param
+from utils.indicators import LocalIndicatorEngine
+from utils.taapi_batcher import taapi_batcher
+from utils.websocket_client import get_realtime_price, is_feed_fresh
+from utils.microstructure import feature_engine, FEATURE_NAMES
+
+# Model inputs in a fixed order; missing values become 0 after nan_to_num
+INDICATOR_FEATURES = ('rsi', 'macd', 'macd_signal', 'macd_hist', 'bb_upper', 'bb_middle', 'bb_lower',
+                      'bb_position', 'stoch_k', 'stoch_d', 'atr')
+FEATURE_KEYS = INDICATOR_FEATURES + tuple(f'ms_{name}' for name in FEATURE_NAMES)
+MIN_INDICATOR_FEATURES = 5  # Skip the cycle when most indicator lookups failed
 
 class Bot4(threading.Thread):
     """
@@ -43,6 +53,9 @@ class Bot4(threading.Thread):
         # Initialize API connections using new pattern
         self.coinbase = CoinbaseConnection()
         self.taapi = TaapiConnection()
+        # TAAPI only when local history is missing, batched into /bulk calls
+        self.indicators = LocalIndicatorEngine(fallback=taapi_batcher)
+        self.indicators.declare('bot4', '30m', ['rsi', 'macd', 'bbands', 'stoch', 'atr'])
         
         # Verify connections
         if not self.coinbase.is_connected:
@@ -92,6 +105,12 @@ class Bot4(threading.Thread):
             # Convert format: BTC/USD -> BTC-USD
             product_id = coin.replace('/', '-')
             
+            # Prefer the WebSocket feed while it passes the staleness guard
+            if is_feed_fresh(coin):
+                price = get_realtime_price(coin)
+                if price:
+                    return price
+            
             # Try direct API call
             if self.exchange:
                 try:
@@ -120,20 +139,24 @@ class Bot4(threading.Thread):
             symbol = coin
             features = {}
             
+            # Submit every indicator before waiting so TAAPI misses share one bulk request
+            pending = {name: self.indicators.submit(name, 'binance', symbol, '30m')
+                       for name in ('rsi', 'macd', 'bbands', 'stoch', 'atr')}
+            
             # Get RSI
-            rsi_data = self.taapi.get_indicator('rsi', 'binance', symbol, '30m')
+            rsi_data = pending['rsi'].result()
             if rsi_data and 'value' in rsi_data:
                 features['rsi'] = rsi_data['value']
             
             # Get MACD
-            macd_data = self.taapi.get_indicator('macd', 'binance', symbol, '30m')
+            macd_data = pending['macd'].result()
             if macd_data:
                 features['macd'] = macd_data.get('valueMACD', 0)
                 features['macd_signal'] = macd_data.get('valueMACDSignal', 0)
                 features['macd_hist'] = features['macd'] - features['macd_signal']
             
             # Get Bollinger Bands
-            bb_data = self.taapi.get_indicator('bbands', 'binance', symbol, '30m')
+            bb_data = pending['bbands'].result()
             if bb_data:
                 features['bb_upper'] = bb_data.get('valueUpperBand', 0)
                 features['bb_middle'] = bb_data.get('valueMiddleBand', 0)
@@ -147,28 +170,41 @@ class Bot4(threading.Thread):
                     features['bb_position'] = 0.5
             
             # Get Stochastic
-            stoch_data = self.taapi.get_indicator('stoch', 'binance', symbol, '30m')
+            stoch_data = pending['stoch'].result()
             if stoch_data:
                 features['stoch_k'] = stoch_data.get('valueK', 50)
                 features['stoch_d'] = stoch_data.get('valueD', 50)
             
             # Get ATR for volatility
-            atr_data = self.taapi.get_indicator('atr', 'binance', symbol, '30m')
+            atr_data = pending['atr'].result()
             if atr_data and 'value' in atr_data:
                 features['atr'] = atr_data['value']
                 
+            if len(features) < MIN_INDICATOR_FEATURES:
+                return {}
+                
+            # Order-flow features from the live feed, once it has seen trades for this coin
+            if feature_engine.has_trades(coin):
+                micro = feature_engine.get_vector(coin)
+                for name, value in zip(FEATURE_NAMES, micro.tolist()):
+                    features[f'ms_{name}'] = value
+                
             return features
             
         except Exception as e:
             log_trade('bot4', 'error', f"Error getting features for {coin}: {str(e)}")
             return {}
     
+    def feature_vector(self, features: dict) -> list:
+        """Features in FEATURE_KEYS order so training and prediction rows line up"""
+        return [features.get(key, np.nan) for key in FEATURE_KEYS]
+    
     def collect_training_data(self):
         """Collect features and labels for training"""
         try:
             for coin in self.coins:
                 features = self.get_features(coin)
-                if len(features) >= 5:  # Ensure we have enough features
+                if features:  # Empty when too few indicators were available
                     # Get current price
                     current_price = self.get_current_price(coin)
                     
@@ -205,7 +241,7 @@ class Bot4(threading.Thread):
                     label = 1 if price_change > 0.005 else 0
                     
                     labeled_data.append({
-                        'features': list(current['features'].values()),
+                        'features': self.feature_vector(current['features']),
                         'label': label
                     })
             
@@ -239,11 +275,11 @@ class Bot4(threading.Thread):
         try:
             # Get current features
             features = self.get_features(coin)
-            if len(features) < 5:
+            if not features:
                 return
                 
             # Prepare features for prediction
-            X = np.array([list(features.values())])
+            X = np.array([self.feature_vector(features)])
             X = np.nan_to_num(X)
             X_scaled = self.scaler.transform(X)
             
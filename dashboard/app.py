@@ -807,6 +807,49 @@ def get_status():
         'coinbase_balance': coinbase_balance
     })
 
+@app.route('/feed_health', methods=['GET'])
+def feed_health():
+    """WebSocket feed latency and health per product"""
+    if 'user' not in session:
+        return jsonify({'error': 'Unauthorized'}), 401
+    
+    from utils.websocket_client import coinbase_ws
+    status = coinbase_ws.telemetry.get_status()
+    status['connected'] = coinbase_ws.connected
+    for product_id, stats in status['products'].items():
+        stats['stale'] = coinbase_ws.telemetry.is_stale(product_id)
+    return jsonify(status)
+
+@app.route('/taapi_cache', methods=['GET'])
+def taapi_cache_stats():
+    """TAAPI response cache hit/miss counters"""
+    if 'user' not in session:
+        return jsonify({'error': 'Unauthorized'}), 401
+    
+    from utils.taapi_cache import taapi_cache
+    return jsonify(taapi_cache.get_stats())
+
+@app.route('/rate_limits', methods=['GET'])
+def rate_limits():
+    """Rate limit buckets (cached snapshot), learned rates and lease counters"""
+    if 'user' not in session:
+        return jsonify({'error': 'Unauthorized'}), 401
+    
+    from utils.rate_limiter import rate_limiter
+    return jsonify({
+        'limits': rate_limiter.get_limits_status(),
+        'learned_rates': rate_limiter.get_learned_rates(),
+        'leases': rate_limiter.get_lease_stats()
+    })
+
+@app.route('/metrics', methods=['GET'])
+def metrics():
+    """Prometheus scrape endpoint for feed telemetry"""
+    from utils.websocket_client import coinbase_ws
+    body = coinbase_ws.telemetry.to_prometheus()
+    body += f"# TYPE goat_feed_connected gauge\ngoat_feed_connected {int(coinbase_ws.connected)}\n"
+    return app.response_class(body, mimetype='text/plain; version=0.0.4')
+
 @app.route('/api-settings', methods=['GET', 'POST'])
 def api_settings():
     """API Settings page for managing API keys"""
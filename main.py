@@ -10,6 +10,10 @@ load_dotenv()
 from utils.db import init_db
 from utils.env_loader import load_all_env_keys
 from utils.optimization import weekly_reallocate, check_bot_active
+from utils.websocket_client import coinbase_ws
+from utils.candle_history import candle_history
+from utils.indicator_graph import indicator_graph
+from utils.rate_limiter import rate_limiter
 
 # Import bots
 from bots.bot1 import Bot1
@@ -43,9 +47,17 @@ def start_bots():
                 thread.daemon = True  # Daemon threads will exit when main program exits
                 bot_threads[bot_id] = thread
                 thread.start()
+                # Stream market data for the coins this bot trades
+                coinbase_ws.acquire_products(bot.coins)
                 print(f"Started {bot_id} in thread {thread.name}")
             else:
                 print(f"Skipped {bot_id} - marked as inactive")
+        
+        # Backfill candle history once, then keep each (coin, interval) tail current
+        candle_history.start((coin, interval)
+                             for bot_id in bot_threads
+                             for coin in bot_instances[bot_id].coins
+                             for interval in indicator_graph.intervals(bot_id))
             
     except Exception as e:
         print(f"Error starting bots: {str(e)}")
@@ -93,6 +105,10 @@ def stop_bots():
     """Stop all running bot instances."""
     for bot_id, bot in bot_instances.items():
         bot.stop()
+        if bot_id in bot_threads:
+            coinbase_ws.release_products(bot.coins)
+    candle_history.stop()
+    rate_limiter.release_leases()
     print("All bots stopped.")
 
 def main():
@@ -119,15 +135,56 @@ def main():
     
     print("\n✓ All required API keys found")
     
-    # Start WebSocket for real-time data
-    print("\nStarting WebSocket connection...")
-    try:
-        from utils.websocket_client import start_websocket
-        start_websocket()
-        print("✓ WebSocket connected for real-time data")
-    except Exception as e:
-        print(f"Warning: WebSocket connection failed: {str(e)}")
-        print("Bots will use API polling as fallback")
+    # Restore market state from the last run so bots don't start blind
+    from utils.market_snapshot import market_snapshotter
+    from utils.microstructure import feature_engine
+    from utils.streaming_indicators import streaming_indicators
+    bus_mode = os.getenv('MARKET_DATA_BUS', '').lower()
+    if bus_mode != 'subscribe':
+        # Only the feed host refreshes socket prices and order-flow state after a restore
+        market_snapshotter.register('websocket', coinbase_ws.get_market_state, coinbase_ws.load_market_state)
+        market_snapshotter.register('microstructure', feature_engine.get_state, feature_engine.load_state)
+    market_snapshotter.register('indicators', streaming_indicators.get_state, streaming_indicators.load_state)
+    if market_snapshotter.restore():
+        print("✓ Restored market state snapshot")
+    
+    # Start WebSocket for real-time data, or read it from another host via Redis
+    if bus_mode == 'subscribe':
+        print("\nSubscribing to Redis market data bus...")
+        try:
+            from utils.market_data_bus import start_subscriber
+            start_subscriber()
+            print("✓ Market data bus subscribed for real-time data")
+        except Exception as e:
+            print(f"Warning: Market data bus subscription failed: {str(e)}")
+            print("Bots will use API polling as fallback")
+    else:
+        print("\nStarting WebSocket connection...")
+        try:
+            from utils.websocket_client import start_websocket
+            from utils.candle_store import candle_store
+            feature_engine.attach(coinbase_ws)
+            from utils.resampler import resampler
+            coinbase_ws.register_callback('candle', candle_store.on_candle)
+            coinbase_ws.register_callback('candle', streaming_indicators.on_candle)
+            # Higher timeframes are built from the 1m closes and feed the same streams
+            coinbase_ws.register_callback('candle', resampler.on_candle)
+            resampler.register_callback(streaming_indicators.on_candle)
+            start_websocket()
+            print("✓ WebSocket connected for real-time data")
+        except Exception as e:
+            print(f"Warning: WebSocket connection failed: {str(e)}")
+            print("Bots will use API polling as fallback")
+        
+        if bus_mode == 'publish':
+            try:
+                from utils.market_data_bus import start_publisher
+                start_publisher()
+                print("✓ Publishing market data to Redis")
+            except Exception as e:
+                print(f"Warning: Market data bus publisher failed: {str(e)}")
+    
+    market_snapshotter.start()
     
     # Start bots in background threads
     print("\nStarting trading bots...")
@@ -169,6 +226,9 @@ def main():
     except KeyboardInterrupt:
         print("\n\nShutting down...")
         stop_bots()
+        market_snapshotter.stop()
+        from utils.market_data_bus import stop_market_data_bus
+        stop_market_data_bus()
         from utils.websocket_client import stop_websocket
         stop_websocket()
         print("Goodbye!")
@@ -0,0 +1,46 @@
+#!/usr/bin/env python3
+"""
+Backfill Coinbase candles for a date range into the local candle store
+Usage: python scripts/backfill_candles.py BTC/USD ETH/USD --interval 1m --start 2024-01-01 [--end 2024-06-01] [--workers 8]
+"""
+import argparse
+import os
+import sys
+from datetime import datetime, timezone
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.db import init_db
+from utils.candle_backfill import RangeBackfill
+
+
+def parse_date(value: str) -> int:
+    """YYYY-MM-DD[THH:MM] (UTC) -> unix seconds"""
+    return int(datetime.fromisoformat(value).replace(tzinfo=timezone.utc).timestamp())
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('symbols', nargs='+')
+    parser.add_argument('--interval', default='1m')
+    parser.add_argument('--start', required=True, type=parse_date)
+    parser.add_argument('--end', type=parse_date, default=int(datetime.now(timezone.utc).timestamp()))
+    parser.add_argument('--workers', type=int, default=8)
+    args = parser.parse_args()
+
+    init_db()
+
+    def progress(stats):
+        done = stats['fetched'] + stats['failed']
+        print(f"\r{done}/{stats['chunks']} chunks  {stats['candles_per_second']:,.0f} candles/s",
+              end='', flush=True)
+
+    stats = RangeBackfill(workers=args.workers).run(args.symbols, args.interval, args.start, args.end, progress)
+    print(f"\nWrote {stats['candles']:,} candles in {stats['seconds']:.1f}s "
+          f"({stats['candles_per_second']:,.0f} candles/s); "
+          f"{stats['skipped']} chunks already done, {stats['failed']} failed")
+    return 1 if stats['failed'] else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,68 @@
+#!/usr/bin/env python3
+"""
+Benchmark batched (symbols x time) indicators against a per-symbol loop
+Usage: python scripts/benchmark_indicators.py [--candles 500] [--repeat 5]
+"""
+import argparse
+import os
+import sys
+import time
+import numpy as np
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils import indicators
+
+INDICATORS = ['rsi', 'macd', 'bbands', 'atr', 'stoch', 'sma', 'ema']
+SYMBOL_COUNTS = [10, 100, 500]
+
+
+def make_matrix(symbols: int, candles: int, seed: int = 0) -> dict:
+    """Random-walk OHLCV with a NaN-padded warmup on a quarter of the rows"""
+    rng = np.random.default_rng(seed)
+    close = 100 * np.exp(np.cumsum(rng.normal(0, 0.01, (symbols, candles)), axis=1))
+    open_ = np.concatenate([close[:, :1], close[:, :-1]], axis=1)
+    matrix = {
+        'open': open_,
+        'high': np.maximum(open_, close) * (1 + rng.uniform(0, 0.005, close.shape)),
+        'low': np.minimum(open_, close) * (1 - rng.uniform(0, 0.005, close.shape)),
+        'close': close,
+        'volume': rng.uniform(1, 10, close.shape)
+    }
+    # Newly listed symbols: shorter history
+    for row in range(0, symbols, 4):
+        missing = rng.integers(0, candles // 2)
+        for values in matrix.values():
+            values[row, :missing] = np.nan
+    return matrix
+
+
+def best_of(fn, repeat: int) -> float:
+    """Fastest wall time of repeat runs, in seconds"""
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - start)
+    return min(times)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--candles', type=int, default=500)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    print(f"{'symbols':>8} {'indicator':>10} {'batched ms':>11} {'loop ms':>9} {'speedup':>8}")
+    print("-" * 50)
+    for symbols in SYMBOL_COUNTS:
+        matrix = make_matrix(symbols, args.candles)
+        rows = [{field: values[row] for field, values in matrix.items()} for row in range(symbols)]
+        for name in INDICATORS:
+            batched = best_of(lambda: indicators.latest_rows(indicators.compute(name, matrix)), args.repeat)
+            loop = best_of(lambda: [indicators.latest(indicators.compute(name, row)) for row in rows], args.repeat)
+            print(f"{symbols:>8} {name:>10} {batched * 1000:>11.2f} {loop * 1000:>9.2f} {loop / batched:>7.1f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -16,6 +16,7 @@ sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(
 
 from utils.base_api_connection import get_api_connection
 from utils.db import init_db, get_params, set_param
+from utils.price_board import get_price_board
 
 # Load environment variables
 load_dotenv()
@@ -322,17 +323,27 @@ def reconnect_api(api_name):
 # WebSocket data endpoint (for real-time updates)
 @app.route('/api/ws/data')
 def get_websocket_data():
-    """Get latest WebSocket data"""
+    """Get latest WebSocket data from the shared price board"""
     try:
-        # In production, this would return actual WebSocket data
+        board = get_price_board()
+        if not board:
+            return jsonify({
+                'success': False,
+                'error': 'Price board not available - is the feed process running?'
+            }), 503
+            
+        prices = {}
+        tickers = {}
+        for product_id, ticker in board.snapshot().items():
+            symbol = product_id.replace('-', '/')
+            prices[symbol] = ticker['price']
+            tickers[symbol] = ticker
+            
         return jsonify({
             'success': True,
             'data': {
-                'prices': {
-                    'BTC/USD': 43250.50,
-                    'ETH/USD': 2350.75,
-                    'SOL/USD': 98.30
-                },
+                'prices': prices,
+                'tickers': tickers,
                 'timestamp': datetime.now().isoformat()
             }
         })
@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+"""
+Bot decision tests (no network; bots are built without their API connections)
+Run with: python -m pytest test_bots.py
+"""
+import os
+import sys
+from concurrent.futures import Future
+import pytest
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+pytest.importorskip('pandas')
+
+from utils.db import init_db
+from utils.microstructure import MicrostructureEngine
+
+init_db()  # Bots log decisions via log_trade
+
+INDICATOR_VALUES = {
+    'rsi': {'value': 40.0},
+    'macd': {'valueMACD': 1.0, 'valueMACDSignal': 0.5},
+    'bbands': {'valueUpperBand': 110.0, 'valueMiddleBand': 100.0, 'valueLowerBand': 90.0},
+    'stoch': {'valueK': 30.0, 'valueD': 35.0},
+    'atr': {'value': 2.0}
+}
+
+
+class FakeIndicators:
+    """LocalIndicatorEngine stand-in serving fixed values; names in `missing` resolve to None"""
+
+    def __init__(self, missing=()):
+        self.missing = set(missing)
+
+    def submit(self, indicator, exchange, symbol, interval, **params):
+        future = Future()
+        future.set_result(None if indicator in self.missing else INDICATOR_VALUES[indicator])
+        return future
+
+
+def make_bot4(monkeypatch, missing=()):
+    pytest.importorskip('sklearn')
+    from bots import bot4
+    engine = MicrostructureEngine()
+    monkeypatch.setattr(bot4, 'feature_engine', engine)
+    bot = bot4.Bot4.__new__(bot4.Bot4)
+    bot.indicators = FakeIndicators(missing)
+    bot.get_current_price = lambda coin: 100.0
+    return bot, engine, bot4
+
+
+def test_bot4_skips_cycle_without_indicators_even_with_order_flow(monkeypatch):
+    bot, engine, _ = make_bot4(monkeypatch, missing=('macd', 'bbands', 'stoch', 'atr'))
+    engine.on_trade('BTC-USD', 1.0, 100.0, 1.0, 1)
+    assert bot.get_features('BTC/USD') == {}
+
+
+def test_bot4_adds_order_flow_only_after_trades(monkeypatch):
+    bot, engine, _ = make_bot4(monkeypatch)
+    features = bot.get_features('BTC/USD')
+    assert features and not any(key.startswith('ms_') for key in features)
+    engine.on_trade('BTC-USD', 1.0, 100.0, 1.0, 1)
+    assert any(key.startswith('ms_') for key in bot.get_features('BTC/USD'))
+
+
+def test_bot4_feature_vector_has_fixed_order(monkeypatch):
+    bot, engine, bot4 = make_bot4(monkeypatch)
+    without_flow = bot.feature_vector(bot.get_features('BTC/USD'))
+    engine.on_trade('BTC-USD', 1.0, 100.0, 1.0, 1)
+    with_flow = bot.feature_vector(dict(reversed(list(bot.get_features('BTC/USD').items()))))
+    assert len(without_flow) == len(with_flow) == len(bot4.FEATURE_KEYS)
+    assert without_flow[0] == with_flow[0] == 40.0  # rsi leads regardless of dict order
+
+
+class FakeOrderFlow:
+    """MicrostructureEngine stand-in returning fixed features"""
+
+    def __init__(self, **features):
+        self.features = dict({'volume_surge': 0.0, 'volume_ratio': 1.0, 'trade_imbalance': 0.0}, **features)
+
+    def get_features(self, coin):
+        return dict(self.features)
+
+
+def bot2_module():
+    pytest.importorskip('praw')  # Bot2's sentiment imports
+    pytest.importorskip('vaderSentiment')
+    from bots import bot2
+    return bot2
+
+
+def make_bot2(monkeypatch, **flow):
+    bot2 = bot2_module()
+    monkeypatch.setattr(bot2, 'feature_engine', FakeOrderFlow(**flow))
+    bot = bot2.Bot2.__new__(bot2.Bot2)
+    bot.trades = []
+    bot.get_current_price = lambda coin: 96.0  # At the lower band
+    bot.get_bollinger_bands = lambda coin: {'upper': 104.0, 'middle': 100.0, 'lower': 96.0}
+    bot.get_atr = lambda coin: 1.0
+    bot.execute_trade = lambda coin, action, price, bb: bot.trades.append(action)
+    return bot
+
+
+def test_bot2_fades_balanced_flow(monkeypatch):
+    bot = make_bot2(monkeypatch, trade_imbalance=bot2_module().MAX_TRADE_IMBALANCE - 0.1)
+    bot.check_mean_reversion('SOL/USD')
+    assert bot.trades == ['buy']
+
+
+def test_bot2_skips_one_sided_flow(monkeypatch):
+    limit = bot2_module().MAX_TRADE_IMBALANCE
+    for imbalance in (limit + 0.1, -limit - 0.1):
+        bot = make_bot2(monkeypatch, trade_imbalance=imbalance)
+        bot.check_mean_reversion('SOL/USD')
+        assert bot.trades == []
+
+
+def test_bot2_skips_volume_surge(monkeypatch):
+    bot = make_bot2(monkeypatch, volume_surge=1.0)
+    bot.check_mean_reversion('SOL/USD')
+    assert bot.trades == []
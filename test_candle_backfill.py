@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+"""
+Range backfill tests (no network)
+Run with: python -m pytest test_candle_backfill.py
+"""
+import os
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from utils.db import init_db
+from utils.candle_store import CandleStore
+from utils.candle_backfill import RangeBackfill
+
+init_db()  # Backfill summaries are logged via log_trade
+
+START = 1_600_000_000 // 60 * 60
+
+
+class FakeCoinbase:
+    candle_page_size = 300
+    candle_granularities = (60, 300, 900, 3600, 21600, 86400)
+
+    def __init__(self, fail=()):
+        self.fail = set(fail)
+        self.calls = 0
+        self.active = 0
+        self.peak = 0
+        self.lock = threading.Lock()
+
+    def get_candles(self, product_id, granularity, start, end):
+        with self.lock:
+            self.calls += 1
+            self.active += 1
+            self.peak = max(self.peak, self.active)
+        time.sleep(0.02)
+        with self.lock:
+            self.active -= 1
+        if start in self.fail:
+            return None
+        return [[t, 1.0, 3.0, 2.0, 2.5, 10.0] for t in range(end, start - 1, -granularity)]
+
+
+def make_backfill(coinbase):
+    store = CandleStore(os.path.join(tempfile.mkdtemp(), 'candles.db'))
+    return RangeBackfill(store=store, coinbase=coinbase, workers=4, flush_rows=1000, backoff=0), store
+
+
+def test_parallel_chunks_are_written_and_checkpointed():
+    backfill, store = make_backfill(FakeCoinbase())
+    stats = backfill.run(['BTC/USD', 'ETH/USD'], '1m', START, START + 3000 * 60)
+    assert stats['chunks'] == 20 and stats['failed'] == 0
+    assert stats['candles'] == 6000 and stats['candles_per_second'] > 0
+    assert backfill.coinbase.peak > 1
+    assert store.count('BTC/USD', '1m') == 3000
+    assert len(store.completed_chunks('ETH/USD', '1m', START, START + 3000 * 60)) == 10
+
+
+def test_resume_skips_checkpointed_chunks():
+    coinbase = FakeCoinbase(fail={START + 600 * 60})
+    backfill, store = make_backfill(coinbase)
+    stats = backfill.run(['BTC/USD'], '1m', START, START + 1500 * 60)
+    assert stats['failed'] == 1 and store.count('BTC/USD', '1m') == 1200
+
+    coinbase.fail.clear()
+    coinbase.calls = 0
+    stats = backfill.run(['BTC/USD'], '1m', START, START + 1500 * 60)
+    assert stats['skipped'] == 4 and stats['chunks'] == 1 and coinbase.calls == 1
+    assert store.count('BTC/USD', '1m') == 1500
+
+
+def test_history_sync_after_backfill_fetches_nothing():
+    from utils.candle_history import CandleHistory
+    coinbase = FakeCoinbase()
+    backfill, store = make_backfill(coinbase)
+    end = START + 1500 * 60
+    backfill.run(['BTC/USD'], '1m', START, end)
+    assert store.coverage('BTC/USD', '1m') == (START, end)
+
+    coinbase.calls = 0
+    history = CandleHistory(store=store, coinbase=coinbase, resampler=None, bars=1200)
+    assert history.sync('BTC/USD', '1m', now=end) == 0
+    assert coinbase.calls == 0
+
+
+def test_backfill_extends_adjoining_coverage_only():
+    backfill, store = make_backfill(FakeCoinbase())
+    store.set_coverage('BTC/USD', '1m', START + 600 * 60, START + 900 * 60)
+    backfill.run(['BTC/USD'], '1m', START, START + 1200 * 60)
+    assert store.coverage('BTC/USD', '1m') == (START, START + 1200 * 60)
+    store.set_coverage('ETH/USD', '1m', START + 3000 * 60, START + 3300 * 60)
+    backfill.run(['ETH/USD'], '1m', START, START + 600 * 60)
+    assert store.coverage('ETH/USD', '1m') == (START + 3000 * 60, START + 3300 * 60)
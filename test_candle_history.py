@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+"""
+Candle history backfill tests (no network)
+Run with: python -m pytest test_candle_history.py
+"""
+import os
+import sys
+import tempfile
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from utils.db import init_db
+from utils.candle_store import CandleStore
+from utils.candle_history import CandleHistory
+from utils.resampler import Resampler
+
+init_db()  # Failed pages are logged via log_trade
+
+
+class FakeCoinbase:
+    """Serves a synthetic 1m series the way the Exchange candles endpoint does"""
+    candle_page_size = 300
+
+    def __init__(self):
+        self.requests = []
+
+    def get_candles(self, product_id, granularity, start, end):
+        self.requests.append((start, end))
+        assert (end - start) // granularity < self.candle_page_size
+        rows = [[t, 1.0, 3.0, 2.0, 2.5, 10.0] for t in range(start, end + 1, granularity)]
+        return rows[::-1]
+
+
+def make_history(**kwargs):
+    store = CandleStore(os.path.join(tempfile.mkdtemp(), 'candles.db'))
+    return CandleHistory(store=store, coinbase=FakeCoinbase(), resampler=Resampler(store=store), **kwargs), store
+
+
+def test_backfill_is_paginated_and_excludes_open_candle():
+    history, store = make_history(bars=1000)
+    now = 1_700_000_000 + 30  # Mid-candle
+    assert history.sync('BTC/USD', '1m', now=now) == 1000
+    assert len(history.coinbase.requests) == 4  # ceil(1000 / 300)
+    candles = store.get_candles('BTC/USD', '1m')
+    assert len(candles['close']) == 1000
+    assert candles['start'][-1] == now // 60 * 60 - 60
+    assert (candles['open'][0], candles['high'][0], candles['low'][0]) == (2.0, 3.0, 1.0)
+
+
+def test_refresh_fetches_only_the_tail():
+    history, store = make_history(bars=1000)
+    now = 1_700_000_000
+    history.sync('BTC/USD', '1m', now=now)
+    history.coinbase.requests.clear()
+    assert history.sync('BTC/USD', '1m', now=now) == 0
+    assert history.coinbase.requests == []
+    assert history.sync('BTC/USD', '1m', now=now + 5 * 60) == 5
+    assert len(history.coinbase.requests) == 1
+    assert store.count('BTC/USD', '1m') == 1005
+
+
+def test_failed_page_stops_and_resumes():
+    history, store = make_history(bars=900)
+    fetch = history.coinbase.get_candles
+    history.coinbase.get_candles = lambda *a: None if len(history.coinbase.requests) >= 1 else fetch(*a)
+    history.coinbase.requests.clear()
+    now = 1_700_000_000
+    assert history.sync('BTC/USD', '1m', now=now) == 300
+    history.coinbase.get_candles = fetch
+    assert history.sync('BTC/USD', '1m', now=now) == 600
+    assert store.count('BTC/USD', '1m') == 900
+
+
+def test_higher_intervals_are_resampled_from_base():
+    history, store = make_history(bars=600)
+    now = 1_700_000_000 // 3600 * 3600 + 30  # Backfill then starts on a bucket boundary
+    assert history.sync('BTC/USD', '15m', now=now) == 40
+    requests = len(history.coinbase.requests)
+    assert requests == 2  # Only the 1m series was fetched
+    assert history.sync('BTC/USD', '1h', now=now) == 10
+    assert len(history.coinbase.requests) == requests
+    assert store.get_candles('BTC/USD', '1h')['volume'][-1] == 600.0
+
+
+def test_live_candle_before_first_sync_does_not_skip_backfill():
+    history, store = make_history(bars=600)
+    now = 1_700_000_000 // 60 * 60
+    store.on_candle({'product_id': 'BTC-USD', 'interval': '1m', 'start': now - 60,
+                     'open': 1.0, 'high': 1.0, 'low': 1.0, 'close': 1.0, 'volume': 1.0})
+    assert history.sync('BTC/USD', '1m', now=now) == 600
+    assert store.count('BTC/USD', '1m') == 600
+    assert store.coverage('BTC/USD', '1m') == (now - 600 * 60, now)
+
+
+def test_restart_gap_is_filled_despite_newer_live_candles():
+    history, store = make_history(bars=600)
+    now = 1_700_000_000 // 60 * 60
+    history.sync('BTC/USD', '1m', now=now)
+    # Down for an hour, then the socket stores candles before the next sync runs
+    later = now + 3600
+    store.on_candle({'product_id': 'BTC-USD', 'interval': '1m', 'start': later - 60,
+                     'open': 1.0, 'high': 1.0, 'low': 1.0, 'close': 1.0, 'volume': 1.0})
+    assert history.sync('BTC/USD', '1m', now=later) == 60
+    assert len(store.get_candles('BTC/USD', '1m', start=now, end=later)['start']) == 60
+
+
+def test_larger_bars_extend_history_backwards():
+    history, store = make_history(bars=300)
+    now = 1_700_000_000 // 60 * 60
+    history.sync('BTC/USD', '1m', now=now)
+    assert history.sync('BTC/USD', '1m', bars=900, now=now) == 600
+    assert store.coverage('BTC/USD', '1m') == (now - 900 * 60, now)
+    assert store.count('BTC/USD', '1m') == 900
+
+
+def test_resampled_history_ignores_live_higher_interval_bars():
+    history, store = make_history(bars=600)
+    now = 1_700_000_000 // 3600 * 3600
+    store.save_candles('BTC/USD', '1h', [(now - 3600, 1.0, 1.0, 1.0, 1.0, 1.0)])
+    assert history.sync('BTC/USD', '1h', now=now) == 10
+    assert store.get_candles('BTC/USD', '1h')['volume'][0] == 600.0
@@ -0,0 +1,78 @@
+"""
+Feed telemetry and compression metering tests
+Run with: python -m pytest test_feed_telemetry.py
+"""
+import json
+import os
+import sys
+import time
+import pytest
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from utils.db import init_db
+from utils.feed_telemetry import FeedTelemetry, EWMA_ALPHA
+from utils.websocket_client import CoinbaseWebSocket
+
+init_db()
+
+
+def test_lag_ewma_and_trade_gaps():
+    telemetry = FeedTelemetry()
+    telemetry.record('BTC-USD', 100.0, 100.0, exchange_ts=99.0, trade_id=1)
+    telemetry.record('BTC-USD', 101.0, 101.0, exchange_ts=99.0, trade_id=2)
+    telemetry.record('BTC-USD', 102.0, 102.0, exchange_ts=101.5, trade_id=6)
+    stats = telemetry.products['BTC-USD']
+    expected = 1.0 + EWMA_ALPHA * (2.0 - 1.0)
+    expected += EWMA_ALPHA * (0.5 - expected)
+    assert stats.exchange_lag == pytest.approx(expected)
+    assert stats.exchange_lag_max == 2.0
+    assert (stats.gaps, stats.missed_trades) == (1, 3)
+    assert telemetry.get_status()['products']['BTC-USD']['rate_per_sec'] == pytest.approx(1.0)
+
+
+def test_staleness_flips_after_max_age():
+    telemetry = FeedTelemetry()
+    assert telemetry.is_stale('BTC-USD')  # Never seen
+    now = time.time()
+    telemetry.record('BTC-USD', now, now, exchange_ts=now)
+    assert not telemetry.is_stale('BTC-USD', max_age=0.2)
+    time.sleep(0.25)
+    assert telemetry.is_stale('BTC-USD', max_age=0.2)
+
+
+def test_high_lag_is_stale():
+    telemetry = FeedTelemetry()
+    now = time.time()
+    telemetry.record('BTC-USD', now, now, exchange_ts=now - 30)
+    assert telemetry.is_stale('BTC-USD', max_age=10, max_lag=5)
+    telemetry.forget('BTC-USD')
+    assert 'BTC-USD' not in telemetry.get_status()['products']
+
+
+def test_uncompressed_frames_are_metered_in_bytes():
+    ws = CoinbaseWebSocket(products=[])
+    message = json.dumps({'type': 'ticker', 'product_id': 'BTC-USD', 'price': '1', 'note': 'ü€'},
+                         ensure_ascii=False)
+    ws.on_message(None, message)
+    bandwidth = ws.telemetry.get_bandwidth()
+    assert bandwidth['wire_bytes'] == bandwidth['decoded_bytes'] == len(message.encode())
+    assert bandwidth['wire_bytes'] > len(message)
+
+
+def test_deflate_frames_are_metered():
+    pytest.importorskip('websockets')
+    from websockets.extensions.permessage_deflate import PerMessageDeflate
+    from websockets.frames import Frame, Opcode
+    from utils.ws_compression import MeteredExtension
+
+    telemetry = FeedTelemetry()
+    server = PerMessageDeflate(False, False, 15, 15)
+    client = MeteredExtension(PerMessageDeflate(False, False, 15, 15), telemetry)
+    payload = json.dumps([{'type': 'l2update', 'product_id': 'BTC-USD', 'changes': [['buy', '1', '1']]}] * 50)
+    frame = server.encode(Frame(Opcode.TEXT, payload.encode()))
+    assert client.decode(frame).data == payload.encode()
+    bandwidth = telemetry.get_bandwidth()
+    assert bandwidth['wire_bytes'] == len(frame.data)
+    assert bandwidth['decoded_bytes'] == len(payload.encode())
+    assert bandwidth['compression_ratio'] > 5
@@ -0,0 +1,292 @@
+#!/usr/bin/env python3
+"""
+Local indicator parity tests
+Checks utils/indicators against straightforward loop implementations of the
+TA-Lib definitions TAAPI uses, and that responses keep the TAAPI key shapes.
+Run with: python -m pytest test_indicators.py
+"""
+import os
+import sys
+import time
+import numpy as np
+import pytest
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from utils import indicators
+from utils.candle_store import CandleStore
+
+
+def make_candles(n=300, seed=7):
+    """Random-walk OHLCV"""
+    rng = np.random.default_rng(seed)
+    close = 100 * np.exp(np.cumsum(rng.normal(0, 0.01, n)))
+    open_ = np.concatenate([[close[0]], close[:-1]])
+    high = np.maximum(open_, close) * (1 + rng.uniform(0, 0.005, n))
+    low = np.minimum(open_, close) * (1 - rng.uniform(0, 0.005, n))
+    start = time.time() // 3600 * 3600 - 3600 * np.arange(n)[::-1]
+    return {'start': start, 'open': open_, 'high': high, 'low': low, 'close': close,
+            'volume': rng.uniform(1, 10, n)}
+
+
+def ref_ema(values, period):
+    out = [None] * len(values)
+    prev = sum(values[:period]) / period
+    out[period - 1] = prev
+    for i in range(period, len(values)):
+        prev = prev * (1 - 2 / (period + 1)) + values[i] * 2 / (period + 1)
+        out[i] = prev
+    return out
+
+
+def ref_rsi(close, period=14):
+    gains = [max(close[i] - close[i - 1], 0) for i in range(1, len(close))]
+    losses = [max(close[i - 1] - close[i], 0) for i in range(1, len(close))]
+    avg_gain = sum(gains[:period]) / period
+    avg_loss = sum(losses[:period]) / period
+    for i in range(period, len(gains)):
+        avg_gain = (avg_gain * (period - 1) + gains[i]) / period
+        avg_loss = (avg_loss * (period - 1) + losses[i]) / period
+    return 100 - 100 / (1 + avg_gain / avg_loss)
+
+
+def ref_atr(high, low, close, period=14):
+    tr = [max(high[i] - low[i], abs(high[i] - close[i - 1]), abs(low[i] - close[i - 1]))
+          for i in range(1, len(close))]
+    value = sum(tr[:period]) / period
+    for i in range(period, len(tr)):
+        value = (value * (period - 1) + tr[i]) / period
+    return value
+
+
+def test_rsi_matches_wilder_reference():
+    c = make_candles()
+    result = indicators.latest(indicators.compute('rsi', c, period=14))
+    assert set(result) == {'value'}
+    assert result['value'] == pytest.approx(ref_rsi(list(c['close'])), rel=1e-9)
+
+
+def test_macd_matches_reference():
+    c = make_candles()
+    close = list(c['close'])
+    fast, slow = ref_ema(close, 12), ref_ema(close, 26)
+    line = [f - s for f, s in zip(fast[25:], slow[25:])]
+    signal = ref_ema(line, 9)
+    result = indicators.latest(indicators.compute('macd', c))
+    assert set(result) == {'valueMACD', 'valueMACDSignal', 'valueMACDHist'}
+    assert result['valueMACD'] == pytest.approx(line[-1], rel=1e-9)
+    assert result['valueMACDSignal'] == pytest.approx(signal[-1], rel=1e-9)
+    assert result['valueMACDHist'] == pytest.approx(line[-1] - signal[-1], rel=1e-9)
+
+
+def test_bbands_matches_reference():
+    c = make_candles()
+    window = c['close'][-20:]
+    mean = sum(window) / 20
+    std = (sum((x - mean) ** 2 for x in window) / 20) ** 0.5
+    result = indicators.latest(indicators.compute('bbands', c, period=20, stddev=2))
+    assert result['valueMiddleBand'] == pytest.approx(mean)
+    assert result['valueUpperBand'] == pytest.approx(mean + 2 * std)
+    assert result['valueLowerBand'] == pytest.approx(mean - 2 * std)
+
+
+def test_atr_matches_reference():
+    c = make_candles()
+    result = indicators.latest(indicators.compute('atr', c, period=14))
+    assert result['value'] == pytest.approx(ref_atr(c['high'], c['low'], c['close']), rel=1e-9)
+
+
+def test_stoch_matches_reference():
+    c = make_candles()
+    fast_k = []
+    for i in range(13, len(c['close'])):
+        hh, ll = max(c['high'][i - 13:i + 1]), min(c['low'][i - 13:i + 1])
+        fast_k.append((c['close'][i] - ll) / (hh - ll) * 100)
+    slow_k = [sum(fast_k[i - 2:i + 1]) / 3 for i in range(2, len(fast_k))]
+    slow_d = sum(slow_k[-3:]) / 3
+    result = indicators.latest(indicators.compute('stoch', c))
+    assert result['valueK'] == pytest.approx(slow_k[-1])
+    assert result['valueD'] == pytest.approx(slow_d)
+
+
+def test_backtrack_and_warmup():
+    c = make_candles(n=40)
+    series = indicators.compute('sma', c, period=30)
+    assert indicators.latest(series, backtrack=5)['value'] == pytest.approx(c['close'][-35:-5].mean())
+    assert indicators.latest(series, backtrack=11) is None
+
+
+def test_engine_uses_store_and_falls_back(tmp_path):
+    class FakeTaapi:
+        calls = 0
+
+        def get_indicator(self, indicator, exchange, symbol, interval, **params):
+            FakeTaapi.calls += 1
+            return {'value': -1.0}
+
+    store = CandleStore(str(tmp_path / 'candles.db'))
+    c = make_candles()
+    store.save_candles('BTC/USD', '1h', zip(*(c[f] for f in ('start', 'open', 'high', 'low', 'close', 'volume'))))
+    engine = indicators.LocalIndicatorEngine(store=store, fallback=FakeTaapi(), streams=None)
+
+    result = engine.get_indicator('rsi', 'binance', 'BTC/USD', '1h')
+    assert result['value'] == pytest.approx(ref_rsi(list(c['close'])), rel=1e-6)
+    assert engine.get_indicator('rsi', 'binance', 'ETH/USD', '1h') == {'value': -1.0}
+    assert engine.get_indicator('cci', 'binance', 'BTC/USD', '1h') == {'value': -1.0}
+    assert (engine.local_hits, engine.fallbacks, FakeTaapi.calls) == (1, 2, 2)
+
+    # Binance requests are served from the (Coinbase) store by design; other exchanges go to TAAPI
+    assert engine.get_indicator('rsi', 'kraken', 'BTC/USD', '1h') == {'value': -1.0}
+    assert engine.get_indicator('rsi', 'coinbase', 'BTC/USD', '1h')['value'] == pytest.approx(result['value'])
+    assert (engine.local_hits, FakeTaapi.calls) == (2, 3)
+
+
+@pytest.mark.parametrize('indicator,params', [
+    ('rsi', {}), ('macd', {}), ('bbands', {'period': 20, 'stddev': 2}), ('atr', {}),
+    ('stoch', {}), ('sma', {'period': 10}), ('ema', {'period': 10}), ('volume', {})
+])
+def test_streaming_matches_vectorized(indicator, params):
+    import json
+    from utils.streaming_indicators import create_indicator
+
+    c = make_candles()
+    rows = [{f: float(c[f][i]) for f in c} for i in range(len(c['close']))]
+    stream = create_indicator(indicator, **params)
+    for row in rows[:-1]:
+        stream.update(row)
+
+    # Previewing the in-progress bar doesn't commit it
+    expected = indicators.latest(indicators.compute(indicator, c, **params))
+    assert stream.peek(rows[-1]) == pytest.approx(expected, rel=1e-9)
+    assert stream.value == pytest.approx(indicators.latest(indicators.compute(indicator, c, **params), 1), rel=1e-9)
+
+    # Round-trip through JSON, then commit the last bar
+    restored = create_indicator(indicator, **params)
+    restored.load(json.loads(json.dumps(stream.to_dict())))
+    assert restored.update(rows[-1]) == pytest.approx(expected, rel=1e-9)
+    assert restored.update(rows[-1]) == pytest.approx(expected, rel=1e-9)  # Duplicate close ignored
+
+
+@pytest.mark.parametrize('indicator', ['rsi', 'macd', 'bbands', 'atr', 'stoch', 'ema'])
+def test_matrix_matches_per_symbol(indicator):
+    # Rows with different history lengths, left-padded with NaN
+    lengths = [300, 120, 60, 20]
+    series = [make_candles(n, seed=i) for i, n in enumerate(lengths)]
+    for f in ('open', 'high', 'low', 'close', 'volume'):
+        series[0][f][150] = np.nan  # A missing candle mid-history
+    matrix = {f: np.full((len(lengths), 300), np.nan) for f in ('open', 'high', 'low', 'close', 'volume')}
+    for row, c in enumerate(series):
+        for f in matrix:
+            matrix[f][row, 300 - len(c[f]):] = c[f]
+
+    rows = indicators.latest_rows(indicators.compute(indicator, matrix))
+    for row, c in enumerate(series):
+        expected = indicators.latest(indicators.compute(indicator, c))
+        if expected is None:
+            assert rows[row] is None
+        else:
+            assert rows[row] == pytest.approx(expected, rel=1e-9)
+
+
+def test_engine_batches_from_store(tmp_path):
+    store = CandleStore(str(tmp_path / 'candles.db'))
+    fields = ('start', 'open', 'high', 'low', 'close', 'volume')
+    btc, eth = make_candles(300, seed=1), make_candles(100, seed=2)
+    store.save_candles('BTC/USD', '1h', zip(*(btc[f] for f in fields)))
+    store.save_candles('ETH/USD', '1h', zip(*(eth[f] for f in fields)))
+    engine = indicators.LocalIndicatorEngine(store=store, streams=None)
+
+    result = engine.get_indicators('rsi', ['BTC/USD', 'ETH/USD', 'SOL/USD'], '1h')
+    assert result['BTC/USD']['value'] == pytest.approx(ref_rsi(list(btc['close'])), rel=1e-6)
+    assert result['ETH/USD']['value'] == pytest.approx(ref_rsi(list(eth['close'])), rel=1e-6)
+    assert result['SOL/USD'] is None
+
+
+def test_graph_shares_intermediates(tmp_path):
+    from utils.indicator_graph import IndicatorGraph
+
+    store = CandleStore(str(tmp_path / 'candles.db'))
+    c = make_candles()
+    store.save_candles('BTC/USD', '1h', zip(*(c[f] for f in ('start', 'open', 'high', 'low', 'close', 'volume'))))
+    graph = IndicatorGraph(store)
+    graph.declare('bot1', '1h', ['rsi', 'macd', 'bbands'])
+    graph.declare('bot3', '1h', ['rsi', 'macd', 'volume', ('sma', {'period': 20}), ('ema', {'period': 12})])
+
+    series, last_start = graph.evaluate('rsi', 'BTC/USD', '1h')
+    assert last_start == c['start'][-1]
+    computed = graph.get_stats()['nodes_computed']
+    for name, params in [('macd', {}), ('bbands', {}), ('sma', {'period': 20}), ('ema', {'period': 12})]:
+        series, _ = graph.evaluate(name, 'BTC-USD', '1h', **params)
+        expected = indicators.latest(indicators.compute(name, c, **params))
+        assert indicators.latest(series) == pytest.approx(expected, rel=1e-9)
+
+    # Everything declared was computed in the first pass; SMA(20) and EMA(12) came from BBands/MACD
+    stats = graph.get_stats()
+    assert stats['nodes_computed'] == computed
+    assert stats['nodes_reused'] >= 2
+    assert stats['declared']["1h:rsi{'period': '14'}"] == ['bot1', 'bot3']
+
+
+def test_graph_normalizes_default_params(tmp_path):
+    from utils.indicator_graph import IndicatorGraph, request_key
+
+    assert request_key('rsi', {}) == request_key('rsi', {'period': '14'})
+    assert request_key('bbands', {'stddev': 2}) == request_key('bbands', {'period': 20, 'stddev': 2.0})
+    assert request_key('rsi', {}) != request_key('rsi', {'period': 21})
+
+    graph = IndicatorGraph(CandleStore(str(tmp_path / 'candles.db')))
+    graph.declare('bot1', '1h', ['rsi'])
+    graph.declare('bot2', '1h', [('rsi', {'period': 14})])
+    assert list(graph.get_stats()['declared'].values()) == [['bot1', 'bot2']]
+
+
+def test_graph_serves_streams_then_nodes(tmp_path):
+    from utils.indicator_graph import IndicatorGraph
+    from utils.streaming_indicators import StreamingIndicatorEngine
+
+    store = CandleStore(str(tmp_path / 'candles.db'))
+    c = make_candles()
+    store.save_candles('BTC/USD', '1h', zip(*(c[f] for f in ('start', 'open', 'high', 'low', 'close', 'volume'))))
+    graph = IndicatorGraph(store, streams=StreamingIndicatorEngine(store))
+    expected = indicators.latest(indicators.compute('macd', c))
+
+    # Current value: the live stream, no graph nodes evaluated
+    assert graph.latest('macd', 'BTC/USD', '1h') == pytest.approx(expected, rel=1e-9)
+    assert graph.get_stats()['stream_hits'] == 1 and graph.get_stats()['nodes_computed'] == 0
+
+    # Backtracked value: evaluated through the node graph
+    assert graph.latest('macd', 'BTC/USD', '1h', backtrack=3) == \
+        pytest.approx(indicators.latest(indicators.compute('macd', c), 3), rel=1e-9)
+    assert graph.get_stats()['nodes_computed'] > 0
+
+    # Without streams, the node graph serves the current value too
+    nodes_only = IndicatorGraph(store)
+    assert nodes_only.latest('macd', 'BTC/USD', '1h') == pytest.approx(expected, rel=1e-9)
+    assert nodes_only.get_stats()['stream_hits'] == 0
+
+
+def test_stream_restored_across_a_gap_is_rebuilt(tmp_path):
+    from utils.streaming_indicators import StreamingIndicatorEngine
+
+    fields = ('start', 'open', 'high', 'low', 'close', 'volume')
+    c = make_candles()
+    rows = [{f: float(c[f][i]) for f in fields} for i in range(len(c['close']))]
+    store = CandleStore(str(tmp_path / 'candles.db'))
+    store.save_candles('BTC/USD', '1h', zip(*(c[f][:200] for f in fields)))
+    before = StreamingIndicatorEngine(store)
+    before.get_stream('rsi', 'BTC/USD', '1h')
+    snapshot = before.get_state()
+
+    # Restart: the missed candles were backfilled into the store, then the next one closes live
+    store.save_candles('BTC/USD', '1h', zip(*(c[f][200:-1] for f in fields)))
+    after = StreamingIndicatorEngine(store)
+    after.load_state(snapshot)
+    after.on_candle(dict(rows[-1], product_id='BTC-USD', interval='1h'))
+    assert after.rebuilds == 1
+    assert after.get_indicator('rsi', 'BTC/USD', '1h')['value'] == pytest.approx(ref_rsi(list(c['close'])), rel=1e-9)
+
+    # Without the missed candles anywhere, the stream starts cold instead of bridging the gap
+    cold = StreamingIndicatorEngine(CandleStore(str(tmp_path / 'empty.db')))
+    cold.load_state(snapshot)
+    cold.on_candle(dict(rows[-1], product_id='BTC-USD', interval='1h'))
+    assert cold.get_indicator('rsi', 'BTC/USD', '1h') is None
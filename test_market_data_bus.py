@@ -0,0 +1,70 @@
+"""
+Market data bus round trip against a local Redis instance
+Run with: pytest test_market_data_bus.py  (skipped when Redis isn't reachable)
+"""
+import json
+import time
+import pytest
+import redis
+
+from utils.db import init_db
+from utils.market_data_bus import MarketDataPublisher, MarketDataSubscriber, get_redis_client
+from utils.websocket_client import CoinbaseWebSocket
+
+PREFIX = "test_market"
+
+
+@pytest.fixture
+def redis_client():
+    client = get_redis_client()
+    try:
+        client.ping()
+    except redis.RedisError:
+        pytest.skip("Local Redis not available")
+    init_db()
+    yield client
+    for key in client.scan_iter(match=f"{PREFIX}:*"):
+        client.delete(key)
+
+
+def _ticker(product_id, price):
+    return {
+        'type': 'ticker', 'product_id': product_id, 'price': str(price),
+        'best_bid': str(price - 1), 'best_ask': str(price + 1),
+        'volume_24h': '10', 'time': '2024-01-01T00:00:00.000000Z'
+    }
+
+
+def test_tickers_are_conflated_and_delivered(redis_client):
+    ws = CoinbaseWebSocket(products=[])
+    publisher = MarketDataPublisher(ws=ws, redis_client=redis_client, prefix=PREFIX)
+    subscriber = MarketDataSubscriber(redis_client=get_redis_client(), prefix=PREFIX)
+    subscriber.start()
+    try:
+        ws.register_callback('ticker', publisher.on_ticker)
+        for price in (100, 101, 102):
+            ws.on_message(None, json.dumps(_ticker('BTC-USD', price)))
+
+        # Three updates for one product collapse into a single publish
+        assert publisher.flush() == 1
+        assert publisher.conflated_count == 2
+
+        deadline = time.time() + 2
+        while subscriber.get_realtime_price('BTC/USD') is None and time.time() < deadline:
+            time.sleep(0.01)
+        assert subscriber.get_realtime_price('BTC/USD') == 102.0
+        assert subscriber.get_ticker('BTC-USD')['best_bid'] == 101.0
+    finally:
+        subscriber.stop()
+
+
+def test_late_subscriber_primes_from_last_values(redis_client):
+    ws = CoinbaseWebSocket(products=[])
+    publisher = MarketDataPublisher(ws=ws, redis_client=redis_client, prefix=PREFIX)
+    ws.on_message(None, json.dumps(_ticker('ETH-USD', 2000)))
+    publisher.on_ticker({'product_id': 'ETH-USD'})
+    publisher.flush()
+
+    subscriber = MarketDataSubscriber(redis_client=get_redis_client(), prefix=PREFIX)
+    subscriber.prime()
+    assert subscriber.get_price('ETH-USD') == 2000.0
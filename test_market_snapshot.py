@@ -0,0 +1,74 @@
+"""
+Warm-restart snapshot tests
+Run with: python -m pytest test_market_snapshot.py
+"""
+import gzip
+import json
+import os
+import sys
+import time
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from utils.db import init_db
+from utils.market_snapshot import MarketSnapshotter
+from utils.websocket_client import CoinbaseWebSocket, CANDLE_SECONDS
+
+init_db()
+
+
+def _feed(ws, now):
+    ws.on_message(None, json.dumps({'type': 'ticker', 'product_id': 'BTC-USD', 'price': '100',
+                                    'best_bid': '99', 'best_ask': '101'}))
+    ws.on_message(None, json.dumps({'type': 'snapshot', 'product_id': 'BTC-USD',
+                                    'bids': [['99', '2']], 'asks': [['101', '3']]}))
+    ws._handle_match({'product_id': 'BTC-USD', 'price': '100', 'size': '1', 'side': 'sell'}, now)
+
+
+def test_snapshot_round_trip(tmp_path):
+    ws = CoinbaseWebSocket(products=[])
+    _feed(ws, time.time())
+    snapshotter = MarketSnapshotter(path=str(tmp_path / 'snapshot.json.gz'))
+    snapshotter.register('websocket', ws.get_market_state, ws.load_market_state)
+    assert snapshotter.save()
+
+    restored = CoinbaseWebSocket(products=[])
+    reader = MarketSnapshotter(path=snapshotter.path)
+    reader.register('websocket', restored.get_market_state, restored.load_market_state)
+    assert reader.restore()
+    assert restored.get_price('BTC-USD') == 100
+    assert restored.get_book_top('BTC-USD') == {'bid': 99.0, 'bid_size': 2.0, 'ask': 101.0, 'ask_size': 3.0}
+    assert list(restored.trades['BTC-USD']) == list(ws.trades['BTC-USD'])
+    assert restored.open_candles == ws.open_candles
+
+
+def test_old_or_foreign_snapshots_are_ignored(tmp_path):
+    path = str(tmp_path / 'snapshot.json.gz')
+    restored = CoinbaseWebSocket(products=[])
+    snapshotter = MarketSnapshotter(path=path, max_age=60)
+    snapshotter.register('websocket', restored.get_market_state, restored.load_market_state)
+    assert not snapshotter.restore()  # No file yet
+
+    state = {'websocket': {'price_cache': {'BTC-USD': {'price': 1.0}}}}
+    for version, saved_at in ((1, time.time() - 120), (99, time.time())):
+        with open(path, 'wb') as f:
+            f.write(gzip.compress(json.dumps({'version': version, 'saved_at': saved_at, 'state': state}).encode()))
+        assert not snapshotter.restore()
+    assert restored.get_price('BTC-USD') is None
+
+
+def test_ended_open_candles_are_dropped():
+    ws = CoinbaseWebSocket(products=[])
+    now = time.time()
+    _feed(ws, now - 5 * CANDLE_SECONDS)
+    state = ws.get_market_state()
+
+    restored = CoinbaseWebSocket(products=[])
+    restored.load_market_state(state, now=now)
+    assert restored.open_candles == {}
+    assert restored.get_price('BTC-USD') == 100
+
+    # A candle still inside its minute survives
+    current = CoinbaseWebSocket(products=[])
+    current.load_market_state(state, now=state['open_candles']['BTC-USD']['start'] + 1)
+    assert current.open_candles['BTC-USD']['volume'] == 1.0
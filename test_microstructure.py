@@ -0,0 +1,73 @@
+"""
+Streaming microstructure feature tests on scripted trades and books
+Run with: python -m pytest test_microstructure.py
+"""
+import math
+import os
+import sys
+import pytest
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from utils.microstructure import MicrostructureEngine, RollingSum
+
+
+def test_rolling_sum_expires_old_values():
+    rolling = RollingSum(10)
+    rolling.add(0, 1.0)
+    rolling.add(5, 2.0)
+    assert rolling.total == 3.0
+    rolling.add(12, 4.0)
+    assert rolling.total == 6.0
+    rolling.expire(30)
+    assert rolling.total == 0.0 and not rolling.events
+
+
+def test_ofi_on_scripted_book():
+    engine = MicrostructureEngine(window=60)
+    engine.on_top('BTC-USD', 0, 100, 5, 101, 5)
+    engine.on_top('BTC-USD', 1, 100, 8, 101, 5)   # Bid size up 3: +3
+    engine.on_top('BTC-USD', 2, 100.5, 2, 101, 5)  # Bid price up: +2
+    engine.on_top('BTC-USD', 3, 100.5, 2, 100.8, 4)  # Ask price down: -4
+    features = engine.get_features('BTC-USD', now=3)
+    assert features['ofi'] == pytest.approx(1.0)
+    assert features['spread_bps'] == pytest.approx(0.3 / 100.65 * 10000)
+
+    # Window passes: only the last change is still counted
+    assert engine.get_features('BTC-USD', now=62.5)['ofi'] == pytest.approx(-4.0)
+
+
+def test_trade_features():
+    engine = MicrostructureEngine(window=60)
+    engine.on_trade('BTC-USD', 0, 100, 3, 1)
+    engine.on_trade('BTC-USD', 1, 110, 1, -1)
+    features = engine.get_features('BTC/USD', now=1)
+    assert features['trade_imbalance'] == pytest.approx(0.5)
+    assert features['realized_vol'] == pytest.approx(abs(math.log(110 / 100)))
+    vwap = (300 + 110) / 4
+    assert features['vwap_deviation'] == pytest.approx((110 - vwap) / vwap)
+
+
+def test_volume_surge():
+    engine = MicrostructureEngine(window=60, surge_short=10, surge_long=100, surge_threshold=2.0)
+    for ts in range(0, 90, 10):
+        engine.on_trade('BTC-USD', ts, 100, 1, 1)
+    assert engine.get_features('BTC-USD', now=95)['volume_surge'] == 0.0
+    for _ in range(5):
+        engine.on_trade('BTC-USD', 95, 100, 1, 1)
+    features = engine.get_features('BTC-USD', now=95)
+    assert features['volume_ratio'] > 2.0 and features['volume_surge'] == 1.0
+
+
+def test_state_round_trip():
+    engine = MicrostructureEngine(window=60)
+    engine.on_top('BTC-USD', 0, 100, 5, 101, 5)
+    engine.on_top('BTC-USD', 1, 100, 8, 101, 5)
+    engine.on_trade('BTC-USD', 1, 100, 2, 1)
+    restored = MicrostructureEngine(window=60)
+    restored.load_state(engine.get_state())
+    assert restored.get_features('BTC-USD', now=2) == engine.get_features('BTC-USD', now=2)
+
+
+def test_unknown_product_is_zero():
+    assert not MicrostructureEngine().get_vector('SOL-USD').any()
@@ -0,0 +1,53 @@
+#!/usr/bin/env python3
+"""
+Candlestick pattern tests on hand-built candles
+Run with: python -m pytest test_patterns.py
+"""
+import os
+import sys
+import numpy as np
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from utils.patterns import detect, latest_patterns, PATTERNS
+
+
+def series(tail):
+    """Ten ordinary candles (body 1, range 2) followed by the (open, high, low, close) tail"""
+    base = [(100.0, 101.5, 99.5, 101.0) if i % 2 else (101.0, 101.5, 99.5, 100.0) for i in range(10)]
+    rows = np.array(base + list(tail))
+    return {'open': rows[:, 0], 'high': rows[:, 1], 'low': rows[:, 2], 'close': rows[:, 3]}
+
+
+def test_output_matches_taapi_keys():
+    values = latest_patterns(detect(series([(100, 100.1, 99.9, 100.05)])))
+    assert set(values) == {f"value{name}" for name in PATTERNS}
+    assert values['valueCDLDOJI'] == 100
+
+
+def test_engulfing_both_directions():
+    assert latest_patterns(detect(series([(101, 101.2, 99.8, 100), (99.8, 101.5, 99.7, 101.3)])))['valueCDLENGULFING'] == 100
+    assert latest_patterns(detect(series([(100, 101.2, 99.8, 101), (101.2, 101.3, 99.5, 99.7)])))['valueCDLENGULFING'] == -100
+
+
+def test_hammer_after_decline():
+    values = latest_patterns(detect(series([(101, 101.1, 99.0, 99.4), (99.0, 99.25, 97.5, 99.2)])))
+    assert values['valueCDLHAMMER'] == 100
+    assert values['valueCDLHANGINGMAN'] == 0
+
+
+def test_morning_and_evening_star():
+    morning = series([(102, 102.1, 99.9, 100), (99.5, 99.7, 99.2, 99.4), (99.6, 101.6, 99.5, 101.5)])
+    assert latest_patterns(detect(morning))['valueCDLMORNINGSTAR'] == 100
+    evening = series([(100, 102.1, 99.9, 102), (102.5, 102.8, 102.3, 102.6), (102.4, 102.5, 100.4, 100.5)])
+    assert latest_patterns(detect(evening))['valueCDLEVENINGSTAR'] == -100
+
+
+def test_matrix_scan_matches_per_symbol():
+    a = series([(101, 101.2, 99.8, 100), (99.8, 101.5, 99.7, 101.3)])
+    b = series([(100, 101.2, 99.8, 101), (101.2, 101.3, 99.5, 99.7)])
+    matrix = {k: np.vstack([a[k], b[k]]) for k in a}
+    values = detect(matrix)
+    for row, single in enumerate((a, b)):
+        for key, expected in detect(single).items():
+            assert (values[key][row] == expected).all()
@@ -0,0 +1,169 @@
+"""
+Shared-memory price board tests
+Run with: python -m pytest test_price_board.py
+"""
+import os
+import sys
+import threading
+import pytest
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from utils import price_board
+from utils.price_board import PriceBoard, get_price_board, _SEQ, _SEQ_OFFSET
+
+BOARD = f"test_price_board_{os.getpid()}"
+
+
+@pytest.fixture
+def board():
+    writer = PriceBoard(name=BOARD, capacity=4, create=True)
+    yield writer
+    if writer.buf is not None:
+        writer.unlink()
+        writer.close()
+    for attr in ('_reader_board', '_retired_reader'):
+        if getattr(price_board, attr) is not None:
+            getattr(price_board, attr).close()
+            setattr(price_board, attr, None)
+
+
+def test_reader_sees_published_ticker(board):
+    board.publish('BTC-USD', 100.0, 99.5, 100.5, 12.0, ts=1000.0)
+    reader = PriceBoard(name=BOARD)
+    assert reader.read('BTC-USD') == {'price': 100.0, 'best_bid': 99.5, 'best_ask': 100.5,
+                                      'volume_24h': 12.0, 'time': 1000.0, 'seq': 1}
+    board.publish('ETH-USD', 10.0)
+    assert reader.products() == ['BTC-USD', 'ETH-USD']
+    assert reader.get_price('ETH-USD') == 10.0
+    assert reader.read('SOL-USD') is None
+    reader.close()
+
+
+def test_board_rejects_extra_products(board):
+    for i in range(4):
+        board.publish(f'P{i}-USD', 1.0)
+    with pytest.raises(ValueError):
+        board.publish('P4-USD', 1.0)
+
+
+def test_slot_mid_write_is_not_returned(board):
+    board.publish('BTC-USD', 100.0)
+    offset = board._slot_offset(board.slots['BTC-USD'])
+    seq = _SEQ.unpack_from(board.buf, offset + _SEQ_OFFSET)[0]
+    _SEQ.pack_into(board.buf, offset + _SEQ_OFFSET, seq + 1)  # Writer "stuck" mid-update
+    assert PriceBoard(name=BOARD).read('BTC-USD') is None
+
+
+def test_reads_are_never_torn(board):
+    board.publish('BTC-USD', 0.0, -1.0, 1.0, 0.0)
+    reader = PriceBoard(name=BOARD)
+    stop = threading.Event()
+    torn = []
+
+    def write():
+        price = 0.0
+        while not stop.is_set():
+            price += 1
+            board.publish('BTC-USD', price, price - 1, price + 1, price)
+
+    def read():
+        for _ in range(20000):
+            ticker = reader.read('BTC-USD')
+            if ticker and not (ticker['best_bid'] == ticker['price'] - 1 == ticker['best_ask'] - 2
+                               and ticker['volume_24h'] == ticker['price']):
+                torn.append(ticker)
+
+    writer = threading.Thread(target=write)
+    writer.start()
+    readers = [threading.Thread(target=read) for _ in range(2)]
+    for t in readers:
+        t.start()
+    for t in readers:
+        t.join()
+    stop.set()
+    writer.join()
+    reader.close()
+    assert not torn
+
+
+def test_cached_reader_follows_a_restarted_feed(board):
+    board.publish('BTC-USD', 100.0)
+    assert get_price_board(BOARD).get_price('BTC-USD') == 100.0
+
+    # Feed restart: old segment unlinked, new one created under the same name
+    board.unlink()
+    board.close()
+    restarted = PriceBoard(name=BOARD, capacity=4, create=True)
+    restarted.publish('BTC-USD', 200.0)
+    try:
+        assert get_price_board(BOARD).get_price('BTC-USD') == 200.0
+    finally:
+        restarted.unlink()
+        restarted.close()
+
+
+def test_cached_reader_detects_replaced_segment(board, monkeypatch):
+    board.publish('BTC-USD', 100.0)
+    assert get_price_board(BOARD).get_price('BTC-USD') == 100.0
+
+    # Crashed feed: the name is gone without the segment being retired, then a new feed starts
+    board.shm.unlink()
+    replacement = PriceBoard(name=BOARD, capacity=4, create=True)
+    replacement.publish('BTC-USD', 300.0)
+    monkeypatch.setattr(price_board, 'REOPEN_CHECK_INTERVAL', 0.0)
+    try:
+        assert get_price_board(BOARD).get_price('BTC-USD') == 300.0
+    finally:
+        replacement.unlink()
+        replacement.close()
+        board.close()
+
+
+def test_swapped_out_reader_stays_open_for_threads_still_using_it(board):
+    board.publish('BTC-USD', 100.0)
+    held = get_price_board(BOARD)  # Another thread mid-read keeps this reference
+
+    board.unlink()
+    board.close()
+    restarted = PriceBoard(name=BOARD, capacity=4, create=True)
+    restarted.publish('BTC-USD', 200.0)
+    try:
+        assert get_price_board(BOARD) is not held
+        assert held.get_price('BTC-USD') == 100.0  # Not closed under the reader
+    finally:
+        restarted.unlink()
+        restarted.close()
+
+
+def test_concurrent_readers_survive_feed_restarts(board):
+    board.publish('BTC-USD', 100.0)
+    errors, stop = [], threading.Event()
+
+    def reader():
+        while not stop.is_set():
+            try:
+                reader_board = get_price_board(BOARD)
+                if reader_board is not None:
+                    reader_board.get_price('BTC-USD')
+            except Exception as e:
+                errors.append(e)
+
+    threads = [threading.Thread(target=reader) for _ in range(4)]
+    for t in threads:
+        t.start()
+    writer = board
+    try:
+        for price in range(5):
+            writer.unlink()
+            writer.close()
+            writer = PriceBoard(name=BOARD, capacity=4, create=True)
+            writer.publish('BTC-USD', float(price))
+    finally:
+        stop.set()
+        for t in threads:
+            t.join()
+        if writer is not board:
+            writer.unlink()
+            writer.close()
+    assert errors == []
@@ -0,0 +1,301 @@
+#!/usr/bin/env python3
+"""
+Rate limiter tests
+Run with: python -m pytest test_rate_limiter.py  (Redis tests skip when Redis isn't reachable)
+"""
+import asyncio
+import os
+import sys
+import threading
+import time
+import pytest
+import redis
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from utils.rate_limiter import (RateLimiter, RateLimitExceeded, PRIORITY_BACKGROUND, PRIORITY_CRITICAL,
+                                PRIORITY_NORMAL, GCRA)
+
+
+def spend_concurrently(limiter, threads=20, per_thread=10, api='test_rl'):
+    """Total tokens granted when many threads race for a 50-token bucket that barely refills"""
+    granted = []
+    barrier = threading.Barrier(threads)
+
+    def worker():
+        barrier.wait()
+        for _ in range(per_thread):
+            allowed, _ = limiter.consume(api, max_tokens=50, refill_rate=0.001)
+            granted.append(allowed)
+
+    pool = [threading.Thread(target=worker) for _ in range(threads)]
+    for t in pool:
+        t.start()
+    for t in pool:
+        t.join()
+    return sum(granted)
+
+
+def test_local_bucket_never_overspends():
+    assert spend_concurrently(RateLimiter(use_redis=False)) == 50
+
+
+def test_wait_time_reflects_refill_rate():
+    limiter = RateLimiter(use_redis=False)
+    assert limiter.consume('test_rl', max_tokens=1, refill_rate=2.0) == (True, 0.0)
+    allowed, wait = limiter.consume('test_rl', max_tokens=1, refill_rate=2.0)
+    assert not allowed and 0.45 < wait <= 0.5
+
+
+@pytest.fixture
+def redis_limiter():
+    limiter = RateLimiter(use_redis=True)
+    if not limiter.use_redis:
+        pytest.skip("Local Redis not available")
+    yield limiter
+    for pattern in ("rate_limit:test_rl*", "gcra:test_rl*"):
+        for key in limiter.redis_client.scan_iter(match=pattern):
+            limiter.redis_client.delete(key)
+
+
+def test_redis_bucket_is_atomic_across_clients(redis_limiter):
+    # Two limiters stand in for two processes sharing one bucket
+    other = RateLimiter(use_redis=True)
+    granted = [0, 0]
+    threads = [threading.Thread(target=lambda i=i, l=l: granted.__setitem__(i, spend_concurrently(l, threads=10)))
+               for i, l in enumerate((redis_limiter, other))]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert sum(granted) == 50
+
+
+def test_redis_script_survives_script_flush(redis_limiter):
+    redis_limiter.consume('test_rl', max_tokens=5, refill_rate=1)
+    try:
+        redis_limiter.redis_client.script_flush()
+    except redis.RedisError:
+        pytest.skip("SCRIPT FLUSH not permitted")
+    assert redis_limiter.consume('test_rl', max_tokens=5, refill_rate=1)[0]
+
+
+def test_leased_tokens_respect_global_limit(redis_limiter):
+    leasing = [RateLimiter(use_redis=True, lease_size=10), RateLimiter(use_redis=True, lease_size=10)]
+    granted = sum(spend_concurrently(limiter, threads=5) for limiter in leasing)
+    assert granted + sum(limiter.get_lease_stats()['leased_tokens'] for limiter in leasing) == 50
+    stats = leasing[0].get_lease_stats()
+    assert stats['lease_hits'] > stats['lease_refills']
+
+
+def test_unused_lease_is_returned(redis_limiter):
+    leasing = RateLimiter(use_redis=True, lease_size=10, lease_ttl=60)
+    assert leasing.consume('test_rl', max_tokens=100, refill_rate=0.001)[0]
+    assert leasing.get_lease_stats()['leased_tokens'] == 9
+    leasing.release_leases()
+    tokens = float(redis_limiter.redis_client.hget('rate_limit:test_rl:default', 'tokens'))
+    assert 98.9 < tokens <= 99.01
+
+
+def test_expired_lease_is_returned_without_renewal(redis_limiter):
+    leasing = RateLimiter(use_redis=True, lease_size=10, lease_ttl=0.1)
+    assert leasing.consume('test_rl', max_tokens=100, refill_rate=0.001)[0]
+    time.sleep(0.5)  # The reaper runs every lease_ttl; this key is never used again
+    assert leasing.get_lease_stats()['leased_tokens'] == 0
+    tokens = float(redis_limiter.redis_client.hget('rate_limit:test_rl:default', 'tokens'))
+    assert 98.9 < tokens <= 99.01
+
+
+def test_aimd_backs_off_on_429_and_recovers():
+    limiter = RateLimiter(use_redis=False)
+    limiter.consume('test_aimd', max_tokens=10, refill_rate=10.0)
+    limiter.record_response('test_aimd', 429, {})
+    assert limiter.get_learned_rates()['test_aimd']['learned_rate'] == 5.0
+    limiter.record_response('test_aimd', 429, {})
+    assert limiter.get_learned_rates()['test_aimd']['learned_rate'] == 2.5
+    for _ in range(10):
+        limiter.record_response('test_aimd', 200, {})
+    assert abs(limiter.get_learned_rates()['test_aimd']['learned_rate'] - 4.5) < 1e-9
+
+
+def test_aimd_never_exceeds_configured_rate_without_header():
+    limiter = RateLimiter(use_redis=False)
+    limiter.consume('test_aimd', max_tokens=10, refill_rate=10.0)
+    for _ in range(200):
+        limiter.record_response('test_aimd', 200, {})
+    assert limiter.get_learned_rates()['test_aimd']['learned_rate'] == 10.0
+
+
+def test_429_before_first_consume_still_backs_off():
+    limiter = RateLimiter(use_redis=False)
+    limiter.record_response('test_aimd', 429, {})
+    granted = sum(limiter.consume('test_aimd', max_tokens=10, refill_rate=0.001)[0] for _ in range(10))
+    assert granted == 5
+    assert limiter.get_learned_rates()['test_aimd']['learned_rate'] == 0.0005
+
+
+def test_headers_set_ceiling_and_cooldown():
+    limiter = RateLimiter(use_redis=False)
+    limiter.consume('test_aimd', max_tokens=10, refill_rate=10.0)
+    for _ in range(200):
+        limiter.record_response('test_aimd', 200, {'X-RateLimit-Limit': '12'})
+    assert limiter.get_learned_rates()['test_aimd']['learned_rate'] == 12.0
+
+    limiter.record_response('test_aimd', 429, {'Retry-After': '30'})
+    allowed, wait = limiter.consume('test_aimd', max_tokens=10, refill_rate=10.0)
+    assert not allowed and 29 < wait <= 30
+
+
+def test_acquire_serves_higher_priority_first():
+    limiter = RateLimiter(use_redis=False)
+    limiter.consume('test_acq', max_tokens=1, refill_rate=10.0)  # Bucket now empty
+    order = []
+
+    def waiter(name, priority):
+        limiter.acquire('test_acq', max_tokens=1, refill_rate=10.0, priority=priority)
+        order.append(name)
+
+    background = [threading.Thread(target=waiter, args=(f'bg{i}', PRIORITY_BACKGROUND)) for i in range(3)]
+    for t in background:
+        t.start()
+    time.sleep(0.02)
+    critical = threading.Thread(target=waiter, args=('critical', PRIORITY_CRITICAL))
+    critical.start()
+    for t in background + [critical]:
+        t.join()
+    assert order.index('critical') <= 1
+
+
+def test_decorated_functions_on_one_api_share_a_queue():
+    limiter = RateLimiter(use_redis=False)
+    order, called_at = [], {}
+
+    @limiter.rate_limit('test_acq', max_calls=1, per_seconds=0.1, priority=PRIORITY_BACKGROUND)
+    def refresh_candles(name):
+        order.append(name)
+        called_at[name] = time.time()
+
+    @limiter.rate_limit('test_acq', max_calls=1, per_seconds=0.1, priority=PRIORITY_CRITICAL)
+    def place_order(name):
+        order.append(name)
+        called_at[name] = time.time()
+
+    refresh_candles('first')  # Bucket now empty
+    background = [threading.Thread(target=refresh_candles, args=(f'bg{i}',)) for i in range(3)]
+    for t in background:
+        t.start()
+    time.sleep(0.02)
+    critical = threading.Thread(target=place_order, args=('order',))
+    critical.start()
+    for t in background + [critical]:
+        t.join()
+    assert order.index('order') <= 2
+    assert called_at['order'] - called_at['first'] > 0.05  # Waited on the same bucket
+
+
+def test_coinbase_orders_are_critical_and_candles_background():
+    from utils.base_api_connection import CoinbaseConnection
+    coinbase = CoinbaseConnection.__new__(CoinbaseConnection)  # Skip the credential check
+    assert coinbase.request_priority('POST', '/api/v3/brokerage/orders') == PRIORITY_CRITICAL
+    assert coinbase.request_priority('POST', '/api/v3/brokerage/orders/batch_cancel') == PRIORITY_CRITICAL
+    assert coinbase.request_priority('GET', '/products/BTC-USD/candles') == PRIORITY_BACKGROUND
+    assert coinbase.request_priority('GET', '/api/v3/brokerage/orders/historical') == PRIORITY_NORMAL
+
+
+def test_acquire_timeout_returns_false():
+    limiter = RateLimiter(use_redis=False)
+    limiter.consume('test_acq', max_tokens=1, refill_rate=0.01)
+    started = time.time()
+    assert not limiter.acquire('test_acq', max_tokens=1, refill_rate=0.01, timeout=0.1)
+    assert time.time() - started < 0.5
+
+
+def test_decorator_waits_without_overspending():
+    limiter = RateLimiter(use_redis=False)
+    calls = []
+
+    @limiter.rate_limit('test_acq', max_calls=5, per_seconds=0.5)
+    def call():
+        calls.append(time.time())
+
+    threads = [threading.Thread(target=call) for _ in range(10)]
+    started = time.time()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert len(calls) == 10
+    # 5 from the full bucket, 5 more at 10 tokens/s
+    assert max(calls) - started >= 0.4
+
+
+def test_decorator_raises_after_timeout():
+    limiter = RateLimiter(use_redis=False)
+
+    @limiter.rate_limit('test_acq', max_calls=1, per_seconds=100, timeout=0.05)
+    def call():
+        return True
+
+    assert call()
+    with pytest.raises(RateLimitExceeded):
+        call()
+
+
+def test_acquire_async():
+    limiter = RateLimiter(use_redis=False)
+
+    async def spend():
+        return await asyncio.gather(*(limiter.acquire_async('test_acq', max_tokens=2, refill_rate=20.0)
+                                      for _ in range(4)))
+
+    assert asyncio.run(spend()) == [True] * 4
+
+
+def test_limits_status_is_served_from_snapshot():
+    limiter = RateLimiter(use_redis=False)
+    limiter.consume('test_status', max_tokens=10, refill_rate=0.001)
+    assert int(limiter.get_limits_status()['test_status:default']['tokens']) == 9
+    limiter.consume('test_status', max_tokens=10, refill_rate=0.001)
+    assert int(limiter.get_limits_status()['test_status:default']['tokens']) == 9
+    assert int(limiter.get_limits_status(max_age=0)['test_status:default']['tokens']) == 8
+
+
+def test_redis_limits_status_scans_every_bucket(redis_limiter):
+    for i in range(1200):
+        redis_limiter.consume('test_rl', endpoint=f'e{i}', max_tokens=10, refill_rate=0.001)
+    status = redis_limiter.get_limits_status(max_age=0)
+    assert sum(key.startswith('test_rl:') for key in status) == 1200
+    assert status['test_rl:e7']['max_tokens'] == 10
+
+
+def test_gcra_allows_burst_then_refill_rate():
+    limiter = RateLimiter(use_redis=False)
+    limiter.set_algorithm('test_gcra', GCRA)
+    granted = [limiter.consume('test_gcra', max_tokens=5, refill_rate=10.0) for _ in range(6)]
+    assert [allowed for allowed, _ in granted] == [True] * 5 + [False]
+    assert 0 < granted[-1][1] <= 0.1
+    assert limiter.local_tats and not limiter.local_buckets
+    time.sleep(granted[-1][1])
+    assert limiter.consume('test_gcra', max_tokens=5, refill_rate=10.0)[0]
+
+
+def test_gcra_never_overspends():
+    limiter = RateLimiter(use_redis=False)
+    limiter.set_algorithm('test_rl', GCRA)
+    assert spend_concurrently(limiter) == 50
+    assert int(limiter.get_limits_status(max_age=0)['test_rl:default']['tokens']) == 0
+
+
+def test_unknown_algorithm_is_rejected():
+    with pytest.raises(ValueError):
+        RateLimiter(use_redis=False).set_algorithm('test_gcra', 'leaky')
+
+
+def test_redis_gcra_is_atomic_with_one_key(redis_limiter):
+    other = RateLimiter(use_redis=True)
+    for limiter in (redis_limiter, other):
+        limiter.set_algorithm('test_rl', GCRA)
+    granted = spend_concurrently(redis_limiter, threads=10) + spend_concurrently(other, threads=10)
+    assert granted == 50
+    assert redis_limiter.redis_client.type('gcra:test_rl:default') == 'string'
+    assert redis_limiter.redis_client.pttl('gcra:test_rl:default') > 0
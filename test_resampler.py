@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+"""
+Multi-timeframe resampler tests
+Run with: python -m pytest test_resampler.py
+"""
+import os
+import sys
+import tempfile
+import numpy as np
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from utils.db import init_db
+from utils.candle_store import CandleStore
+from utils.resampler import Resampler, aggregate
+
+init_db()
+
+START = 1_700_000_000 // 3600 * 3600
+
+
+def minutes(n, offset=0):
+    """n synthetic 1m candles starting `offset` minutes after START"""
+    rng = np.random.default_rng(offset)
+    close = 100 + np.cumsum(rng.normal(0, 0.1, n))
+    return [{'product_id': 'BTC-USD', 'interval': '1m', 'start': START + (offset + i) * 60,
+             'open': close[i] - 0.05, 'high': close[i] + 0.2, 'low': close[i] - 0.2,
+             'close': close[i], 'volume': 1.0 + i} for i in range(n)]
+
+
+def make_resampler():
+    store = CandleStore(os.path.join(tempfile.mkdtemp(), 'candles.db'))
+    return Resampler(store=store, intervals=['15m', '1h']), store
+
+
+def test_aggregate_matches_loop():
+    candles = minutes(120)
+    arrays = {f: np.array([c[f] for c in candles], dtype=float) for f in ('start', 'open', 'high', 'low', 'close', 'volume')}
+    bars = aggregate(arrays, 900)
+    assert len(bars['start']) == 8
+    chunk = candles[15:30]
+    assert bars['open'][1] == chunk[0]['open'] and bars['close'][1] == chunk[-1]['close']
+    assert bars['high'][1] == max(c['high'] for c in chunk)
+    assert bars['low'][1] == min(c['low'] for c in chunk)
+    assert bars['volume'][1] == sum(c['volume'] for c in chunk)
+
+
+def test_live_updates_emit_completed_bars_like_batch():
+    live, live_store = make_resampler()
+    emitted = []
+    live.register_callback(emitted.append)
+    candles = minutes(125)
+    for candle in candles:
+        live_store.save_candles('BTC-USD', '1m', [candle])
+        live.on_candle(candle)
+    assert [c['interval'] for c in emitted].count('15m') == 8
+    assert [c['interval'] for c in emitted].count('1h') == 2
+
+    batch, batch_store = make_resampler()
+    batch_store.save_candles('BTC-USD', '1m', candles)
+    assert batch.catch_up('BTC-USD', '15m', now=START + 125 * 60) == 8
+    expected = batch_store.get_candles('BTC-USD', '15m')
+    stored = live_store.get_candles('BTC-USD', '15m')
+    for field in expected:
+        assert np.allclose(stored[field], expected[field])
+
+
+def test_restart_mid_bucket_seeds_from_store():
+    resampler, store = make_resampler()
+    candles = minutes(30)
+    store.save_candles('BTC-USD', '1m', candles[:20])
+    emitted = []
+    resampler.register_callback(emitted.append)
+    for candle in candles[20:]:
+        store.save_candles('BTC-USD', '1m', [candle])
+        resampler.on_candle(candle)
+    bar = [c for c in emitted if c['interval'] == '15m'][-1]
+    assert bar['open'] == candles[15]['open'] and bar['volume'] == sum(c['volume'] for c in candles[15:30])
+
+
+def test_resample_is_cached_until_new_base_candle():
+    resampler, store = make_resampler()
+    store.save_candles('BTC-USD', '1m', minutes(180))
+    now = START + 180 * 60
+    first = resampler.resample('BTC-USD', '1h', now=now)
+    assert len(first['start']) == 3
+    assert resampler.resample('BTC-USD', '1h', now=now) is first
+    store.save_candles('BTC-USD', '1m', minutes(1, offset=180))
+    assert resampler.resample('BTC-USD', '1h', now=now + 60) is not first
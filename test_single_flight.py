@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+"""
+Single-flight coalescing tests (no network)
+Run with: python -m pytest test_single_flight.py
+"""
+import os
+import sys
+import threading
+import time
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from utils.single_flight import SingleFlight, normalize_key
+
+
+def run_concurrently(n, fn):
+    barrier = threading.Barrier(n)
+    results, errors = [], []
+
+    def worker():
+        barrier.wait()
+        try:
+            results.append(fn())
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=worker) for _ in range(n)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return results, errors
+
+
+def test_concurrent_calls_share_one_execution():
+    group = SingleFlight()
+    calls = []
+
+    def fetch():
+        calls.append(1)
+        time.sleep(0.2)
+        return {'price': 100.0}
+
+    results, errors = run_concurrently(8, lambda: group.do('ticker', fetch))
+    assert not errors
+    assert len(calls) == 1
+    assert results == [{'price': 100.0}] * 8
+    assert len({id(r) for r in results}) == 8  # Each caller owns its copy
+    assert group.get_stats() == {'executed': 1, 'shared': 7, 'in_flight': 0}
+
+
+def test_errors_propagate_to_waiters_and_next_call_retries():
+    group = SingleFlight()
+
+    def fail():
+        time.sleep(0.2)
+        raise ValueError('boom')
+
+    results, errors = run_concurrently(4, lambda: group.do('k', fail))
+    assert len(errors) == 4 and all(isinstance(e, ValueError) for e in errors)
+    assert group.do('k', lambda: 'ok') == 'ok'
+
+
+def test_key_normalization():
+    a = normalize_key('TAAPI', 'GET', '/rsi', params={'symbol': 'BTC/USD', 'secret': 'x', 'interval': '1h'})
+    b = normalize_key('TAAPI', 'GET', '/rsi', params=[('interval', '1h'), ('symbol', 'BTC/USD')])
+    assert a == b
+    assert normalize_key('X', params={'nonce': 1}, exclude=('nonce',)) == normalize_key('X', params={'nonce': 2}, exclude=('nonce',))
+    assert normalize_key('X', body={'a': 1, 'b': 2}) == normalize_key('X', body={'b': 2, 'a': 1})
+
+
+def test_make_request_coalesces_gets():
+    from utils.base_api_connection import BaseAPIConnection
+
+    class FakeResponse:
+        text = '{}'
+        status_code = 200
+        headers = {}
+
+        def raise_for_status(self):
+            pass
+
+        def json(self):
+            return {'ok': True}
+
+    class FakeSession:
+        calls = 0
+
+        def request(self, method, url, **kwargs):
+            FakeSession.calls += 1
+            time.sleep(0.2)
+            return FakeResponse()
+
+    class FakeConnection(BaseAPIConnection):
+        def test_connection(self):
+            return True
+
+    conn = FakeConnection('FAKE')
+    conn.session = FakeSession()
+    results, _ = run_concurrently(5, lambda: conn.make_request('GET', '/thing', params={'a': 1, 'secret': 's'}))
+    assert results == [{'ok': True}] * 5
+    assert FakeSession.calls == 1
+
+    run_concurrently(3, lambda: conn.make_request('POST', '/order', json={'a': 1}))
+    assert FakeSession.calls == 4  # POSTs are never coalesced
@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+"""
+TAAPI micro-batching tests (no network)
+Run with: python -m pytest test_taapi_batcher.py
+"""
+import os
+import sys
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from utils.taapi import build_constructs, build_bulk_query, demux_bulk
+from utils.taapi_batcher import TaapiBatcher
+from utils.taapi_cache import taapi_cache
+
+
+def fake_bulk(calls):
+    """Bulk endpoint stand-in: echoes each query id with a result"""
+    def bulk(queries):
+        calls.append(queries)
+        return {'data': [
+            {'id': q['id'], 'indicator': q['indicator'], 'result': {'value': float(len(q['indicator']))}, 'errors': []}
+            if q['indicator'] != 'bad' else {'id': q['id'], 'result': {}, 'errors': ['unknown indicator']}
+            for q in queries
+        ]}
+    return bulk
+
+
+def test_construct_format():
+    constructs = build_constructs([
+        {'exchange': 'binance', 'symbol': 'BTC/USD', 'interval': '30m', 'indicator': 'rsi', 'id': 'a'},
+        {'exchange': 'binance', 'symbol': 'BTC/USD', 'interval': '30m', 'indicator': 'bbands', 'id': 'b', 'period': 20},
+        {'exchange': 'binance', 'symbol': 'ETH/USD', 'interval': '30m', 'indicator': 'rsi', 'id': 'c'}
+    ])
+    assert constructs[0] == {'exchange': 'binance', 'symbol': 'BTC/USD', 'interval': '30m', 'indicators': [
+        {'indicator': 'rsi', 'id': 'a'}, {'indicator': 'bbands', 'id': 'b', 'period': 20}]}
+    assert len(constructs) == 2
+    assert demux_bulk({'data': [{'id': 'a', 'result': {'value': 1}, 'errors': []},
+                                {'id': 'b', 'result': {}, 'errors': ['x']}]}) == {'a': {'value': 1}, 'b': None}
+
+
+def test_bulk_limits():
+    queries = [{'exchange': 'binance', 'symbol': f'S{i % 5}/USD', 'interval': '1h', 'indicator': f'i{i}'}
+               for i in range(25)]
+    for batch in build_bulk_query(queries):
+        assert len(batch) <= 20
+        assert len({q['symbol'] for q in batch}) <= 3
+
+
+def test_window_collapses_into_one_bulk_call():
+    taapi_cache.clear()
+    calls = []
+    batcher = TaapiBatcher(window=0.05, bulk=fake_bulk(calls))
+    names = ['rsi', 'macd', 'bbands', 'stoch', 'atr', 'rsi', 'bad']
+    futures = [batcher.submit(name, 'binance', 'TEST/USD', '30m') for name in names]
+    results = [f.result(5) for f in futures]
+
+    assert len(calls) == 1
+    assert len(calls[0]) == 6  # Duplicate rsi shared a slot
+    assert results[0] == {'value': 3.0} and results[5] == {'value': 3.0}
+    assert results[-1] is None
+
+    # Results are cached until the candle closes
+    assert batcher.get_indicator('macd', 'binance', 'TEST/USD', '30m') == {'value': 4.0}
+    assert len(calls) == 1
+    stats = batcher.get_stats()
+    assert (stats['coalesced'], stats['cache_hits'], stats['bulk_requests']) == (1, 1, 1)
+    taapi_cache.clear()
+
+
+def test_coalesced_callers_get_their_own_result():
+    taapi_cache.clear()
+    batcher = TaapiBatcher(window=0.05, bulk=fake_bulk([]))
+    first, second = (batcher.submit('rsi', 'binance', 'TEST/USD', '30m') for _ in range(2))
+    mine, theirs = first.result(5), second.result(5)
+    assert mine == theirs == {'value': 3.0} and mine is not theirs
+    mine['value'] = 0.0
+    assert theirs == {'value': 3.0}
+    assert batcher.get_indicator('rsi', 'binance', 'TEST/USD', '30m') == {'value': 3.0}
+    taapi_cache.clear()
@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+"""
+TAAPI response cache tests (no network)
+Run with: python -m pytest test_taapi_cache.py
+"""
+import os
+import sys
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from utils.taapi_cache import TaapiCache
+
+
+def test_repeats_are_served_until_candle_close():
+    cache = TaapiCache(use_redis=False)
+    calls = []
+
+    def fetch():
+        calls.append(1)
+        return {'value': 55.0}
+
+    for _ in range(10):
+        assert cache.get_or_fetch('rsi', 'binance', 'BTC/USD', '1h', {'period': 14}, fetch) == {'value': 55.0}
+    assert len(calls) == 1
+    assert cache.get_stats()['hits'] == 9
+
+
+def test_expiry_aligns_to_candle_boundary():
+    now = 1700000000 + 123  # 1700000000 is not itself on an hour boundary
+    assert TaapiCache(use_redis=False).expires_at('1h', {}, now) == (now // 3600 + 1) * 3600
+    assert TaapiCache(use_redis=False).expires_at('15m', {}, now) == (now // 900 + 1) * 900
+    live = TaapiCache(live_ttl=30, use_redis=False)
+    assert live.expires_at('1h', {}, now) == now + 30
+    assert live.expires_at('1h', {'backtrack': 1}, now) == (now // 3600 + 1) * 3600
+
+
+def test_lru_eviction_and_failures_not_cached():
+    cache = TaapiCache(max_entries=2, use_redis=False)
+    for symbol in ('BTC/USD', 'ETH/USD', 'SOL/USD'):
+        cache.get_or_fetch('rsi', 'binance', symbol, '1h', {}, lambda: {'value': 1.0})
+    assert cache.get_stats()['evictions'] == 1
+    assert cache.get(cache.make_key('rsi', 'binance', 'BTC/USD', '1h')) is None
+
+    assert cache.get_or_fetch('macd', 'binance', 'BTC/USD', '1h', {}, lambda: None) is None
+    assert cache.get(cache.make_key('macd', 'binance', 'BTC/USD', '1h')) is None
+
+
+def test_key_ignores_secret():
+    a = TaapiCache.make_key('rsi', 'binance', 'BTC/USD', '1h', {'secret': 'a', 'period': 14})
+    b = TaapiCache.make_key('rsi', 'binance', 'BTC/USD', '1h', {'period': 14, 'secret': 'b'})
+    assert a == b
+
+
+def test_cached_values_are_copies():
+    cache = TaapiCache(use_redis=False)
+    value = {'value': [1.0, 2.0]}
+    cache.set('k', value, expires_at=float('inf'))
+    value['value'].append(3.0)
+    served = cache.get('k')
+    served['value'].clear()
+    assert cache.get('k') == {'value': [1.0, 2.0]}
+
+
+def test_get_indicator_keeps_secret_out_of_caller_params(monkeypatch):
+    from utils import taapi
+
+    sent = []
+    monkeypatch.setattr(taapi, 'taapi_cache', TaapiCache(use_redis=False))
+    monkeypatch.setattr(taapi, 'get_key', lambda name, master_pass='': 'the-secret')
+    monkeypatch.setattr(taapi, '_fetch_json', lambda url, params, timeout: sent.append(dict(params)) or {'value': 50.0})
+
+    params = {'exchange': 'binance', 'symbol': 'BTC/USD', 'interval': '1h'}
+    result = taapi.get_indicator('rsi', params)
+    assert params == {'exchange': 'binance', 'symbol': 'BTC/USD', 'interval': '1h'}
+    assert sent == [dict(params, secret='the-secret')]
+
+    result['value'] = -1.0
+    assert taapi.get_indicator('rsi', params) == {'value': 50.0}
+    assert len(sent) == 1
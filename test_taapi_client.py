@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+"""
+TAAPI client tests (no network)
+Run with: python -m pytest test_taapi_client.py
+"""
+import os
+import sys
+import threading
+import time
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from utils.db import init_db
+from utils.taapi_client import TaapiClient
+from utils.rate_limiter import rate_limiter
+
+init_db()  # 429s and failures are logged via log_trade
+
+
+class FakeResponse:
+    def __init__(self, status_code=200, headers=None):
+        self.status_code = status_code
+        self.headers = headers or {}
+        self.text = '{}'
+
+    def raise_for_status(self):
+        pass
+
+    def json(self):
+        return {'value': 1.0}
+
+
+class FakeSession:
+    def __init__(self, statuses=None, delay=0.2, retry_after='0.3'):
+        self.statuses = list(statuses or [])
+        self.retry_after = retry_after
+        self.delay = delay
+        self.active = 0
+        self.peak = 0
+        self.calls = 0
+        self.lock = threading.Lock()
+
+    def request(self, method, url, **kwargs):
+        with self.lock:
+            self.calls += 1
+            self.active += 1
+            self.peak = max(self.peak, self.active)
+            status = self.statuses.pop(0) if self.statuses else 200
+        time.sleep(self.delay)
+        with self.lock:
+            self.active -= 1
+        headers = {'Retry-After': self.retry_after} if status == 429 and self.retry_after else None
+        return FakeResponse(status, headers)
+
+
+def test_requests_run_in_parallel_up_to_concurrency():
+    client = TaapiClient(rate_limit=1000, period=1, max_concurrency=3)
+    client.session = FakeSession()
+    start = time.time()
+    futures = [client.submit('GET', f'https://api.taapi.io/rsi?n={i}') for i in range(6)]
+    assert all(f.result().status_code == 200 for f in futures)
+    assert client.session.peak == 3
+    assert time.time() - start < 1.0  # Not serialized at 1 req/s
+    assert client.get_stats()['calls'] == 6
+
+
+def test_429_backoff_honours_retry_after_without_holding_workers():
+    client = TaapiClient(rate_limit=1000, period=1, max_concurrency=1)
+    client.session = FakeSession(statuses=[429], delay=0.0)
+    start = time.time()
+    future = client.submit('GET', 'https://api.taapi.io/rsi')
+    assert future.result().status_code == 200
+    assert 0.3 <= time.time() - start < 2.0
+    assert future.queue_wait < 0.3  # Scheduled backoff is not counted as queue wait
+    stats = client.get_stats()
+    assert stats['rate_limited'] == 1 and stats['retries'] == 1
+
+
+def test_exhausted_retries_resolve_to_none():
+    client = TaapiClient(rate_limit=1000, period=1, max_concurrency=1, max_retries=2)
+    client.session = FakeSession(statuses=[429, 429], delay=0.0)
+    assert client.request('GET', 'https://api.taapi.io/rsi') is None
+    assert client.get_stats()['failures'] == 1
+
+
+def test_429_without_retry_after_sets_the_shared_limiter_cooldown():
+    client = TaapiClient(rate_limit=1000, period=1, max_concurrency=1, initial_backoff=0.3)
+    client.session = FakeSession(statuses=[429], delay=0.0, retry_after=None)
+    start = time.time()
+    future = client.submit('GET', 'https://api.taapi.io/rsi')
+    time.sleep(0.1)
+    assert 0 < rate_limiter.cooldown('taapi') <= 0.3
+    assert client.get_stats()['cooldown_remaining'] > 0
+    assert future.result().status_code == 200
+    assert time.time() - start >= 0.3
+
+
+def test_immediate_retry_keeps_queue_wait_in_seconds():
+    client = TaapiClient(rate_limit=1000, period=1, max_concurrency=1, initial_backoff=0)
+    client.session = FakeSession(statuses=[429], delay=0.0, retry_after=None)
+    future = client.submit('GET', 'https://api.taapi.io/rsi')
+    assert future.result().status_code == 200
+    assert future.queue_wait < 1.0
+    assert client.get_stats()['queue_wait_max'] < 1.0
@@ -0,0 +1,123 @@
+"""
+WebSocket client state tests (no network: messages are fed to on_message directly)
+Run with: python -m pytest test_websocket_client.py
+"""
+import json
+import os
+import sys
+import time
+import pytest
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from utils import market_data_bus, price_board, websocket_client
+from utils.db import init_db
+from utils.market_data_bus import MarketDataSubscriber
+from utils.price_board import PriceBoard
+from utils.websocket_client import CoinbaseWebSocket, is_feed_fresh, get_realtime_price
+
+init_db()
+
+
+def _ticker(product_id, price):
+    return json.dumps({
+        'type': 'ticker', 'product_id': product_id, 'price': str(price),
+        'best_bid': str(price - 1), 'best_ask': str(price + 1), 'volume_24h': '10'
+    })
+
+
+def _match(product_id, price, trade_id):
+    return json.dumps({
+        'type': 'match', 'product_id': product_id, 'price': str(price), 'size': '1',
+        'side': 'buy', 'trade_id': trade_id
+    })
+
+
+def test_subscriptions_are_refcounted():
+    ws = CoinbaseWebSocket(products=[])
+    assert ws.acquire_products(['BTC/USD', 'ETH-USD']) == ['BTC-USD', 'ETH-USD']
+    assert ws.acquire_products(['BTC-USD']) == []
+    assert ws.release_products(['BTC-USD']) == []
+    assert ws.products == ['BTC-USD', 'ETH-USD']
+    assert ws.release_products(['BTC/USD']) == ['BTC-USD']
+    assert ws.products == ['ETH-USD']
+    assert ws.release_products(['BTC-USD']) == []  # Releasing an unheld product is a no-op
+    assert ws.acquire_products(['BTC-USD']) == ['BTC-USD']
+
+
+def test_release_drops_product_state():
+    ws = CoinbaseWebSocket(products=[])
+    ws.acquire_products(['BTC-USD', 'ETH-USD'])
+    for product_id in ('BTC-USD', 'ETH-USD'):
+        ws.on_message(None, _ticker(product_id, 100))
+        ws.on_message(None, _match(product_id, 100, 1))
+    assert ws.get_price('BTC-USD') == 100
+
+    ws.release_products(['BTC-USD'])
+    assert ws.get_price('BTC-USD') is None
+    assert 'BTC-USD' not in ws.trades and 'BTC-USD' not in ws.open_candles
+    assert 'BTC-USD' not in ws.telemetry.get_status()['products']
+    assert ws.get_price('ETH-USD') == 100
+
+    # Re-acquired products start from fresh data
+    ws.acquire_products(['BTC-USD'])
+    assert ws.get_price('BTC-USD') is None
+    ws.on_message(None, _ticker('BTC-USD', 200))
+    assert ws.get_price('BTC-USD') == 200
+
+
+@pytest.fixture
+def sources(monkeypatch):
+    """Fresh WebSocket, no price board and no bus subscriber for the freshness guard"""
+    ws = CoinbaseWebSocket(products=[])
+    monkeypatch.setattr(websocket_client, 'coinbase_ws', ws)
+    monkeypatch.setattr(price_board, 'get_price_board', lambda: None)
+    monkeypatch.setattr(market_data_bus, 'subscriber', None)
+    return ws
+
+
+def test_fresh_websocket_feed(sources):
+    sources.acquire_products(['BTC-USD'])
+    sources.on_message(None, _ticker('BTC-USD', 100))
+    assert not is_feed_fresh('BTC/USD')  # Socket not connected
+    sources.connected = True
+    assert is_feed_fresh('BTC/USD') and get_realtime_price('BTC/USD') == 100
+    assert not is_feed_fresh('BTC/USD', max_age=-1)
+
+
+def test_fresh_price_board(sources, monkeypatch):
+    board = PriceBoard(name=f"test_fresh_board_{os.getpid()}", capacity=4, create=True)
+    monkeypatch.setattr(price_board, 'get_price_board', lambda: board)
+    try:
+        board.publish('BTC-USD', 100.0, ts=time.time())
+        assert is_feed_fresh('BTC/USD') and get_realtime_price('BTC/USD') == 100.0
+        board.publish('BTC-USD', 101.0, ts=time.time() - 60)  # Feed process stalled
+        assert not is_feed_fresh('BTC/USD') and get_realtime_price('BTC/USD') == 101.0
+    finally:
+        board.unlink()
+        board.close()
+
+
+def test_fresh_bus_subscriber(sources, monkeypatch):
+    subscriber = MarketDataSubscriber(prefix='test_market')
+    monkeypatch.setattr(market_data_bus, 'subscriber', subscriber)
+    subscriber._apply('ticker', 'BTC-USD', {'price': 100.0})  # Primed from the last published value
+    assert get_realtime_price('BTC/USD') == 100.0 and not is_feed_fresh('BTC/USD')
+    subscriber._on_message({'channel': 'test_market:ticker:BTC-USD', 'data': json.dumps({'price': 101.0})})
+    assert is_feed_fresh('BTC/USD') and get_realtime_price('BTC/USD') == 101.0
+    subscriber.last_message['BTC-USD'] -= 60
+    assert not is_feed_fresh('BTC/USD')
+
+
+def test_no_source_is_not_fresh(sources):
+    assert not is_feed_fresh('BTC/USD') and get_realtime_price('BTC/USD') is None
+
+
+def test_stale_websocket_price_falls_through_to_bus(sources, monkeypatch):
+    sources.acquire_products(['BTC-USD'])
+    sources.on_message(None, _ticker('BTC-USD', 90))  # Restored snapshot price, socket never connects
+    subscriber = MarketDataSubscriber(prefix='test_market')
+    monkeypatch.setattr(market_data_bus, 'subscriber', subscriber)
+    assert get_realtime_price('BTC/USD') == 90 and not is_feed_fresh('BTC/USD')
+    subscriber._on_message({'channel': 'test_market:ticker:BTC-USD', 'data': json.dumps({'price': 101.0})})
+    assert is_feed_fresh('BTC/USD') and get_realtime_price('BTC/USD') == 101.0
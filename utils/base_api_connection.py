@@ -5,8 +5,14 @@ All API connections MUST use this pattern for consistency
 import os
 import logging
 import requests
-from typing import Optional, Dict, Any
+from datetime import datetime, timezone
+from typing import Optional, Dict, Any, List
 from dotenv import load_dotenv
+from utils.taapi_cache import taapi_cache
+from utils.single_flight import single_flight, normalize_key
+from utils.taapi_client import taapi_client
+from utils.rate_limiter import (rate_limiter, PRIORITY_CRITICAL, PRIORITY_NORMAL, PRIORITY_BACKGROUND,
+                                COINBASE_RATE_LIMIT)
 
 # Load environment variables
 load_dotenv()
@@ -21,6 +27,10 @@ class BaseAPIConnection:
     Ensures consistent pattern across the entire codebase.
     """
     
+    # Request coalescing: which methods are safe to share, and params that don't affect the response
+    single_flight_methods = ('GET',)
+    single_flight_exclude = ('secret',)
+    
     def __init__(self, api_name: str):
         """Initialize API connection with environment variables only"""
         self.api_name = api_name.upper()
@@ -62,15 +72,33 @@ class BaseAPIConnection:
             'Content-Type': 'application/json'
         }
         
+    def single_flight_key(self, method: str, url: str, kwargs: Dict[str, Any]) -> str:
+        """
+        Identity of a request for coalescing. Override to change normalization;
+        params named in single_flight_exclude (credentials, nonces) are ignored.
+        """
+        return normalize_key(self.api_name, method.upper(), url, params=kwargs.get('params'),
+                             body=kwargs.get('json'), exclude=self.single_flight_exclude)
+        
     def make_request(self, method: str, endpoint: str, **kwargs) -> Optional[Dict[str, Any]]:
         """Make standardized API request with error handling"""
         if not self.is_connected:
             self._log_error("Cannot make request - connection not established")
             return None
             
+        url = f"{self.base_url}{endpoint}" if self.base_url else endpoint
+        if method.upper() in self.single_flight_methods:
+            # Identical concurrent requests (e.g. every bot's cycle starting together) share one call
+            key = self.single_flight_key(method, url, kwargs)
+            return single_flight.do(key, lambda: self._send(method, url, endpoint, **kwargs))
+        return self._send(method, url, endpoint, **kwargs)
+        
+    def _send(self, method: str, url: str, endpoint: str, **kwargs) -> Optional[Dict[str, Any]]:
+        """Perform the HTTP request"""
         try:
-            url = f"{self.base_url}{endpoint}" if self.base_url else endpoint
             response = self.session.request(method, url, **kwargs)
+            # Feed 429s and rate-limit headers back into this API's learned rate
+            rate_limiter.record_response(self.api_name.lower(), response.status_code, response.headers)
             response.raise_for_status()
             return response.json() if response.text else {}
         except Exception as e:
@@ -81,6 +109,11 @@ class BaseAPIConnection:
 class CoinbaseConnection(BaseAPIConnection):
     """Coinbase-specific API connection"""
     
+    # Public market data (no auth): at most 300 candles per request, fixed granularities
+    candles_url = os.getenv('COINBASE_CANDLES_URL', 'https://api.exchange.coinbase.com')
+    candle_page_size = 300
+    candle_granularities = (60, 300, 900, 3600, 21600, 86400)
+    
     def __init__(self):
         # Check for CDP keys first
         self.cdp_key_name = os.getenv('COINBASE_API_KEY_NAME')
@@ -117,6 +150,36 @@ class CoinbaseConnection(BaseAPIConnection):
         except Exception as e:
             self._log_error("Connection test failed", e)
             return False
+            
+    def request_priority(self, method: str, endpoint: str) -> int:
+        """Order placement and cancellation go first, candle backfills last"""
+        if method.upper() in ('POST', 'DELETE') and '/orders' in endpoint:
+            return PRIORITY_CRITICAL
+        if endpoint.endswith('/candles'):
+            return PRIORITY_BACKGROUND
+        return PRIORITY_NORMAL
+    
+    def _send(self, method: str, url: str, endpoint: str, **kwargs) -> Optional[Dict[str, Any]]:
+        """Wait for the shared Coinbase bucket (after single-flight coalescing), then send"""
+        rate_limiter.acquire('coinbase', max_tokens=COINBASE_RATE_LIMIT, refill_rate=COINBASE_RATE_LIMIT,
+                             priority=self.request_priority(method, endpoint))
+        return super()._send(method, url, endpoint, **kwargs)
+    
+    def get_candles(self, product_id: str, granularity: int, start: int, end: int) -> Optional[List[List[float]]]:
+        """
+        Candles with start times in [start, end] as [time, low, high, open, close, volume]
+        rows, newest first. The range may span at most candle_page_size candles.
+        """
+        endpoint = f"/products/{product_id}/candles"
+        url = f"{self.candles_url}{endpoint}"
+        params = {
+            'granularity': granularity,
+            'start': datetime.fromtimestamp(start, timezone.utc).isoformat(),
+            'end': datetime.fromtimestamp(end, timezone.utc).isoformat()
+        }
+        return single_flight.do(self.single_flight_key('GET', url, {'params': params}),
+                                lambda: self._send('GET', url, endpoint, params=params,
+                                                   headers=self.get_headers(), timeout=10))
 
 
 class TaapiConnection(BaseAPIConnection):
@@ -161,14 +224,29 @@ class TaapiConnection(BaseAPIConnection):
             return None
             
         endpoint = f"/{indicator}"
-        params.update({
+        query = dict(params)
+        query.update({
             'secret': self.api_key,
             'exchange': exchange,
             'symbol': symbol,
             'interval': interval
         })
         
-        return self.make_request('GET', endpoint, params=params)
+        # Values only change at candle close - serve repeats from the shared cache
+        return taapi_cache.get_or_fetch(indicator, exchange, symbol, interval, params,
+                                        lambda: self.make_request('GET', endpoint, params=query))
+
+    def _send(self, method: str, url: str, endpoint: str, **kwargs) -> Optional[Dict[str, Any]]:
+        """Route through the shared TAAPI client so every caller draws from one rate budget"""
+        response = taapi_client.request(method, url, **kwargs)
+        if response is None:
+            self._log_error(f"Request failed for {endpoint}")
+            return None
+        try:
+            return response.json() if response.text else {}
+        except ValueError as e:
+            self._log_error(f"Invalid JSON from {endpoint}", e)
+            return None
 
 
 class TwitterConnection(BaseAPIConnection):
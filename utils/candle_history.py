@@ -0,0 +1,218 @@
+"""
+Candle history manager
+Backfills each (symbol, interval) into the local candle store once - paginated,
+oldest page first and through the rate-limited clients - then only fetches the
+missing tail on later refreshes. What has been synced is tracked as a coverage
+range, so live WebSocket candles in the same table never mask missing history. Coinbase's public candles endpoint is used where
+its granularities allow, TAAPI's candles endpoint otherwise. With resampling on,
+only the 1m series is fetched and higher intervals are derived from it.
+"""
+import os
+import threading
+import time
+from typing import Dict, List, Optional, Any, Iterable, Tuple
+import numpy as np
+from utils.db import log_trade
+from utils.candle_store import candle_store, CandleStore, INTERVAL_SECONDS, to_product_id
+from utils.resampler import resampler, Resampler, BASE_INTERVAL
+
+# Bars fetched on the first sync of a (symbol, interval)
+DEFAULT_HISTORY_BARS = int(os.getenv('CANDLE_HISTORY_BARS', 100000))
+TAAPI_PAGE_SIZE = 300
+
+
+def parse_coinbase_candles(data: Any, start: int, end: int) -> Optional[List[tuple]]:
+    """Coinbase [time, low, high, open, close, volume] rows -> store rows inside [start, end)"""
+    if not isinstance(data, list):
+        return None
+    return [(row[0], row[3], row[2], row[1], row[4], row[5]) for row in data if start <= row[0] < end]
+
+
+class CandleHistory:
+    """Keeps stored candle history complete up to the last closed candle"""
+
+    def __init__(self, store: CandleStore = candle_store, bars: int = DEFAULT_HISTORY_BARS,
+                 coinbase: Any = None, taapi_exchange: str = 'coinbase', master_pass: str = '',
+                 resampler: Optional[Resampler] = resampler):
+        self.store = store
+        self.resampler = resampler
+        self.bars = bars
+        self.coinbase = coinbase
+        self.taapi_exchange = taapi_exchange
+        self.master_pass = master_pass
+        self.locks: Dict[Tuple[str, str], threading.Lock] = {}
+        self.locks_lock = threading.Lock()
+        self.thread = None
+        self.running = False
+        self.pages = 0
+        self.candles_written = 0
+        self.failures = 0
+
+    def _lock(self, symbol: str, interval: str) -> threading.Lock:
+        """One sync at a time per (symbol, interval)"""
+        with self.locks_lock:
+            return self.locks.setdefault((to_product_id(symbol), interval), threading.Lock())
+
+    def _coinbase(self):
+        """CoinbaseConnection, created on first use (its constructor tests credentials)"""
+        if self.coinbase is None:
+            from utils.base_api_connection import CoinbaseConnection
+            self.coinbase = CoinbaseConnection()
+        return self.coinbase
+
+    def source(self, interval: str) -> str:
+        """'coinbase' when the exchange serves this granularity, else 'taapi'"""
+        from utils.base_api_connection import CoinbaseConnection
+        return 'coinbase' if INTERVAL_SECONDS[interval] in CoinbaseConnection.candle_granularities else 'taapi'
+
+    def sync(self, symbol: str, interval: str, bars: Optional[int] = None,
+             now: Optional[float] = None) -> int:
+        """
+        Backfill `bars` candles on first use, afterwards fetch only what lies outside the
+        synced coverage - the tail since the last sync, and older history if `bars` grew.
+        Live candles stored in between don't count. In-progress candles are never stored.
+        Returns candles written.
+        """
+        if self.resampler is not None and interval != BASE_INTERVAL:
+            # One base series per symbol; higher intervals are aggregated locally
+            self.sync(symbol, BASE_INTERVAL, bars, now)
+            with self._lock(symbol, interval):
+                return self._resample(symbol, interval)
+
+        seconds = INTERVAL_SECONDS[interval]
+        end = int(now if now is not None else time.time()) // seconds * seconds  # Start of the open candle
+        target = end - (bars or self.bars) * seconds
+        with self._lock(symbol, interval):
+            covered = self.store.coverage(symbol, interval)
+            if covered is None or covered[1] < target:
+                # First sync, or the last one is too old to join up with the window
+                covered = (target, target)
+            written = 0
+            if covered[0] > target:
+                written, covered = self._fetch_range(symbol, interval, target, covered[0], covered, end)
+            if covered[1] < end:
+                tail, covered = self._fetch_range(symbol, interval, covered[1], end, covered, end)
+                written += tail
+            return written
+
+    def _resample(self, symbol: str, interval: str) -> int:
+        """Aggregate the synced base coverage into `interval` buckets not resampled yet"""
+        base = self.store.coverage(symbol, BASE_INTERVAL)
+        if base is None:
+            return 0
+        seconds = INTERVAL_SECONDS[interval]
+        low = -(-base[0] // seconds) * seconds  # First bucket fully inside the base coverage
+        high = base[1] // seconds * seconds
+        covered = self.store.coverage(symbol, interval)
+        if covered is None or covered[0] > low or covered[1] < low:
+            covered = (low, low)
+        if covered[1] >= high:
+            return 0
+        written = self.resampler.catch_up(symbol, interval, now=high, start=covered[1])
+        self.store.set_coverage(symbol, interval, covered[0], high)
+        return written
+
+    def _fetch_range(self, symbol: str, interval: str, start: int, end: int,
+                     covered: Tuple[int, int], current: int) -> Tuple[int, Tuple[int, int]]:
+        """
+        Fetch [start, end) page by page, extending the adjoining `covered` range as each
+        page is stored; `current` is the open candle. Pages run outward from the coverage
+        (oldest first for the tail) so it stays contiguous when a page fails.
+        Returns (written, covered).
+        """
+        seconds = INTERVAL_SECONDS[interval]
+        source = self.source(interval)
+        page_size = self._coinbase().candle_page_size if source == 'coinbase' else TAAPI_PAGE_SIZE
+        pages = range(start, end, page_size * seconds)
+        written = 0
+        for page_start in (reversed(pages) if end <= covered[0] else pages):
+            page_end = min(page_start + page_size * seconds, end)
+            if source == 'coinbase':
+                rows = self._coinbase_page(symbol, seconds, page_start, page_end)
+            else:
+                rows = self._taapi_page(symbol, interval, page_start, page_end, current)
+            self.pages += 1
+            if rows is None:
+                # Stop here; the next sync resumes from the edge of the coverage
+                self.failures += 1
+                log_trade('candles', 'error', f"History fetch failed for {symbol} {interval} at {page_start}")
+                break
+            written += self.store.save_candles(symbol, interval, rows)
+            covered = (min(covered[0], page_start), max(covered[1], page_end))
+            self.store.set_coverage(symbol, interval, *covered)
+        self.candles_written += written
+        return written, covered
+
+    def _coinbase_page(self, symbol: str, seconds: int, page_start: int, page_end: int) -> Optional[List[tuple]]:
+        """Coinbase rows for [page_start, page_end) as (start, open, high, low, close, volume)"""
+        data = self._coinbase().get_candles(to_product_id(symbol), seconds, page_start, page_end - seconds)
+        return parse_coinbase_candles(data, page_start, page_end)
+
+    def _taapi_page(self, symbol: str, interval: str, page_start: int, page_end: int,
+                    end: int) -> Optional[List[tuple]]:
+        """TAAPI rows for [page_start, page_end); backtrack counts back from the open candle at `end`"""
+        from utils.taapi import get_indicator
+        seconds = INTERVAL_SECONDS[interval]
+        params = {
+            'exchange': self.taapi_exchange,
+            'symbol': symbol,
+            'interval': interval,
+            'period': (page_end - page_start) // seconds,
+            'backtrack': (end - page_end) // seconds + 1
+        }
+        data = get_indicator('candles', params, self.master_pass)
+        if isinstance(data, dict):
+            data = data.get('value')
+        if not isinstance(data, list):
+            return None
+        return [(c['timestamp'], c['open'], c['high'], c['low'], c['close'], c['volume']) for c in data
+                if isinstance(c, dict) and page_start <= c.get('timestamp', -1) < page_end]
+
+    def get_history(self, symbol: str, interval: str, limit: Optional[int] = None,
+                    refresh: bool = True) -> Dict[str, np.ndarray]:
+        """Stored candles (see CandleStore.get_candles), syncing the missing tail first"""
+        if refresh:
+            try:
+                self.sync(symbol, interval)
+            except Exception as e:
+                log_trade('candles', 'error', f"History sync failed for {symbol} {interval}: {str(e)}")
+        return self.store.get_candles(symbol, interval, limit=limit)
+
+    def refresh(self, pairs: Iterable[Tuple[str, str]]) -> int:
+        """Sync every (symbol, interval); returns candles written"""
+        written = 0
+        for symbol, interval in pairs:
+            try:
+                written += self.sync(symbol, interval)
+            except Exception as e:
+                log_trade('candles', 'error', f"History sync failed for {symbol} {interval}: {str(e)}")
+        return written
+
+    def start(self, pairs: Iterable[Tuple[str, str]], period: float = 60.0):
+        """Backfill in the background, then refresh the tails every `period` seconds"""
+        pairs = sorted(set(pairs))
+        self.running = True
+
+        def loop():
+            while self.running:
+                self.refresh(pairs)
+                time.sleep(period)
+
+        self.thread = threading.Thread(target=loop, name="CandleHistory", daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        """Stop the background refresh"""
+        self.running = False
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Pages fetched and candles written"""
+        return {
+            'pages': self.pages,
+            'candles_written': self.candles_written,
+            'failures': self.failures
+        }
+
+
+# Global history manager
+candle_history = CandleHistory()
@@ -0,0 +1,265 @@
+"""
+Local OHLCV candle store
+SQLite-backed history per (product, interval), read back as NumPy arrays for the
+local indicator engine. Fed by closed WebSocket candles and history backfills.
+"""
+import os
+import sqlite3
+import threading
+import time
+from typing import Dict, List, Optional, Any, Iterable, Tuple
+import numpy as np
+from utils.db import DB_PATH
+
+CANDLE_DB_PATH = os.path.join(os.path.dirname(DB_PATH), 'candles.db')
+
+# Interval names shared with TAAPI, in seconds
+INTERVAL_SECONDS = {
+    '1m': 60, '5m': 300, '15m': 900, '30m': 1800,
+    '1h': 3600, '2h': 7200, '4h': 14400, '6h': 21600, '12h': 43200,
+    '1d': 86400
+}
+
+FIELDS = ('start', 'open', 'high', 'low', 'close', 'volume')
+
+
+def to_product_id(symbol: str) -> str:
+    """BTC/USD -> BTC-USD"""
+    return symbol.replace('/', '-')
+
+
+class CandleStore:
+    """Candle history in SQLite, one row per (product, interval, start)"""
+
+    def __init__(self, path: str = CANDLE_DB_PATH):
+        self.path = path
+        self.local = threading.local()
+        self.init_lock = threading.Lock()
+        self.initialized = False
+
+    def _connect(self) -> sqlite3.Connection:
+        """One connection per thread (bots, socket and backfill threads write concurrently)"""
+        conn = getattr(self.local, 'conn', None)
+        if conn is None:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=30)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self.local.conn = conn
+            with self.init_lock:
+                if not self.initialized:
+                    self._init_db(conn)
+                    self.initialized = True
+        return conn
+
+    def _init_db(self, conn: sqlite3.Connection):
+        """Create tables if they don't exist"""
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS candles (
+                product_id TEXT,
+                interval TEXT,
+                start INTEGER,
+                open REAL,
+                high REAL,
+                low REAL,
+                close REAL,
+                volume REAL,
+                PRIMARY KEY (product_id, interval, start)
+            ) WITHOUT ROWID
+        ''')
+        # Range backfill checkpoints: a chunk is recorded in the same transaction as its candles
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS backfill_chunks (
+                product_id TEXT,
+                interval TEXT,
+                chunk_start INTEGER,
+                chunk_end INTEGER,
+                candles INTEGER,
+                completed_at REAL,
+                PRIMARY KEY (product_id, interval, chunk_start)
+            )
+        ''')
+        # History sync coverage: the contiguous [start, end) fetched from the exchange (or
+        # resampled from it), kept apart from live candles that land in the same table
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS history_coverage (
+                product_id TEXT,
+                interval TEXT,
+                start INTEGER,
+                end INTEGER,
+                updated_at REAL,
+                PRIMARY KEY (product_id, interval)
+            )
+        ''')
+        conn.commit()
+
+    def save_candles(self, symbol: str, interval: str, candles: Iterable[Any]) -> int:
+        """
+        Insert or replace candles.
+        Accepts dicts with FIELDS keys or (start, open, high, low, close, volume) rows.
+        """
+        product_id = to_product_id(symbol)
+        rows = []
+        for c in candles:
+            if isinstance(c, dict):
+                c = (c['start'], c['open'], c['high'], c['low'], c['close'], c['volume'])
+            rows.append((product_id, interval, int(c[0]), float(c[1]), float(c[2]),
+                         float(c[3]), float(c[4]), float(c[5])))
+        if not rows:
+            return 0
+
+        conn = self._connect()
+        conn.executemany('''
+            INSERT OR REPLACE INTO candles
+            (product_id, interval, start, open, high, low, close, volume)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+        ''', rows)
+        conn.commit()
+        return len(rows)
+
+    def save_chunks(self, interval: str, chunks: Iterable[tuple]) -> int:
+        """
+        Bulk-write fetched backfill chunks - (symbol, chunk_start, chunk_end, rows) -
+        and their checkpoints in one transaction. Returns candles written.
+        """
+        candle_rows, checkpoints = [], []
+        now = time.time()
+        for symbol, chunk_start, chunk_end, rows in chunks:
+            product_id = to_product_id(symbol)
+            candle_rows.extend((product_id, interval, int(c[0]), float(c[1]), float(c[2]),
+                                float(c[3]), float(c[4]), float(c[5])) for c in rows)
+            checkpoints.append((product_id, interval, int(chunk_start), int(chunk_end), len(rows), now))
+        if not checkpoints:
+            return 0
+
+        conn = self._connect()
+        with conn:
+            conn.executemany('''
+                INSERT OR REPLACE INTO candles
+                (product_id, interval, start, open, high, low, close, volume)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+            ''', candle_rows)
+            conn.executemany('''
+                INSERT OR REPLACE INTO backfill_chunks
+                (product_id, interval, chunk_start, chunk_end, candles, completed_at)
+                VALUES (?, ?, ?, ?, ?, ?)
+            ''', checkpoints)
+        return len(candle_rows)
+
+    def completed_chunks(self, symbol: str, interval: str, start: int, end: int) -> set:
+        """chunk_start of every checkpointed chunk inside [start, end)"""
+        rows = self._connect().execute(
+            '''SELECT chunk_start FROM backfill_chunks
+               WHERE product_id = ? AND interval = ? AND chunk_start >= ? AND chunk_end <= ?''',
+            (to_product_id(symbol), interval, int(start), int(end))
+        ).fetchall()
+        return {row[0] for row in rows}
+
+    def coverage(self, symbol: str, interval: str) -> Optional[Tuple[int, int]]:
+        """Contiguous [start, end) synced by CandleHistory, or None before the first sync"""
+        row = self._connect().execute(
+            'SELECT start, end FROM history_coverage WHERE product_id = ? AND interval = ?',
+            (to_product_id(symbol), interval)
+        ).fetchone()
+        return (row[0], row[1]) if row else None
+
+    def set_coverage(self, symbol: str, interval: str, start: int, end: int):
+        """Record the synced range of a (product, interval)"""
+        conn = self._connect()
+        conn.execute('''
+            INSERT OR REPLACE INTO history_coverage (product_id, interval, start, end, updated_at)
+            VALUES (?, ?, ?, ?, ?)
+        ''', (to_product_id(symbol), interval, int(start), int(end), time.time()))
+        conn.commit()
+
+    def merge_coverage(self, symbol: str, interval: str) -> Optional[Tuple[int, int]]:
+        """
+        Extend the synced coverage over checkpointed backfill chunks that touch it, or
+        start it from the newest contiguous run of chunks. Returns the coverage.
+        """
+        chunks = self._connect().execute(
+            '''SELECT chunk_start, chunk_end FROM backfill_chunks
+               WHERE product_id = ? AND interval = ? ORDER BY chunk_start''',
+            (to_product_id(symbol), interval)
+        ).fetchall()
+        covered = self.coverage(symbol, interval)
+        if covered is None:
+            if not chunks:
+                return None
+            covered = chunks[-1]
+        start, end = covered
+        for chunk_start, chunk_end in chunks:
+            if chunk_start <= end < chunk_end:
+                end = chunk_end
+        for chunk_start, chunk_end in reversed(chunks):
+            if chunk_start < start <= chunk_end:
+                start = chunk_start
+        if (start, end) != tuple(covered):
+            self.set_coverage(symbol, interval, start, end)
+        return start, end
+
+    def get_candles(self, symbol: str, interval: str, limit: Optional[int] = None,
+                    start: Optional[int] = None, end: Optional[int] = None) -> Dict[str, np.ndarray]:
+        """Candles ascending by start time as arrays keyed by FIELDS; limit keeps the most recent"""
+        query = 'SELECT start, open, high, low, close, volume FROM candles WHERE product_id = ? AND interval = ?'
+        args: List[Any] = [to_product_id(symbol), interval]
+        if start is not None:
+            query += ' AND start >= ?'
+            args.append(int(start))
+        if end is not None:
+            query += ' AND start < ?'
+            args.append(int(end))
+        query += ' ORDER BY start DESC'
+        if limit is not None:
+            query += ' LIMIT ?'
+            args.append(int(limit))
+
+        rows = self._connect().execute(query, args).fetchall()
+        data = np.array(rows[::-1], dtype=float).reshape(-1, len(FIELDS))
+        return {field: data[:, i] for i, field in enumerate(FIELDS)}
+
+    def get_matrix(self, symbols: List[str], interval: str, limit: int,
+                   end: Optional[int] = None) -> Dict[str, np.ndarray]:
+        """
+        Candles for many symbols aligned on one time grid: arrays are (symbols, limit)
+        keyed by FIELDS, with 'start' the shared 1-D grid. Missing candles are NaN.
+        """
+        seconds = INTERVAL_SECONDS[interval]
+        history = [self.get_candles(symbol, interval, limit=limit, end=end) for symbol in symbols]
+        if end is None:
+            last = max((int(h['start'][-1]) for h in history if len(h['start'])), default=0)
+        else:
+            last = (int(end) - 1) // seconds * seconds
+        grid = last - seconds * np.arange(limit - 1, -1, -1)
+
+        matrix = {field: np.full((len(symbols), limit), np.nan) for field in FIELDS[1:]}
+        for row, h in enumerate(history):
+            slots = (h['start'].astype(np.int64) - grid[0]) // seconds
+            keep = (slots >= 0) & (slots < limit)
+            for field in FIELDS[1:]:
+                matrix[field][row, slots[keep]] = h[field][keep]
+        matrix['start'] = grid.astype(float)
+        return matrix
+
+    def last_start(self, symbol: str, interval: str) -> Optional[int]:
+        """Start time of the newest stored candle"""
+        row = self._connect().execute(
+            'SELECT MAX(start) FROM candles WHERE product_id = ? AND interval = ?',
+            (to_product_id(symbol), interval)
+        ).fetchone()
+        return row[0] if row else None
+
+    def count(self, symbol: str, interval: str) -> int:
+        """Number of stored candles"""
+        return self._connect().execute(
+            'SELECT COUNT(*) FROM candles WHERE product_id = ? AND interval = ?',
+            (to_product_id(symbol), interval)
+        ).fetchone()[0]
+
+    def on_candle(self, candle: Dict[str, Any]):
+        """CoinbaseWebSocket 'candle' callback: persist closed candles"""
+        self.save_candles(candle['product_id'], candle['interval'], [candle])
+
+
+# Global candle store
+candle_store = CandleStore()
@@ -0,0 +1,184 @@
+"""
+Feed latency and health telemetry for the WebSocket pipeline
+Tracks per-product exchange-to-receive lag, receive-to-dispatch lag, message
+rates, trade-id gaps and last-message age with O(1) EWMA updates, and answers
+the staleness question bots ask before trading.
+"""
+import threading
+import time
+from typing import Dict, Optional, Any
+
+# Smoothing for lag and rate EWMAs (~ last 20 messages)
+EWMA_ALPHA = 0.1
+
+# Defaults for the staleness guard
+DEFAULT_MAX_AGE = 10.0  # Seconds since the last message for the product
+DEFAULT_MAX_LAG = 5.0  # Seconds of exchange-to-receive lag
+
+
+class ProductTelemetry:
+    """Counters and EWMAs for one product"""
+
+    __slots__ = ('messages', 'last_receive', 'interval', 'exchange_lag', 'exchange_lag_max',
+                 'dispatch_lag', 'dispatch_lag_max', 'last_trade_id', 'gaps', 'missed_trades')
+
+    def __init__(self):
+        self.messages = 0
+        self.last_receive: Optional[float] = None
+        self.interval: Optional[float] = None  # EWMA seconds between messages
+        self.exchange_lag: Optional[float] = None
+        self.exchange_lag_max = 0.0
+        self.dispatch_lag = 0.0
+        self.dispatch_lag_max = 0.0
+        self.last_trade_id: Optional[int] = None
+        self.gaps = 0
+        self.missed_trades = 0
+
+    def record(self, receive_ts: float, dispatch_ts: float, exchange_ts: Optional[float],
+               trade_id: Optional[int]):
+        """Fold one message into the stats"""
+        if self.last_receive is not None:
+            interval = receive_ts - self.last_receive
+            self.interval = interval if self.interval is None else \
+                self.interval + EWMA_ALPHA * (interval - self.interval)
+        self.last_receive = receive_ts
+        self.messages += 1
+
+        if exchange_ts is not None:
+            lag = receive_ts - exchange_ts
+            self.exchange_lag = lag if self.exchange_lag is None else \
+                self.exchange_lag + EWMA_ALPHA * (lag - self.exchange_lag)
+            self.exchange_lag_max = max(self.exchange_lag_max, lag)
+
+        lag = dispatch_ts - receive_ts
+        self.dispatch_lag += EWMA_ALPHA * (lag - self.dispatch_lag)
+        self.dispatch_lag_max = max(self.dispatch_lag_max, lag)
+
+        # Trade ids are consecutive per product; a jump means we lost matches
+        if trade_id is not None:
+            if self.last_trade_id is not None and trade_id > self.last_trade_id + 1:
+                self.gaps += 1
+                self.missed_trades += trade_id - self.last_trade_id - 1
+            if self.last_trade_id is None or trade_id > self.last_trade_id:
+                self.last_trade_id = trade_id
+
+    def to_dict(self, now: float) -> Dict[str, Any]:
+        """Snapshot for the dashboard"""
+        return {
+            'messages': self.messages,
+            'rate_per_sec': round(1.0 / self.interval, 3) if self.interval else 0.0,
+            'last_message_age': round(now - self.last_receive, 3) if self.last_receive else None,
+            'exchange_lag_ms': round(self.exchange_lag * 1000, 2) if self.exchange_lag is not None else None,
+            'exchange_lag_max_ms': round(self.exchange_lag_max * 1000, 2),
+            'dispatch_lag_ms': round(self.dispatch_lag * 1000, 3),
+            'dispatch_lag_max_ms': round(self.dispatch_lag_max * 1000, 3),
+            'gaps': self.gaps,
+            'missed_trades': self.missed_trades
+        }
+
+
+class FeedTelemetry:
+    """Per-product feed health for one WebSocket connection"""
+
+    def __init__(self):
+        self.products: Dict[str, ProductTelemetry] = {}
+        self.lock = threading.Lock()
+        self.total_messages = 0
+        self.started = time.time()
+        
+        # Bandwidth: bytes as received vs after permessage-deflate decoding
+        self.wire_bytes = 0
+        self.decoded_bytes = 0
+        self.decode_cpu = 0.0
+
+    def record(self, product_id: Optional[str], receive_ts: float, dispatch_ts: float,
+               exchange_ts: Optional[float] = None, trade_id: Optional[int] = None):
+        """Record one handled message"""
+        self.total_messages += 1
+        if not product_id:
+            return
+        stats = self.products.get(product_id)
+        if stats is None:
+            with self.lock:
+                stats = self.products.setdefault(product_id, ProductTelemetry())
+        stats.record(receive_ts, dispatch_ts, exchange_ts, trade_id)
+
+    def record_bytes(self, wire: int, decoded: int, cpu_seconds: float = 0.0):
+        """Record one frame's size on the wire and after decompression"""
+        self.wire_bytes += wire
+        self.decoded_bytes += decoded
+        self.decode_cpu += cpu_seconds
+
+    def forget(self, product_id: str):
+        """Drop a product's stats (e.g. once it is unsubscribed)"""
+        with self.lock:
+            self.products.pop(product_id, None)
+
+    def get_bandwidth(self) -> Dict[str, Any]:
+        """Compression ratio and decode cost"""
+        return {
+            'wire_bytes': self.wire_bytes,
+            'decoded_bytes': self.decoded_bytes,
+            'compression_ratio': round(self.decoded_bytes / self.wire_bytes, 3) if self.wire_bytes else None,
+            'decode_cpu_seconds': round(self.decode_cpu, 4),
+            'decode_cpu_us_per_kb': round(self.decode_cpu * 1e6 / (self.decoded_bytes / 1024), 3)
+            if self.decoded_bytes else None
+        }
+
+    def last_message_age(self, product_id: str, now: Optional[float] = None) -> Optional[float]:
+        """Seconds since the last message for a product, None if never seen"""
+        stats = self.products.get(product_id)
+        if stats is None or stats.last_receive is None:
+            return None
+        return (now or time.time()) - stats.last_receive
+
+    def is_stale(self, product_id: str, max_age: float = DEFAULT_MAX_AGE,
+                 max_lag: float = DEFAULT_MAX_LAG) -> bool:
+        """True if the product's data is too old or arriving too late to trade on"""
+        stats = self.products.get(product_id)
+        age = self.last_message_age(product_id)
+        if stats is None or age is None or age > max_age:
+            return True
+        lag = stats.exchange_lag
+        return lag is not None and lag > max_lag
+
+    def get_status(self) -> Dict[str, Any]:
+        """Snapshot of every product plus connection totals"""
+        now = time.time()
+        with self.lock:
+            products = dict(self.products)
+        return {
+            'total_messages': self.total_messages,
+            'uptime': round(now - self.started, 1),
+            'bandwidth': self.get_bandwidth(),
+            'products': {pid: stats.to_dict(now) for pid, stats in products.items()}
+        }
+
+    def to_prometheus(self, prefix: str = 'goat_feed') -> str:
+        """Render metrics in Prometheus text exposition format"""
+        status = self.get_status()
+        lines = [
+            f"# TYPE {prefix}_messages_total counter",
+            f"{prefix}_messages_total {status['total_messages']}",
+            f"# TYPE {prefix}_wire_bytes_total counter",
+            f"{prefix}_wire_bytes_total {self.wire_bytes}",
+            f"# TYPE {prefix}_decoded_bytes_total counter",
+            f"{prefix}_decoded_bytes_total {self.decoded_bytes}",
+            f"# TYPE {prefix}_decode_cpu_seconds_total counter",
+            f"{prefix}_decode_cpu_seconds_total {self.decode_cpu}"
+        ]
+        metrics = [
+            ('product_messages_total', 'counter', 'messages'),
+            ('message_rate', 'gauge', 'rate_per_sec'),
+            ('last_message_age_seconds', 'gauge', 'last_message_age'),
+            ('exchange_lag_ms', 'gauge', 'exchange_lag_ms'),
+            ('dispatch_lag_ms', 'gauge', 'dispatch_lag_ms'),
+            ('gaps_total', 'counter', 'gaps'),
+            ('missed_trades_total', 'counter', 'missed_trades')
+        ]
+        for name, metric_type, field in metrics:
+            lines.append(f"# TYPE {prefix}_{name} {metric_type}")
+            for product_id, stats in status['products'].items():
+                if stats[field] is not None:
+                    lines.append(f'{prefix}_{name}{{product="{product_id}"}} {stats[field]}')
+        return "\n".join(lines) + "\n"
@@ -0,0 +1,251 @@
+"""
+Indicator dependency graph
+The single local evaluation path for indicator requests. Indicators are expressed
+as small graphs of intermediate nodes (EMA, SMA/variance, Wilder averages, true
+range, rolling high/low). Consumers declare what they need per interval; the first
+request for a (product, interval) evaluates every declared indicator in one pass,
+computing each shared node once for the latest candle and fanning the results out
+to every bot that asks. Live streaming indicators act as a cache in front of the
+graph for current values (see IndicatorGraph.latest).
+"""
+import threading
+import time
+from typing import Dict, List, Optional, Any, Tuple
+import numpy as np
+from utils.candle_store import candle_store, CandleStore, INTERVAL_SECONDS, to_product_id
+from utils.streaming_indicators import streaming_indicators, StreamingIndicatorEngine, create_indicator
+from utils import indicators
+
+# Leaf nodes
+OPEN = ('field', 'open')
+HIGH = ('field', 'high')
+LOW = ('field', 'low')
+CLOSE = ('field', 'close')
+VOLUME = ('field', 'volume')
+
+
+def _p(params: Dict[str, Any], name: str, default, cast=int):
+    return cast(params.get(name, default))
+
+
+def _rsi(ev, p):
+    period = _p(p, 'period', 14)
+    return {'value': indicators.rsi_from_averages(ev.node(('wilder', ('gain', CLOSE), period)),
+                                                  ev.node(('wilder', ('loss', CLOSE), period)))}
+
+
+def _macd(ev, p):
+    fast, slow = _p(p, 'optInFastPeriod', 12), _p(p, 'optInSlowPeriod', 26)
+    line_key = ('sub', ('ema', CLOSE, fast), ('ema', CLOSE, slow))
+    line = ev.node(line_key)
+    signal = ev.node(('ema', line_key, _p(p, 'optInSignalPeriod', 9)))
+    return {'valueMACD': line, 'valueMACDSignal': signal, 'valueMACDHist': line - signal}
+
+
+def _bbands(ev, p):
+    period, stddev = _p(p, 'period', 20), _p(p, 'stddev', 2, float)
+    middle = ev.node(('sma', CLOSE, period))
+    width = ev.node(('std', CLOSE, period)) * stddev
+    return {'valueUpperBand': middle + width, 'valueMiddleBand': middle, 'valueLowerBand': middle - width}
+
+
+def _atr(ev, p):
+    return {'value': ev.node(('wilder', ('tr',), _p(p, 'period', 14)))}
+
+
+def _stoch(ev, p):
+    k_period = _p(p, 'kPeriod', 14)
+    fast_k = ('fast_k', k_period)
+    slow_k = ('sma', fast_k, _p(p, 'kSmooth', 3))
+    return {'valueK': ev.node(slow_k), 'valueD': ev.node(('sma', slow_k, _p(p, 'dPeriod', 3)))}
+
+
+# TAAPI indicator name -> builder over graph nodes
+BUILDERS = {
+    'rsi': _rsi,
+    'macd': _macd,
+    'bbands': _bbands,
+    'atr': _atr,
+    'stoch': _stoch,
+    'sma': lambda ev, p: {'value': ev.node(('sma', CLOSE, _p(p, 'period', 30)))},
+    'ema': lambda ev, p: {'value': ev.node(('ema', CLOSE, _p(p, 'period', 30)))},
+    'volume': lambda ev, p: {'value': ev.node(VOLUME)}
+}
+
+
+def request_key(indicator: str, params: Dict[str, Any]) -> Tuple:
+    """Hashable key for an indicator request, defaults filled in so rsi() and rsi(period=14) match"""
+    params = create_indicator(indicator, **params).params
+    return (indicator,) + tuple(sorted((k, str(v)) for k, v in params.items()))
+
+
+class Evaluation:
+    """Memoized node values for one (product, interval) at one latest candle"""
+
+    def __init__(self, candles: Dict[str, np.ndarray]):
+        self.candles = candles
+        self.last_start = candles['start'][-1] if len(candles['start']) else None
+        self.memo: Dict[Tuple, Any] = {}
+        self.results: Dict[Tuple, Dict[str, np.ndarray]] = {}
+        self.computed = 0
+        self.reused = 0
+
+    def node(self, key: Tuple):
+        """Value of a node, computing it (and its inputs) at most once"""
+        if key in self.memo:
+            self.reused += 1
+            return self.memo[key]
+        self.memo[key] = value = self._compute(key)
+        self.computed += 1
+        return value
+
+    def _compute(self, key: Tuple):
+        kind = key[0]
+        if kind == 'field':
+            return self.candles[key[1]]
+        if kind == 'moments':
+            return indicators.rolling_moments(self.node(key[1]), key[2])
+        if kind == 'sma':
+            return self.node(('moments', key[1], key[2]))[0]
+        if kind == 'std':
+            return np.sqrt(self.node(('moments', key[1], key[2]))[1])
+        if kind == 'ema':
+            return indicators.ema(self.node(key[1]), key[2])
+        if kind == 'wilder':
+            return indicators.wilder(self.node(key[1]), key[2])
+        if kind == 'diff':
+            return np.diff(self.node(key[1]), axis=-1, prepend=np.nan)
+        if kind == 'gain':
+            return np.clip(self.node(('diff', key[1])), 0.0, None)
+        if kind == 'loss':
+            return np.clip(-self.node(('diff', key[1])), 0.0, None)
+        if kind == 'sub':
+            return self.node(key[1]) - self.node(key[2])
+        if kind == 'tr':
+            return indicators.true_range(self.node(HIGH), self.node(LOW), self.node(CLOSE))
+        if kind == 'max':
+            return indicators.rolling_extreme(self.node(key[1]), key[2], True)
+        if kind == 'min':
+            return indicators.rolling_extreme(self.node(key[1]), key[2], False)
+        if kind == 'fast_k':
+            return indicators.stoch_fast_k(self.node(CLOSE), self.node(('max', HIGH, key[1])),
+                                           self.node(('min', LOW, key[1])))
+        raise ValueError(f"Unknown indicator node: {key}")
+
+    def request(self, indicator: str, params: Dict[str, Any]) -> Dict[str, np.ndarray]:
+        """Series for one indicator request"""
+        key = request_key(indicator, params)
+        if key not in self.results:
+            self.results[key] = BUILDERS[indicator](self, params)
+        return self.results[key]
+
+
+class IndicatorGraph:
+    """Shared evaluation of declared indicator requests, one per (product, interval, candle)"""
+
+    def __init__(self, store: CandleStore = candle_store, history: int = indicators.HISTORY_CANDLES,
+                 streams: Optional[StreamingIndicatorEngine] = None):
+        self.store = store
+        self.history = history
+        self.streams = streams
+        self.declared: Dict[str, Dict[Tuple, Tuple[str, Dict[str, Any]]]] = {}  # interval -> requests
+        self.consumers: Dict[Tuple, set] = {}  # (interval, request key) -> consumer names
+        self.evaluations: Dict[Tuple[str, str], Evaluation] = {}
+        self.lock = threading.Lock()
+        self.nodes_computed = 0
+        self.nodes_reused = 0
+        self.requests_served = 0
+        self.stream_hits = 0
+
+    def declare(self, consumer: str, interval: str, requests: List[Any]):
+        """
+        Register a consumer's needs for an interval: indicator names or
+        (indicator, params) pairs, e.g. ['rsi', ('bbands', {'period': 20, 'stddev': 2})]
+        """
+        with self.lock:
+            declared = self.declared.setdefault(interval, {})
+            for request in requests:
+                indicator, params = (request, {}) if isinstance(request, str) else request
+                key = request_key(indicator, params)
+                declared[key] = (indicator, dict(params))
+                self.consumers.setdefault((interval, key), set()).add(consumer)
+
+    def intervals(self, consumer: str) -> List[str]:
+        """Intervals a consumer has declared indicators for"""
+        with self.lock:
+            return sorted({interval for (interval, _), consumers in self.consumers.items()
+                           if consumer in consumers})
+
+    def _evaluation(self, product_id: str, interval: str, needed: int) -> Optional[Evaluation]:
+        """Current evaluation, rebuilt when a newer candle is stored"""
+        last_start = self.store.last_start(product_id, interval)
+        if last_start is None:
+            return None
+        evaluation = self.evaluations.get((product_id, interval))
+        if evaluation is None or evaluation.last_start != last_start or \
+                len(evaluation.candles['close']) < needed:
+            if evaluation is not None:
+                self.nodes_computed += evaluation.computed
+                self.nodes_reused += evaluation.reused
+            candles = self.store.get_candles(product_id, interval, limit=max(self.history, needed))
+            evaluation = Evaluation(candles)
+            self.evaluations[(product_id, interval)] = evaluation
+
+            # Evaluate everything declared for this interval together so shared nodes are computed once
+            for indicator, params in self.declared.get(interval, {}).values():
+                evaluation.request(indicator, params)
+        return evaluation
+
+    def evaluate(self, indicator: str, symbol: str, interval: str,
+                 needed: int = 0, **params) -> Tuple[Optional[Dict[str, np.ndarray]], Optional[float]]:
+        """(series, latest candle start) for an indicator; (None, None) without history"""
+        if indicator not in BUILDERS:
+            raise ValueError(f"Unsupported indicator: {indicator}")
+        with self.lock:
+            evaluation = self._evaluation(to_product_id(symbol), interval, needed)
+            if evaluation is None:
+                return None, None
+            self.requests_served += 1
+            return evaluation.request(indicator, params), evaluation.last_start
+
+    def latest(self, indicator: str, symbol: str, interval: str, backtrack: int = 0,
+               **params) -> Optional[Dict[str, float]]:
+        """
+        Values for one request at the latest (or a backtracked) candle; None without
+        enough fresh history. Current values come from the request's live stream when
+        it has one (O(1) per candle); backtracked values and streams that are warming
+        up or rebuilding after a gap are evaluated through the node graph.
+        """
+        if self.streams is not None and backtrack == 0:
+            result = self.streams.get_indicator(indicator, symbol, interval, **params)
+            if result is not None:
+                with self.lock:
+                    self.stream_hits += 1
+                return result
+
+        needed = indicators.INDICATORS[indicator][1](params) + backtrack
+        series, last_start = self.evaluate(indicator, symbol, interval, needed, **params)
+        # The newest candle must be the current or just-closed one
+        if series is None or last_start < time.time() - 2 * INTERVAL_SECONDS[interval]:
+            return None
+        return indicators.latest(series, backtrack)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Work done vs. work shared"""
+        with self.lock:
+            computed = self.nodes_computed + sum(e.computed for e in self.evaluations.values())
+            reused = self.nodes_reused + sum(e.reused for e in self.evaluations.values())
+            return {
+                'nodes_computed': computed,
+                'nodes_reused': reused,
+                'requests_served': self.requests_served,
+                'stream_hits': self.stream_hits,
+                'declared': {
+                    f"{interval}:{key[0]}{dict(key[1:]) or ''}": sorted(names)
+                    for (interval, key), names in self.consumers.items()
+                }
+            }
+
+
+# Global graph shared by every bot's LocalIndicatorEngine, fronted by the live streams
+indicator_graph = IndicatorGraph(streams=streaming_indicators)
@@ -0,0 +1,386 @@
+"""
+Local technical indicators
+Vectorized NumPy implementations of the TAAPI indicators the bots use (RSI, MACD,
+Bollinger Bands, ATR, Stochastic, SMA/EMA, volume), computed from stored candles.
+Functions work along the last axis, so a (symbols, time) matrix computes every
+symbol in one pass; results follow TA-Lib/TAAPI conventions and are NaN during
+warmup, per row, so symbols with shorter history can share a NaN-padded matrix.
+"""
+import os
+import time
+from concurrent.futures import Future
+from typing import Dict, List, Optional, Any
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+from utils.candle_store import candle_store, CandleStore, INTERVAL_SECONDS
+from utils.streaming_indicators import streaming_indicators, StreamingIndicatorEngine
+from utils.db import log_trade
+from utils.taapi_batcher import completed
+
+# Candles loaded per computation - enough for EMA/Wilder smoothing to converge
+HISTORY_CANDLES = 500
+
+# Exchanges whose requests are answered from the local store, which holds Coinbase candles.
+# The bots trade on Coinbase but historically asked TAAPI for Binance data, so 'binance'
+# requests are deliberately served from Coinbase candles; other exchanges go to TAAPI.
+LOCAL_EXCHANGES = tuple(e.strip().lower() for e in
+                        os.getenv('LOCAL_INDICATOR_EXCHANGES', 'coinbase,binance').split(',') if e.strip())
+
+
+def rolling_moments(values: np.ndarray, period: int):
+    """
+    Rolling mean and population variance along the last axis from running sums,
+    O(n) regardless of period. Windows containing NaN come out NaN.
+    """
+    values = np.asarray(values, dtype=float)
+    mean = np.full(values.shape, np.nan)
+    var = np.full(values.shape, np.nan)
+    if values.shape[-1] < period:
+        return mean, var
+
+    valid = ~np.isnan(values)
+    # Shift each row by its first value so the sum of squares doesn't cancel catastrophically
+    shift = np.take_along_axis(values, np.argmax(valid, axis=-1)[..., None], axis=-1)
+    x = np.where(valid, values - np.nan_to_num(shift), 0.0)
+
+    def window_sum(a):
+        c = np.cumsum(a, axis=-1)
+        c[..., period:] = c[..., period:] - c[..., :-period]
+        return c[..., period - 1:]
+
+    full = window_sum(valid.astype(float)) == period
+    total, total_sq = window_sum(x), window_sum(x * x)
+    m = total / period
+    mean[..., period - 1:] = np.where(full, m + np.nan_to_num(shift), np.nan)
+    var[..., period - 1:] = np.where(full, np.maximum(total_sq / period - m * m, 0.0), np.nan)
+    return mean, var
+
+
+def sma(values: np.ndarray, period: int) -> np.ndarray:
+    """Simple moving average, NaN for the first period-1 points"""
+    return rolling_moments(values, period)[0]
+
+
+# Columns per block in the batched smoothing scan
+SCAN_BLOCK = 32
+
+
+def _linear_filter(u: np.ndarray, decay: float) -> np.ndarray:
+    """
+    y[:, i] = decay * y[:, i-1] + u[:, i] for every row, computed in blocks of
+    SCAN_BLOCK columns as one matrix product each instead of a Python step per column.
+    """
+    idx = np.arange(SCAN_BLOCK)
+    lag = idx[None, :] - idx[:, None]
+    weights = np.where(lag >= 0, decay ** np.maximum(lag, 0), 0.0)
+    carry_weights = decay ** (idx + 1)
+
+    y = np.empty(u.shape)
+    carry = np.zeros(u.shape[0])
+    for start in range(0, u.shape[1], SCAN_BLOCK):
+        block = u[:, start:start + SCAN_BLOCK]
+        k = block.shape[1]
+        y_block = block @ weights[:k, :k] + carry[:, None] * carry_weights[:k]
+        y[:, start:start + k] = y_block
+        carry = y_block[:, -1]
+    return y
+
+
+def _smooth_steps(rows: np.ndarray, period: int, alpha: float) -> np.ndarray:
+    """Step-by-step smoothing for rows with interior gaps"""
+    out = np.full(rows.shape, np.nan)
+    count = np.zeros(rows.shape[0], dtype=int)
+    acc = np.zeros(rows.shape[0])
+    prev = np.zeros(rows.shape[0])
+    for i in range(rows.shape[1]):
+        x = rows[:, i]
+        valid = ~np.isnan(x)
+        count += valid
+        seeding = valid & (count <= period)
+        acc[seeding] += x[seeding]
+        prev = np.where(valid & (count == period), acc / period,
+                        np.where(valid & (count > period), prev + alpha * (x - prev), prev))
+        out[:, i] = np.where(valid & (count >= period), prev, np.nan)
+    return out
+
+
+def _smooth(values: np.ndarray, period: int, alpha: float) -> np.ndarray:
+    """
+    Exponential smoothing seeded with the SMA of each series' first period values.
+    NaN-aware: leading NaNs (short history in an aligned matrix) delay that row's
+    seed, and interior NaNs (missing candles) output NaN without touching state.
+    """
+    values = np.asarray(values, dtype=float)
+    out = np.full(values.shape, np.nan)
+    if values.ndim == 1:
+        # One series: plain floats avoid per-element NumPy scalar overhead
+        count, acc, prev = 0, 0.0, 0.0
+        for i, x in enumerate(values.tolist()):
+            if x != x:  # NaN
+                continue
+            count += 1
+            if count < period:
+                acc += x
+                continue
+            prev = (acc + x) / period if count == period else prev + alpha * (x - prev)
+            out[i] = prev
+        return out
+
+    n = values.shape[-1]
+    rows = values.reshape(-1, n)
+    flat = out.reshape(-1, n)
+    valid = ~np.isnan(rows)
+    count = np.cumsum(valid, axis=1)
+    seeded = count[:, -1] >= period
+    first_valid = np.argmax(valid, axis=1)
+    contiguous = count[:, -1] == n - first_valid
+
+    # Rows that are gap-free after their warmup: inject the SMA seed at the seed
+    # column and run the recursion as a linear filter over the whole block of rows
+    fast = np.flatnonzero(seeded & contiguous)
+    if len(fast):
+        x = rows[fast]
+        seed_idx = np.argmax(count[fast] >= period, axis=1)
+        seed = np.where(valid[fast] & (count[fast] <= period), x, 0.0).sum(axis=1) / period
+        cols = np.arange(n)[None, :]
+        u = np.where(cols > seed_idx[:, None], alpha * np.nan_to_num(x), 0.0)
+        u[np.arange(len(fast)), seed_idx] = seed
+        y = _linear_filter(u, 1.0 - alpha)
+        flat[fast] = np.where(cols >= seed_idx[:, None], y, np.nan)
+
+    gappy = np.flatnonzero(seeded & ~contiguous)
+    if len(gappy):
+        flat[gappy] = _smooth_steps(rows[gappy], period, alpha)
+    return out
+
+
+def ema(values: np.ndarray, period: int) -> np.ndarray:
+    """Exponential moving average (alpha = 2 / (period + 1)), SMA-seeded like TA-Lib"""
+    return _smooth(values, period, 2.0 / (period + 1))
+
+
+def wilder(values: np.ndarray, period: int) -> np.ndarray:
+    """Wilder's smoothing (alpha = 1 / period) used by RSI and ATR"""
+    return _smooth(values, period, 1.0 / period)
+
+
+def rsi_from_averages(gain: np.ndarray, loss: np.ndarray) -> np.ndarray:
+    """RSI from smoothed average gain and loss"""
+    with np.errstate(divide='ignore', invalid='ignore'):
+        value = np.where(loss == 0, np.where(gain == 0, 50.0, 100.0), 100.0 - 100.0 / (1.0 + gain / loss))
+    value[np.isnan(gain) | np.isnan(loss)] = np.nan
+    return value
+
+
+def rsi(close: np.ndarray, period: int = 14) -> Dict[str, np.ndarray]:
+    """Relative Strength Index"""
+    close = np.asarray(close, dtype=float)
+    delta = np.diff(close, axis=-1, prepend=np.nan)
+    gain = wilder(np.clip(delta, 0.0, None), period)  # clip keeps NaN, so warmup stays NaN
+    loss = wilder(np.clip(-delta, 0.0, None), period)
+    return {'value': rsi_from_averages(gain, loss)}
+
+
+def macd(close: np.ndarray, fast: int = 12, slow: int = 26, signal: int = 9) -> Dict[str, np.ndarray]:
+    """MACD line, signal line and histogram"""
+    line = ema(close, fast) - ema(close, slow)
+    signal_line = ema(line, signal)
+    return {
+        'valueMACD': line,
+        'valueMACDSignal': signal_line,
+        'valueMACDHist': line - signal_line
+    }
+
+
+def bbands(close: np.ndarray, period: int = 20, stddev: float = 2.0) -> Dict[str, np.ndarray]:
+    """Bollinger Bands (population standard deviation, as TA-Lib)"""
+    middle, var = rolling_moments(close, period)
+    width = np.sqrt(var) * stddev
+    return {
+        'valueUpperBand': middle + width,
+        'valueMiddleBand': middle,
+        'valueLowerBand': middle - width
+    }
+
+
+def true_range(high: np.ndarray, low: np.ndarray, close: np.ndarray) -> np.ndarray:
+    """True range; the first point has no previous close and is NaN"""
+    prev_close = np.roll(np.asarray(close, dtype=float), 1, axis=-1)
+    tr = np.maximum(high - low, np.maximum(np.abs(high - prev_close), np.abs(low - prev_close)))
+    tr[..., 0] = np.nan
+    return tr
+
+
+def atr(high: np.ndarray, low: np.ndarray, close: np.ndarray, period: int = 14) -> Dict[str, np.ndarray]:
+    """Average True Range (Wilder)"""
+    return {'value': wilder(true_range(high, low, close), period)}
+
+
+def rolling_extreme(values: np.ndarray, period: int, maximum: bool = True) -> np.ndarray:
+    """Rolling max (or min) along the last axis, NaN for the first period-1 points"""
+    values = np.asarray(values, dtype=float)
+    out = np.full(values.shape, np.nan)
+    if values.shape[-1] >= period:
+        windows = sliding_window_view(values, period, axis=-1)
+        out[..., period - 1:] = windows.max(axis=-1) if maximum else windows.min(axis=-1)
+    return out
+
+
+def stoch_fast_k(close: np.ndarray, highest: np.ndarray, lowest: np.ndarray) -> np.ndarray:
+    """Raw %K from close and the rolling highest high / lowest low"""
+    span = highest - lowest
+    with np.errstate(divide='ignore', invalid='ignore'):
+        fast_k = (np.asarray(close, dtype=float) - lowest) / span * 100.0
+    fast_k[span == 0] = 0.0
+    return fast_k
+
+
+def stoch(high: np.ndarray, low: np.ndarray, close: np.ndarray, k_period: int = 14,
+          k_smooth: int = 3, d_period: int = 3) -> Dict[str, np.ndarray]:
+    """Slow stochastic oscillator: %K smoothed over k_smooth, %D = SMA(%K, d_period)"""
+    fast_k = stoch_fast_k(close, rolling_extreme(high, k_period, True), rolling_extreme(low, k_period, False))
+    slow_k = sma(fast_k, k_smooth)
+    return {'valueK': slow_k, 'valueD': sma(slow_k, d_period)}
+
+
+def volume(vol: np.ndarray) -> Dict[str, np.ndarray]:
+    """Candle volume"""
+    return {'value': np.asarray(vol, dtype=float)}
+
+
+# TAAPI indicator name -> (compute from candle arrays + TAAPI params, candles needed before the first value)
+INDICATORS: Dict[str, tuple] = {
+    'rsi': (lambda c, p: rsi(c['close'], int(p.get('period', 14))),
+            lambda p: int(p.get('period', 14)) + 1),
+    'macd': (lambda c, p: macd(c['close'], int(p.get('optInFastPeriod', 12)),
+                               int(p.get('optInSlowPeriod', 26)), int(p.get('optInSignalPeriod', 9))),
+             lambda p: int(p.get('optInSlowPeriod', 26)) + int(p.get('optInSignalPeriod', 9)) - 1),
+    'bbands': (lambda c, p: bbands(c['close'], int(p.get('period', 20)), float(p.get('stddev', 2))),
+               lambda p: int(p.get('period', 20))),
+    'atr': (lambda c, p: atr(c['high'], c['low'], c['close'], int(p.get('period', 14))),
+            lambda p: int(p.get('period', 14)) + 1),
+    'stoch': (lambda c, p: stoch(c['high'], c['low'], c['close'], int(p.get('kPeriod', 14)),
+                                 int(p.get('kSmooth', 3)), int(p.get('dPeriod', 3))),
+              lambda p: int(p.get('kPeriod', 14)) + int(p.get('kSmooth', 3)) + int(p.get('dPeriod', 3)) - 2),
+    'sma': (lambda c, p: {'value': sma(c['close'], int(p.get('period', 30)))},
+            lambda p: int(p.get('period', 30))),
+    'ema': (lambda c, p: {'value': ema(c['close'], int(p.get('period', 30)))},
+            lambda p: int(p.get('period', 30))),
+    'volume': (lambda c, p: volume(c['volume']),
+               lambda p: 1)
+}
+
+
+def compute(indicator: str, candles: Dict[str, np.ndarray], **params) -> Dict[str, np.ndarray]:
+    """Full indicator series for candle arrays, keyed like the TAAPI response"""
+    if indicator not in INDICATORS:
+        raise ValueError(f"Unsupported indicator: {indicator}")
+    return INDICATORS[indicator][0](candles, params)
+
+
+def latest(series: Dict[str, np.ndarray], backtrack: int = 0) -> Optional[Dict[str, float]]:
+    """TAAPI-shaped response for one candle (backtrack=0 is the newest), None during warmup"""
+    result = {}
+    for key, values in series.items():
+        if values.shape[-1] <= backtrack:
+            return None
+        value = values[..., -1 - backtrack]
+        if np.isnan(value):
+            return None
+        result[key] = float(value)
+    return result
+
+
+def latest_rows(series: Dict[str, np.ndarray], backtrack: int = 0) -> List[Optional[Dict[str, float]]]:
+    """Row-wise latest() for a (symbols, time) computation"""
+    columns = {key: values[:, -1 - backtrack] if values.shape[-1] > backtrack
+               else np.full(values.shape[0], np.nan) for key, values in series.items()}
+    ready = ~np.any([np.isnan(column) for column in columns.values()], axis=0)
+    rows = []
+    for row in range(len(ready)):
+        rows.append({key: float(column[row]) for key, column in columns.items()} if ready[row] else None)
+    return rows
+
+
+class LocalIndicatorEngine:
+    """
+    Drop-in for TaapiConnection.get_indicator backed by the local candle store.
+    Single requests are answered by the shared indicator graph (live streams first,
+    then the node graph over stored candles); get_indicators() computes one indicator
+    for many symbols over a matrix. Falls back to the wrapped TAAPI connection when
+    history is missing or stale, or the exchange isn't in LOCAL_EXCHANGES.
+    """
+
+    def __init__(self, store: CandleStore = candle_store, fallback=None,
+                 history: int = HISTORY_CANDLES,
+                 streams: Optional[StreamingIndicatorEngine] = streaming_indicators,
+                 graph=None):
+        from utils.indicator_graph import IndicatorGraph, indicator_graph
+        self.store = store
+        self.fallback = fallback
+        self.history = history
+        # Engines over the global store share one graph, so bots share intermediates
+        if graph is None:
+            graph = indicator_graph if store is candle_store and streams is streaming_indicators \
+                else IndicatorGraph(store, history, streams)
+        self.graph = graph
+        self.local_hits = 0
+        self.fallbacks = 0
+
+    def supports(self, indicator: str, interval: str) -> bool:
+        """True if the indicator and interval can be computed locally"""
+        return indicator in INDICATORS and interval in INTERVAL_SECONDS
+
+    def declare(self, consumer: str, interval: str, requests: List[Any]):
+        """Declare the indicators a bot needs so they're evaluated together (see IndicatorGraph.declare)"""
+        self.graph.declare(consumer, interval, requests)
+
+    def get_local(self, indicator: str, symbol: str, interval: str, **params) -> Optional[Dict]:
+        """Compute from stored candles; None if there isn't enough fresh history"""
+        if not self.supports(indicator, interval):
+            return None
+        backtrack = int(params.pop('backtrack', 0))
+        return self.graph.latest(indicator, symbol, interval, backtrack, **params)
+
+    def get_indicators(self, indicator: str, symbols: List[str], interval: str,
+                       **params) -> Dict[str, Optional[Dict]]:
+        """
+        One indicator for many symbols in a single vectorized pass over an aligned
+        (symbols, time) matrix. Symbols without enough fresh history map to None.
+        """
+        if not self.supports(indicator, interval) or not symbols:
+            return {symbol: None for symbol in symbols}
+        backtrack = int(params.pop('backtrack', 0))
+        needed = INDICATORS[indicator][1](params) + backtrack
+
+        matrix = self.store.get_matrix(symbols, interval, limit=max(self.history, needed))
+        if matrix['start'][-1] < time.time() - 2 * INTERVAL_SECONDS[interval]:
+            return {symbol: None for symbol in symbols}
+        return dict(zip(symbols, latest_rows(compute(indicator, matrix, **params), backtrack)))
+
+    def submit(self, indicator: str, exchange: str, symbol: str, interval: str, **params) -> Future:
+        """
+        Non-blocking get_indicator. Local values resolve immediately; misses go to the
+        fallback's submit() when it has one (e.g. TaapiBatcher) so they can be batched.
+        """
+        result = None
+        if exchange.lower() in LOCAL_EXCHANGES:
+            try:
+                result = self.get_local(indicator, symbol, interval, **params)
+            except Exception as e:
+                log_trade('indicators', 'error', f"Local {indicator} failed for {symbol}: {str(e)}")
+
+        if result is not None:
+            self.local_hits += 1
+            return completed(result)
+
+        self.fallbacks += 1
+        if self.fallback is None:
+            return completed(None)
+        if hasattr(self.fallback, 'submit'):
+            return self.fallback.submit(indicator, exchange, symbol, interval, **params)
+        return completed(self.fallback.get_indicator(indicator, exchange, symbol, interval, **params))
+
+    def get_indicator(self, indicator: str, exchange: str, symbol: str, interval: str, **params) -> Optional[Dict]:
+        """Same signature and response shape as TaapiConnection.get_indicator"""
+        return self.submit(indicator, exchange, symbol, interval, **params).result()
@@ -0,0 +1,259 @@
+"""
+Redis pub/sub fan-out of Coinbase market data
+One host runs the Coinbase WebSocket and publishes conflated tickers, top-of-book
+and closed candles; bots on other hosts subscribe and read a local price cache.
+"""
+import json
+import os
+import threading
+import time
+from typing import Dict, List, Optional, Any, Tuple
+import redis
+from utils.db import log_trade
+
+CHANNEL_PREFIX = "market"
+KINDS = ('ticker', 'book', 'candle')
+
+
+def get_redis_client(url: Optional[str] = None) -> redis.Redis:
+    """Create a Redis client from REDIS_URL"""
+    return redis.Redis.from_url(
+        url or os.getenv('REDIS_URL', 'redis://localhost:6379'),
+        decode_responses=True,
+        socket_connect_timeout=1
+    )
+
+
+def channel_name(kind: str, product_id: str, prefix: str = CHANNEL_PREFIX) -> str:
+    """Channel for one message kind and product, e.g. market:ticker:BTC-USD"""
+    return f"{prefix}:{kind}:{product_id}"
+
+
+class MarketDataPublisher:
+    """Bridge from CoinbaseWebSocket to Redis channels, conflated per product"""
+
+    def __init__(self, ws=None, redis_client: Optional[redis.Redis] = None,
+                 conflate_interval: float = 0.1, prefix: str = CHANNEL_PREFIX):
+        if ws is None:
+            from utils.websocket_client import coinbase_ws
+            ws = coinbase_ws
+        self.ws = ws
+        self.redis_client = redis_client or get_redis_client()
+        self.conflate_interval = conflate_interval
+        self.prefix = prefix
+
+        # Latest payload per (kind, product); newer updates overwrite older ones
+        self.pending: Dict[Tuple[str, str], Dict[str, Any]] = {}
+        self.lock = threading.Lock()
+        self.running = False
+        self.thread = None
+        self.published_count = 0
+        self.conflated_count = 0
+
+    def _queue(self, kind: str, product_id: str, payload: Dict[str, Any]):
+        """Stage a payload for the next flush"""
+        with self.lock:
+            if (kind, product_id) in self.pending:
+                self.conflated_count += 1
+            self.pending[(kind, product_id)] = payload
+
+    def on_ticker(self, data: Dict[str, Any]):
+        """Normalize a ticker from the socket's price cache"""
+        product_id = data.get('product_id')
+        ticker = self.ws.get_ticker(product_id)
+        if ticker:
+            self._queue('ticker', product_id, dict(ticker, product_id=product_id))
+
+    def on_book(self, data: Dict[str, Any]):
+        """Publish top-of-book after snapshots and level2 updates"""
+        product_id = data.get('product_id')
+        top = self.ws.get_book_top(product_id)
+        if top:
+            top['product_id'] = product_id
+            top['time'] = data.get('time')
+            self._queue('book', product_id, top)
+
+    def on_candle(self, candle: Dict[str, Any]):
+        """Publish closed 1m candles"""
+        self._queue('candle', candle['product_id'], candle)
+
+    def flush(self) -> int:
+        """Publish everything staged since the last flush in one pipeline"""
+        with self.lock:
+            batch, self.pending = self.pending, {}
+
+        if not batch:
+            return 0
+
+        pipe = self.redis_client.pipeline(transaction=False)
+        for (kind, product_id), payload in batch.items():
+            message = json.dumps(payload)
+            pipe.publish(channel_name(kind, product_id, self.prefix), message)
+            # Last value lets late subscribers prime their cache
+            pipe.set(channel_name(f"last:{kind}", product_id, self.prefix), message)
+        pipe.execute()
+
+        self.published_count += len(batch)
+        return len(batch)
+
+    def _run(self):
+        """Flush loop"""
+        while self.running:
+            try:
+                self.flush()
+            except redis.RedisError as e:
+                log_trade('market_bus', 'error', f"Publish failed: {str(e)}")
+            time.sleep(self.conflate_interval)
+
+    def start(self):
+        """Hook into the WebSocket and start publishing"""
+        self.ws.register_callback('ticker', self.on_ticker)
+        self.ws.register_callback('snapshot', self.on_book)
+        self.ws.register_callback('l2update', self.on_book)
+        self.ws.register_callback('candle', self.on_candle)
+
+        self.running = True
+        self.thread = threading.Thread(target=self._run, name="MarketDataPublisher", daemon=True)
+        self.thread.start()
+        log_trade('market_bus', 'info', f"Publishing market data every {self.conflate_interval}s")
+
+    def stop(self):
+        """Unhook from the WebSocket and flush what's left"""
+        self.ws.unregister_callback('ticker', self.on_ticker)
+        self.ws.unregister_callback('snapshot', self.on_book)
+        self.ws.unregister_callback('l2update', self.on_book)
+        self.ws.unregister_callback('candle', self.on_candle)
+
+        self.running = False
+        if self.thread:
+            self.thread.join(timeout=self.conflate_interval * 5)
+        self.flush()
+
+
+class MarketDataSubscriber:
+    """Local price cache fed from Redis, with the same read API as CoinbaseWebSocket"""
+
+    def __init__(self, redis_client: Optional[redis.Redis] = None,
+                 prefix: str = CHANNEL_PREFIX, max_candles: int = 1440):
+        self.redis_client = redis_client or get_redis_client()
+        self.prefix = prefix
+        self.max_candles = max_candles
+
+        self.price_cache: Dict[str, Dict[str, Any]] = {}
+        self.book_tops: Dict[str, Dict[str, Any]] = {}
+        self.candles: Dict[str, List[Dict[str, Any]]] = {}
+        self.last_message: Dict[str, float] = {}  # Receive time of the last live message per product
+        self.pubsub = None
+        self.thread = None
+
+    def _apply(self, kind: str, product_id: str, payload: Dict[str, Any]):
+        """Store one message in the local cache"""
+        if kind == 'ticker':
+            self.price_cache[product_id] = payload
+        elif kind == 'book':
+            self.book_tops[product_id] = payload
+        elif kind == 'candle':
+            candles = self.candles.setdefault(product_id, [])
+            if not candles or candles[-1]['start'] < payload['start']:
+                candles.append(payload)
+                del candles[:-self.max_candles]
+
+    def _on_message(self, message: Dict[str, Any]):
+        """Handle a pub/sub message"""
+        try:
+            _, kind, product_id = message['channel'].rsplit(':', 2)
+            self._apply(kind, product_id, json.loads(message['data']))
+            self.last_message[product_id] = time.time()
+        except (ValueError, KeyError, TypeError) as e:
+            log_trade('market_bus', 'error', f"Bad market data message: {str(e)}")
+
+    def prime(self):
+        """Load last published values so the cache is usable before the next update"""
+        for kind in KINDS:
+            pattern = channel_name(f"last:{kind}", '*', self.prefix)
+            keys = list(self.redis_client.scan_iter(match=pattern, count=100))
+            if not keys:
+                continue
+            for key, value in zip(keys, self.redis_client.mget(keys)):
+                if value:
+                    self._apply(kind, key.rsplit(':', 1)[1], json.loads(value))
+
+    def start(self, sleep_time: float = 0.01):
+        """Prime the cache and listen for updates in a background thread"""
+        self.pubsub = self.redis_client.pubsub(ignore_subscribe_messages=True)
+        self.pubsub.psubscribe(**{
+            channel_name(kind, '*', self.prefix): self._on_message for kind in KINDS
+        })
+        self.prime()
+        self.thread = self.pubsub.run_in_thread(sleep_time=sleep_time, daemon=True)
+        log_trade('market_bus', 'info', "Subscribed to market data")
+
+    def stop(self):
+        """Stop listening"""
+        if self.thread:
+            self.thread.stop()
+            self.thread = None
+        if self.pubsub:
+            self.pubsub.close()
+            self.pubsub = None
+
+    def get_price(self, product_id: str) -> Optional[float]:
+        """Get latest cached price for a product"""
+        if product_id in self.price_cache:
+            return self.price_cache[product_id]['price']
+        return None
+
+    def is_fresh(self, product_id: str, max_age: float) -> bool:
+        """True if a live message for the product arrived within max_age seconds (primed values don't count)"""
+        last = self.last_message.get(product_id)
+        return last is not None and time.time() - last <= max_age
+
+    def get_ticker(self, product_id: str) -> Optional[Dict[str, Any]]:
+        """Get full ticker data for a product"""
+        return self.price_cache.get(product_id)
+
+    def get_book_top(self, product_id: str) -> Optional[Dict[str, Any]]:
+        """Get latest top-of-book for a product"""
+        return self.book_tops.get(product_id)
+
+    def get_candles(self, product_id: str) -> List[Dict[str, Any]]:
+        """Get closed 1m candles for a product, oldest first"""
+        return list(self.candles.get(product_id, []))
+
+    def get_realtime_price(self, symbol: str) -> Optional[float]:
+        """Drop-in for websocket_client.get_realtime_price (BTC/USD -> BTC-USD)"""
+        return self.get_price(symbol.replace('/', '-'))
+
+
+# Process-wide bridge/client, chosen by MARKET_DATA_BUS=publish|subscribe
+publisher: Optional[MarketDataPublisher] = None
+subscriber: Optional[MarketDataSubscriber] = None
+
+
+def start_publisher(conflate_interval: float = 0.1) -> MarketDataPublisher:
+    """Publish the global WebSocket feed to Redis"""
+    global publisher
+    if publisher is None:
+        publisher = MarketDataPublisher(conflate_interval=conflate_interval)
+        publisher.start()
+    return publisher
+
+
+def start_subscriber() -> MarketDataSubscriber:
+    """Populate a local price cache from Redis instead of opening a WebSocket"""
+    global subscriber
+    if subscriber is None:
+        subscriber = MarketDataSubscriber()
+        subscriber.start()
+    return subscriber
+
+
+def stop_market_data_bus():
+    """Stop whichever side of the bus this process runs"""
+    global publisher, subscriber
+    if publisher:
+        publisher.stop()
+        publisher = None
+    if subscriber:
+        subscriber.stop()
+        subscriber = None
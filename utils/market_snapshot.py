@@ -0,0 +1,118 @@
+"""
+Warm-restart snapshots of in-memory market state
+Components register get/set state callbacks; the snapshotter periodically writes
+them to one gzipped JSON file with an atomic rename and restores them at boot,
+so bots have books, trades, candles and indicator state before the socket catches up.
+"""
+import gzip
+import json
+import os
+import threading
+import time
+from typing import Callable, Dict, Any, Tuple
+from utils.db import DB_PATH, log_trade
+
+SNAPSHOT_PATH = os.path.join(os.path.dirname(DB_PATH), 'market_snapshot.json.gz')
+SNAPSHOT_VERSION = 1
+# Older snapshots are discarded: books, trades and open candles would be too far behind
+SNAPSHOT_MAX_AGE = float(os.getenv('MARKET_SNAPSHOT_MAX_AGE', 600))
+
+
+class MarketSnapshotter:
+    """Periodic, atomic snapshot/restore of registered state providers"""
+
+    def __init__(self, path: str = SNAPSHOT_PATH, interval: float = 30.0, max_age: float = SNAPSHOT_MAX_AGE):
+        self.path = path
+        self.interval = interval
+        self.max_age = max_age
+        self.providers: Dict[str, Tuple[Callable[[], Any], Callable[[Any], None]]] = {}
+        self.running = False
+        self.thread = None
+        self.last_save = None
+        self.last_size = 0
+
+    def register(self, name: str, get_state: Callable[[], Any], set_state: Callable[[Any], None]):
+        """Add a component whose state should survive restarts"""
+        self.providers[name] = (get_state, set_state)
+
+    def save(self) -> bool:
+        """Write all provider state to disk atomically"""
+        state = {}
+        for name, (get_state, _) in self.providers.items():
+            try:
+                state[name] = get_state()
+            except Exception as e:
+                log_trade('snapshot', 'error', f"Failed to capture {name}: {str(e)}")
+
+        payload = json.dumps({
+            'version': SNAPSHOT_VERSION,
+            'saved_at': time.time(),
+            'state': state
+        }, separators=(',', ':')).encode()
+
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        tmp_path = f"{self.path}.tmp"
+        try:
+            with open(tmp_path, 'wb') as f:
+                f.write(gzip.compress(payload, compresslevel=1))
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, self.path)
+        except OSError as e:
+            log_trade('snapshot', 'error', f"Snapshot write failed: {str(e)}")
+            return False
+
+        self.last_save = time.time()
+        self.last_size = os.path.getsize(self.path)
+        return True
+
+    def restore(self) -> bool:
+        """Load the last snapshot into registered providers; False if none usable"""
+        if not os.path.exists(self.path):
+            return False
+
+        try:
+            with open(self.path, 'rb') as f:
+                snapshot = json.loads(gzip.decompress(f.read()))
+        except (OSError, ValueError) as e:
+            log_trade('snapshot', 'error', f"Unreadable snapshot {self.path}: {str(e)}")
+            return False
+
+        if snapshot.get('version') != SNAPSHOT_VERSION:
+            return False
+        age = time.time() - snapshot.get('saved_at', 0)
+        if age > self.max_age:
+            log_trade('snapshot', 'info', f"Snapshot is {age:.0f}s old - starting cold")
+            return False
+
+        for name, (_, set_state) in self.providers.items():
+            if name in snapshot['state']:
+                try:
+                    set_state(snapshot['state'][name])
+                except Exception as e:
+                    log_trade('snapshot', 'error', f"Failed to restore {name}: {str(e)}")
+
+        log_trade('snapshot', 'info', f"Restored market state from {age:.0f}s ago")
+        return True
+
+    def _run(self):
+        """Save loop"""
+        while self.running:
+            time.sleep(self.interval)
+            if self.running:
+                self.save()
+
+    def start(self):
+        """Start periodic snapshots"""
+        self.running = True
+        self.thread = threading.Thread(target=self._run, name="MarketSnapshotter", daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        """Stop periodic snapshots and write a final one"""
+        self.running = False
+        self.save()
+
+
+# Global snapshotter
+market_snapshotter = MarketSnapshotter()
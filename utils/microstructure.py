@@ -0,0 +1,261 @@
+"""
+Streaming market microstructure features
+Computes order-flow imbalance, trade-sign imbalance, realized volatility, spread,
+VWAP deviation and volume surges from WebSocket trades and top-of-book, each in
+amortized O(1) per update using time-windowed running sums.
+"""
+import math
+import threading
+import time
+from collections import deque
+from typing import Dict, Optional, Any
+import numpy as np
+
+FEATURE_NAMES = [
+    'ofi',              # Order-flow imbalance over the window (top-of-book size changes)
+    'trade_imbalance',  # (buy volume - sell volume) / total volume, -1..1
+    'realized_vol',     # sqrt(sum of squared log returns between trades)
+    'spread_bps',       # Current quoted spread in basis points of mid
+    'vwap_deviation',   # (last price - window VWAP) / VWAP
+    'volume_ratio',     # Short-window volume rate / long-window volume rate
+    'volume_surge'      # 1.0 when volume_ratio >= surge threshold
+]
+
+
+class RollingSum:
+    """Sum of values inside a sliding time window"""
+
+    def __init__(self, window: float):
+        self.window = window
+        self.events = deque()
+        self.total = 0.0
+
+    def add(self, ts: float, value: float):
+        """Add a value and expire old ones"""
+        self.events.append((ts, value))
+        self.total += value
+        self.expire(ts)
+
+    def expire(self, now: float):
+        """Drop values older than the window"""
+        cutoff = now - self.window
+        while self.events and self.events[0][0] < cutoff:
+            self.total -= self.events.popleft()[1]
+        if not self.events:
+            self.total = 0.0  # Reset accumulated float error when empty
+
+    def to_list(self) -> list:
+        """Serializable event list"""
+        return [list(event) for event in list(self.events)]
+
+    def load(self, events: list):
+        """Restore from to_list output"""
+        self.events = deque(tuple(event) for event in events)
+        self.total = sum(value for _, value in self.events)
+
+
+class ProductFeatures:
+    """Rolling feature state for one product"""
+
+    def __init__(self, window: float, surge_short: float, surge_long: float):
+        self.ofi = RollingSum(window)
+        self.signed_volume = RollingSum(window)
+        self.volume = RollingSum(window)
+        self.notional = RollingSum(window)
+        self.squared_returns = RollingSum(window)
+        self.short_volume = RollingSum(surge_short)
+        self.long_volume = RollingSum(surge_long)
+
+        self.last_price: Optional[float] = None
+        self.last_top: Optional[tuple] = None  # (bid, bid_size, ask, ask_size)
+        self.spread_bps = 0.0
+        self.first_trade_ts: Optional[float] = None
+
+    def on_trade(self, ts: float, price: float, size: float, sign: int):
+        """Fold one trade into the windows"""
+        if self.first_trade_ts is None:
+            self.first_trade_ts = ts
+        self.signed_volume.add(ts, sign * size)
+        self.volume.add(ts, size)
+        self.notional.add(ts, price * size)
+        self.short_volume.add(ts, size)
+        self.long_volume.add(ts, size)
+        if self.last_price and price > 0:
+            self.squared_returns.add(ts, math.log(price / self.last_price) ** 2)
+        self.last_price = price
+
+    def on_top(self, ts: float, bid: float, bid_size: float, ask: float, ask_size: float):
+        """Order-flow imbalance contribution of a top-of-book change (Cont, Kukanov & Stoikov)"""
+        if self.last_top:
+            prev_bid, prev_bid_size, prev_ask, prev_ask_size = self.last_top
+            e = 0.0
+            if bid >= prev_bid:
+                e += bid_size
+            if bid <= prev_bid:
+                e -= prev_bid_size
+            if ask <= prev_ask:
+                e -= ask_size
+            if ask >= prev_ask:
+                e += prev_ask_size
+            self.ofi.add(ts, e)
+        self.last_top = (bid, bid_size, ask, ask_size)
+
+        mid = (bid + ask) / 2
+        self.spread_bps = (ask - bid) / mid * 10000 if mid > 0 else 0.0
+
+    def _windows(self) -> Dict[str, RollingSum]:
+        """All rolling windows by name"""
+        return {
+            'ofi': self.ofi, 'signed_volume': self.signed_volume, 'volume': self.volume,
+            'notional': self.notional, 'squared_returns': self.squared_returns,
+            'short_volume': self.short_volume, 'long_volume': self.long_volume
+        }
+
+    def expire(self, now: float):
+        """Expire every window to the current time"""
+        for rolling in self._windows().values():
+            rolling.expire(now)
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Serializable state for warm restarts"""
+        return {
+            'windows': {name: rolling.to_list() for name, rolling in self._windows().items()},
+            'last_price': self.last_price,
+            'last_top': self.last_top,
+            'spread_bps': self.spread_bps,
+            'first_trade_ts': self.first_trade_ts
+        }
+
+    def load(self, state: Dict[str, Any]):
+        """Restore to_dict output"""
+        for name, rolling in self._windows().items():
+            rolling.load(state['windows'].get(name, []))
+        self.last_price = state['last_price']
+        self.last_top = tuple(state['last_top']) if state['last_top'] else None
+        self.spread_bps = state['spread_bps']
+        self.first_trade_ts = state['first_trade_ts']
+
+    def volume_ratio(self, now: float) -> float:
+        """Short-window volume rate relative to the long-window baseline"""
+        # Until the long window has filled, the baseline covers only the time observed
+        if self.first_trade_ts is None:
+            return 0.0
+        observed = min(self.long_volume.window, now - self.first_trade_ts)
+        if observed <= self.short_volume.window or self.long_volume.total <= 0:
+            return 0.0
+        short_rate = self.short_volume.total / self.short_volume.window
+        long_rate = self.long_volume.total / observed
+        return short_rate / long_rate
+
+    def vector(self, now: float, surge_threshold: float) -> np.ndarray:
+        """Current features in FEATURE_NAMES order"""
+        self.expire(now)
+        volume = self.volume.total
+        trade_imbalance = self.signed_volume.total / volume if volume > 0 else 0.0
+        vwap = self.notional.total / volume if volume > 0 else 0.0
+        vwap_deviation = (self.last_price - vwap) / vwap if vwap > 0 and self.last_price else 0.0
+        ratio = self.volume_ratio(now)
+        return np.array([
+            self.ofi.total,
+            trade_imbalance,
+            math.sqrt(max(self.squared_returns.total, 0.0)),
+            self.spread_bps,
+            vwap_deviation,
+            ratio,
+            1.0 if ratio >= surge_threshold else 0.0
+        ])
+
+
+class MicrostructureEngine:
+    """Per-product streaming feature engine fed by CoinbaseWebSocket callbacks"""
+
+    def __init__(self, window: float = 300, surge_short: float = 60, surge_long: float = 1800,
+                 surge_threshold: float = 2.0):
+        self.window = window
+        self.surge_short = surge_short
+        self.surge_long = surge_long
+        self.surge_threshold = surge_threshold
+        self.products: Dict[str, ProductFeatures] = {}
+        self.lock = threading.Lock()
+        self.ws = None
+
+    def _state(self, product_id: str) -> ProductFeatures:
+        """Get or create feature state for a product"""
+        state = self.products.get(product_id)
+        if state is None:
+            state = ProductFeatures(self.window, self.surge_short, self.surge_long)
+            self.products[product_id] = state
+        return state
+
+    def on_trade(self, product_id: str, ts: float, price: float, size: float, sign: int):
+        """Feed one trade (sign +1 buyer-initiated, -1 seller-initiated)"""
+        with self.lock:
+            self._state(product_id).on_trade(ts, price, size, sign)
+
+    def on_top(self, product_id: str, ts: float, bid: float, bid_size: float,
+               ask: float, ask_size: float):
+        """Feed a top-of-book observation"""
+        with self.lock:
+            self._state(product_id).on_top(ts, bid, bid_size, ask, ask_size)
+
+    def _on_match(self, data: Dict[str, Any]):
+        """WebSocket match callback - reuse the trade the socket just recorded"""
+        trades = self.ws.trades.get(data.get('product_id'))
+        if trades:
+            ts, price, size, sign = trades[-1]
+            self.on_trade(data['product_id'], ts, price, size, sign)
+
+    def _on_book(self, data: Dict[str, Any]):
+        """WebSocket level2/ticker callback"""
+        product_id = data.get('product_id')
+        top = self.ws.get_book_top(product_id)
+        if top:
+            self.on_top(product_id, time.time(), top['bid'], top['bid_size'],
+                        top['ask'], top['ask_size'])
+
+    def attach(self, ws):
+        """Subscribe to a CoinbaseWebSocket's trades and book updates"""
+        self.ws = ws
+        ws.register_callback('match', self._on_match)
+        ws.register_callback('snapshot', self._on_book)
+        ws.register_callback('l2update', self._on_book)
+        ws.register_callback('ticker', self._on_book)
+
+    def get_state(self) -> Dict[str, Any]:
+        """Serializable per-product state (see utils/market_snapshot.py)"""
+        with self.lock:
+            return {pid: state.to_dict() for pid, state in self.products.items()}
+
+    def load_state(self, state: Dict[str, Any]):
+        """Restore get_state output"""
+        with self.lock:
+            for product_id, product_state in state.items():
+                self._state(product_id).load(product_state)
+
+    def get_vector(self, symbol: str, now: Optional[float] = None) -> np.ndarray:
+        """Feature vector for a product (BTC/USD or BTC-USD), zeros if no data yet"""
+        product_id = symbol.replace('/', '-')
+        with self.lock:
+            state = self.products.get(product_id)
+            if state is None:
+                return np.zeros(len(FEATURE_NAMES))
+            return state.vector(now or time.time(), self.surge_threshold)
+
+    def has_trades(self, symbol: str) -> bool:
+        """True once a trade has been seen for the product (BTC/USD or BTC-USD)"""
+        with self.lock:
+            state = self.products.get(symbol.replace('/', '-'))
+            return state is not None and state.first_trade_ts is not None
+
+    def get_features(self, symbol: str, now: Optional[float] = None) -> Dict[str, float]:
+        """Feature dict keyed by FEATURE_NAMES"""
+        return dict(zip(FEATURE_NAMES, self.get_vector(symbol, now).tolist()))
+
+    def is_volume_surge(self, symbol: str, threshold: Optional[float] = None) -> bool:
+        """True when short-window volume runs at threshold x the long-window rate"""
+        ratio = self.get_vector(symbol)[FEATURE_NAMES.index('volume_ratio')]
+        return ratio >= (threshold or self.surge_threshold)
+
+
+# Global engine fed by the global WebSocket
+feature_engine = MicrostructureEngine()
@@ -0,0 +1,228 @@
+"""
+Local candlestick pattern recognition
+Vectorized NumPy versions of the TA-Lib patterns TAAPI's `candle` endpoint reports.
+Every pattern works along the last axis, so one call scans a whole history or a
+(symbols, time) matrix, and returns TA-Lib style values: 100 bullish, -100
+bearish, 0 none. Candle sizes are judged against the average of the previous
+10 candles, as TA-Lib's default candle settings do.
+"""
+import time
+from typing import Callable, Dict, List, Optional
+import numpy as np
+from utils.candle_store import candle_store, CandleStore, INTERVAL_SECONDS
+from utils.indicators import sma
+
+# Candles averaged when judging a body or shadow long/short (TA-Lib default)
+AVERAGE_PERIOD = 10
+# History loaded for single-symbol lookups
+PATTERN_CANDLES = 50
+
+
+def _prev(values: np.ndarray, n: int = 1) -> np.ndarray:
+    """values shifted n candles later along the last axis (NaN-filled)"""
+    shifted = np.full(values.shape, np.nan)
+    shifted[..., n:] = values[..., :-n]
+    return shifted
+
+
+class Candles:
+    """Body/shadow geometry of OHLC arrays, with prior averages for size comparisons"""
+
+    def __init__(self, open_: np.ndarray, high: np.ndarray, low: np.ndarray, close: np.ndarray):
+        self.open = np.asarray(open_, dtype=float)
+        self.high = np.asarray(high, dtype=float)
+        self.low = np.asarray(low, dtype=float)
+        self.close = np.asarray(close, dtype=float)
+        self.body = np.abs(self.close - self.open)
+        self.range = self.high - self.low
+        self.body_high = np.maximum(self.open, self.close)
+        self.body_low = np.minimum(self.open, self.close)
+        self.upper = self.high - self.body_high
+        self.lower = self.body_low - self.low
+        self.white = self.close > self.open
+        self.black = self.close < self.open
+        # Averages of the candles before each one
+        self.avg_body = _prev(sma(self.body, AVERAGE_PERIOD))
+        self.avg_range = _prev(sma(self.range, AVERAGE_PERIOD))
+
+    def long_body(self) -> np.ndarray:
+        return self.body > self.avg_body
+
+    def short_body(self) -> np.ndarray:
+        return self.body < self.avg_body
+
+    def doji(self) -> np.ndarray:
+        return self.body <= 0.1 * self.avg_range
+
+    def very_short(self, shadow: np.ndarray) -> np.ndarray:
+        return shadow < 0.1 * self.avg_range
+
+    def shift(self, n: int) -> 'Candles':
+        """The same geometry as seen n candles later"""
+        shifted = Candles.__new__(Candles)
+        for name, value in vars(self).items():
+            moved = _prev(value.astype(float), n)
+            shifted.__dict__[name] = moved == 1 if value.dtype == bool else moved
+        return shifted
+
+
+def _signed(bullish: Optional[np.ndarray] = None, bearish: Optional[np.ndarray] = None) -> np.ndarray:
+    """Masks -> TA-Lib int values"""
+    out = np.where(bullish, 100, 0) if bullish is not None else np.zeros(bearish.shape, np.int32)
+    if bearish is not None:
+        out = np.where(bearish, -100, out)
+    return out.astype(np.int32)
+
+
+def doji(c: Candles) -> np.ndarray:
+    return _signed(c.doji())
+
+
+def hammer(c: Candles) -> np.ndarray:
+    """Small body at the top of a long lower shadow, after a decline"""
+    p = c.shift(1)
+    shape = c.short_body() & (c.lower >= 2 * c.body) & c.very_short(c.upper)
+    return _signed(shape & (c.body_low <= p.low + 0.2 * c.avg_range) & (p.close > c.close))
+
+
+def hanging_man(c: Candles) -> np.ndarray:
+    """Hammer shape after a rise"""
+    p = c.shift(1)
+    shape = c.short_body() & (c.lower >= 2 * c.body) & c.very_short(c.upper)
+    return _signed(bearish=shape & (c.body_low >= p.high - 0.2 * c.avg_range) & (p.close < c.close))
+
+
+def inverted_hammer(c: Candles) -> np.ndarray:
+    """Small body at the bottom of a long upper shadow, gapping down"""
+    p = c.shift(1)
+    shape = c.short_body() & (c.upper >= 2 * c.body) & c.very_short(c.lower)
+    return _signed(shape & p.black & (c.body_high < p.body_low))
+
+
+def shooting_star(c: Candles) -> np.ndarray:
+    """Small body at the bottom of a long upper shadow, gapping up"""
+    p = c.shift(1)
+    shape = c.short_body() & (c.upper >= 2 * c.body) & c.very_short(c.lower)
+    return _signed(bearish=shape & p.white & (c.body_low > p.body_high))
+
+
+def engulfing(c: Candles) -> np.ndarray:
+    """Body engulfs the opposite-colored previous body"""
+    p = c.shift(1)
+    bullish = c.white & p.black & (c.close >= p.open) & (c.open <= p.close) & \
+        ((c.close > p.open) | (c.open < p.close))
+    bearish = c.black & p.white & (c.open >= p.close) & (c.close <= p.open) & \
+        ((c.open > p.close) | (c.close < p.open))
+    return _signed(bullish, bearish)
+
+
+def harami(c: Candles) -> np.ndarray:
+    """Short body inside the previous long body; direction opposes the previous candle"""
+    p = c.shift(1)
+    inside = p.long_body() & c.short_body() & (c.body_high < p.body_high) & (c.body_low > p.body_low)
+    return _signed(inside & p.black, inside & p.white)
+
+
+def piercing(c: Candles) -> np.ndarray:
+    """Long white opens below the previous long black's low and closes above its midpoint"""
+    p = c.shift(1)
+    return _signed(p.black & p.long_body() & c.white & c.long_body() & (c.open < p.low) &
+                   (c.close > p.close + 0.5 * p.body) & (c.close < p.open))
+
+
+def dark_cloud_cover(c: Candles) -> np.ndarray:
+    """Long black opens above the previous long white's high and closes below its midpoint"""
+    p = c.shift(1)
+    return _signed(bearish=p.white & p.long_body() & c.black & (c.open > p.high) &
+                   (c.close < p.close - 0.5 * p.body) & (c.close > p.open))
+
+
+def morning_star(c: Candles, penetration: float = 0.3) -> np.ndarray:
+    """Long black, short body gapping down, white closing well into the first body"""
+    first, star = c.shift(2), c.shift(1)
+    return _signed(first.black & first.long_body() & star.short_body() &
+                   (star.body_high < first.body_low) & c.white & (c.body > star.body) &
+                   (c.close > first.close + penetration * first.body))
+
+
+def evening_star(c: Candles, penetration: float = 0.3) -> np.ndarray:
+    """Long white, short body gapping up, black closing well into the first body"""
+    first, star = c.shift(2), c.shift(1)
+    return _signed(bearish=first.white & first.long_body() & star.short_body() &
+                   (star.body_low > first.body_high) & c.black & (c.body > star.body) &
+                   (c.close < first.close - penetration * first.body))
+
+
+def three_white_soldiers(c: Candles) -> np.ndarray:
+    """Three rising white candles, each opening within the previous body, small upper shadows"""
+    p1, p2 = c.shift(1), c.shift(2)
+    rising = p2.white & p1.white & c.white & (p1.close > p2.close) & (c.close > p1.close)
+    opens = (p1.open > p2.open) & (p1.open <= p2.close) & (c.open > p1.open) & (c.open <= p1.close)
+    shadows = c.very_short(c.upper) & p1.very_short(p1.upper) & p2.very_short(p2.upper)
+    return _signed(rising & opens & shadows)
+
+
+def three_black_crows(c: Candles) -> np.ndarray:
+    """Three falling black candles, each opening within the previous body, small lower shadows"""
+    p1, p2 = c.shift(1), c.shift(2)
+    falling = p2.black & p1.black & c.black & (p1.close < p2.close) & (c.close < p1.close)
+    opens = (p1.open < p2.open) & (p1.open >= p2.close) & (c.open < p1.open) & (c.open >= p1.close)
+    shadows = c.very_short(c.lower) & p1.very_short(p1.lower) & p2.very_short(p2.lower)
+    return _signed(bearish=falling & opens & shadows)
+
+
+def marubozu(c: Candles) -> np.ndarray:
+    """Long body with (almost) no shadows"""
+    shape = c.long_body() & c.very_short(c.upper) & c.very_short(c.lower)
+    return _signed(shape & c.white, shape & c.black)
+
+
+# TA-Lib function name -> detector
+PATTERNS: Dict[str, Callable[[Candles], np.ndarray]] = {
+    'CDLDOJI': doji,
+    'CDLHAMMER': hammer,
+    'CDLHANGINGMAN': hanging_man,
+    'CDLINVERTEDHAMMER': inverted_hammer,
+    'CDLSHOOTINGSTAR': shooting_star,
+    'CDLENGULFING': engulfing,
+    'CDLHARAMI': harami,
+    'CDLPIERCING': piercing,
+    'CDLDARKCLOUDCOVER': dark_cloud_cover,
+    'CDLMORNINGSTAR': morning_star,
+    'CDLEVENINGSTAR': evening_star,
+    'CDL3WHITESOLDIERS': three_white_soldiers,
+    'CDL3BLACKCROWS': three_black_crows,
+    'CDLMARUBOZU': marubozu
+}
+
+
+def detect(candles: Dict[str, np.ndarray], patterns: Optional[List[str]] = None) -> Dict[str, np.ndarray]:
+    """
+    Pattern values for every candle: {'valueCDLHAMMER': array, ...}. candles holds
+    open/high/low/close arrays, 1-D for one history or (symbols, time) matrices.
+    """
+    c = Candles(candles['open'], candles['high'], candles['low'], candles['close'])
+    return {f"value{name}": PATTERNS[name](c) for name in (patterns or PATTERNS)}
+
+
+def latest_patterns(values: Dict[str, np.ndarray], backtrack: int = 0) -> Dict[str, int]:
+    """One candle's values from detect() on a 1-D history, like TAAPI's `candle` response"""
+    return {key: int(series[-1 - backtrack]) for key, series in values.items()}
+
+
+def get_pattern(symbol: str, interval: str, backtrack: int = 0,
+                store: CandleStore = candle_store) -> Optional[Dict[str, int]]:
+    """Patterns on the latest stored candle; None without enough fresh history"""
+    candles = store.get_candles(symbol, interval, limit=PATTERN_CANDLES + backtrack)
+    if len(candles['close']) <= AVERAGE_PERIOD + 2 + backtrack or \
+            candles['start'][-1] < time.time() - 2 * INTERVAL_SECONDS[interval]:
+        return None
+    return latest_patterns(detect(candles), backtrack)
+
+
+def scan(symbols: List[str], interval: str, limit: int = PATTERN_CANDLES,
+         store: CandleStore = candle_store) -> Dict[str, Dict[str, int]]:
+    """Latest-candle patterns for many symbols in one vectorized pass (NaN rows match nothing)"""
+    values = detect(store.get_matrix(symbols, interval, limit=limit))
+    return {symbol: {key: int(series[row, -1]) for key, series in values.items()}
+            for row, symbol in enumerate(symbols)}
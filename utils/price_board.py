@@ -0,0 +1,259 @@
+"""
+Cross-process shared-memory price board
+One feed process publishes tickers, any number of reader processes read them
+without sockets or serialization. Each product owns a fixed slot guarded by a
+seqlock so readers always see a consistent (price, bid, ask, volume, ts) tuple.
+"""
+import os
+import struct
+import sys
+import threading
+import time
+from multiprocessing import shared_memory
+from typing import Dict, List, Optional, Any
+
+DEFAULT_BOARD_NAME = "goat_price_board"
+DEFAULT_CAPACITY = 64
+
+# Header: magic, layout version, slot capacity, slots in use, retired flag, board id
+_HEADER = struct.Struct("<4sIIIIQ")
+_MAGIC = b"GPB1"
+_VERSION = 2
+_COUNT_OFFSET = 12
+_RETIRED_OFFSET = 16
+_U32 = struct.Struct("<I")
+
+# Slot: product id, seq, price, bid, ask, volume, ts
+_NAME_SIZE = 32
+_SLOT = struct.Struct(f"<{_NAME_SIZE}sQddddd")
+_SEQ = struct.Struct("<Q")
+_DATA = struct.Struct("<ddddd")
+_SEQ_OFFSET = _NAME_SIZE
+_DATA_OFFSET = _NAME_SIZE + _SEQ.size
+
+# Readers give up on a slot after this many torn reads (writer stuck mid-update)
+MAX_READ_RETRIES = 1000
+# How often a cached reader checks that its segment is still the one behind the name
+REOPEN_CHECK_INTERVAL = 5.0
+
+
+def _attach(name: str) -> shared_memory.SharedMemory:
+    """Attach to an existing segment without letting this process unlink it on exit"""
+    if sys.version_info >= (3, 13):
+        return shared_memory.SharedMemory(name=name, track=False)
+    shm = shared_memory.SharedMemory(name=name)
+    try:
+        # Before 3.13 every attach registers with the resource tracker, which
+        # destroys the segment when a reader exits
+        from multiprocessing import resource_tracker
+        resource_tracker.unregister(shm._name, "shared_memory")
+    except Exception:
+        pass
+    return shm
+
+
+class PriceBoard:
+    """Fixed-slot price board in shared memory with seqlock-consistent reads"""
+
+    def __init__(self, name: str = DEFAULT_BOARD_NAME, capacity: int = DEFAULT_CAPACITY,
+                 create: bool = False):
+        self.name = name
+        self.owner = create
+        self.lock = threading.Lock()
+        self.slots: Dict[str, int] = {}
+
+        if create:
+            size = _HEADER.size + capacity * _SLOT.size
+            try:
+                self.shm = shared_memory.SharedMemory(name=name, create=True, size=size)
+            except FileExistsError:
+                # Stale segment from a previous feed process - retire it for its readers, take it over
+                stale = _attach(name)
+                if bytes(stale.buf[:4]) == _MAGIC:
+                    _U32.pack_into(stale.buf, _RETIRED_OFFSET, 1)
+                stale.close()
+                stale.unlink()
+                self.shm = shared_memory.SharedMemory(name=name, create=True, size=size)
+            self.buf = self.shm.buf
+            self.buf[:size] = bytes(size)
+            self.board_id = int.from_bytes(os.urandom(8), "little")
+            _HEADER.pack_into(self.buf, 0, _MAGIC, _VERSION, capacity, 0, 0, self.board_id)
+            self.capacity = capacity
+        else:
+            self.shm = _attach(name)
+            self.buf = self.shm.buf
+            magic, version, capacity, _, _, board_id = _HEADER.unpack_from(self.buf, 0)
+            if magic != _MAGIC or version != _VERSION:
+                self.shm.close()
+                raise ValueError(f"Shared memory segment {name} is not a price board")
+            self.capacity = capacity
+            self.board_id = board_id
+
+    def _slot_offset(self, index: int) -> int:
+        """Byte offset of a slot"""
+        return _HEADER.size + index * _SLOT.size
+
+    def _count(self) -> int:
+        """Number of slots assigned by the writer"""
+        return _U32.unpack_from(self.buf, _COUNT_OFFSET)[0]
+
+    def retired(self) -> bool:
+        """True once the writer has unlinked or replaced this segment"""
+        return bool(_U32.unpack_from(self.buf, _RETIRED_OFFSET)[0])
+
+    def is_current(self) -> bool:
+        """True if the board name still maps to this segment (a restarted feed creates a new one)"""
+        if self.retired():
+            return False
+        try:
+            current = PriceBoard(name=self.name)
+        except (FileNotFoundError, ValueError):
+            return False
+        same = current.board_id == self.board_id
+        current.close()
+        return same
+
+    def _refresh_slots(self):
+        """Rebuild the product -> slot index from the shared header"""
+        for index in range(len(self.slots), self._count()):
+            raw = bytes(self.buf[self._slot_offset(index):self._slot_offset(index) + _NAME_SIZE])
+            self.slots[raw.rstrip(b"\x00").decode()] = index
+
+    def _assign_slot(self, product_id: str) -> int:
+        """Assign the next free slot to a product (writer only)"""
+        encoded = product_id.encode()
+        if len(encoded) > _NAME_SIZE:
+            raise ValueError(f"Product id too long for price board: {product_id}")
+
+        count = self._count()
+        if count >= self.capacity:
+            raise ValueError(f"Price board full ({self.capacity} slots)")
+
+        offset = self._slot_offset(count)
+        self.buf[offset:offset + _NAME_SIZE] = encoded.ljust(_NAME_SIZE, b"\x00")
+        # Publish the name before the count so readers never see an empty slot
+        _U32.pack_into(self.buf, _COUNT_OFFSET, count + 1)
+        self.slots[product_id] = count
+        return count
+
+    def publish(self, product_id: str, price: float, bid: float = 0.0, ask: float = 0.0,
+                volume: float = 0.0, ts: Optional[float] = None):
+        """Write a ticker into the product's slot"""
+        if not self.owner:
+            raise PermissionError("Only the creating process may publish to the price board")
+
+        with self.lock:
+            index = self.slots.get(product_id)
+            if index is None:
+                index = self._assign_slot(product_id)
+
+            offset = self._slot_offset(index)
+            seq = _SEQ.unpack_from(self.buf, offset + _SEQ_OFFSET)[0]
+            # Odd sequence marks the slot as being written
+            _SEQ.pack_into(self.buf, offset + _SEQ_OFFSET, seq + 1)
+            _DATA.pack_into(self.buf, offset + _DATA_OFFSET,
+                            price, bid, ask, volume, ts if ts is not None else time.time())
+            _SEQ.pack_into(self.buf, offset + _SEQ_OFFSET, seq + 2)
+
+    def _read_slot(self, index: int) -> Optional[tuple]:
+        """Seqlock read of one slot: retry until the sequence is even and unchanged"""
+        offset = self._slot_offset(index)
+        for _ in range(MAX_READ_RETRIES):
+            before = _SEQ.unpack_from(self.buf, offset + _SEQ_OFFSET)[0]
+            if before & 1:
+                continue
+            data = _DATA.unpack_from(self.buf, offset + _DATA_OFFSET)
+            after = _SEQ.unpack_from(self.buf, offset + _SEQ_OFFSET)[0]
+            if before == after:
+                if before == 0:
+                    return None  # Slot assigned but never written
+                return (before // 2,) + data
+        return None
+
+    def read(self, product_id: str) -> Optional[Dict[str, Any]]:
+        """Get a consistent ticker for a product, in the same shape as the WebSocket price cache"""
+        index = self.slots.get(product_id)
+        if index is None:
+            self._refresh_slots()
+            index = self.slots.get(product_id)
+            if index is None:
+                return None
+
+        result = self._read_slot(index)
+        if result is None:
+            return None
+
+        seq, price, bid, ask, volume, ts = result
+        return {
+            'price': price,
+            'best_bid': bid,
+            'best_ask': ask,
+            'volume_24h': volume,
+            'time': ts,
+            'seq': seq
+        }
+
+    def get_price(self, product_id: str) -> Optional[float]:
+        """Get latest price for a product"""
+        ticker = self.read(product_id)
+        return ticker['price'] if ticker else None
+
+    def products(self) -> List[str]:
+        """List products that have a slot on the board"""
+        self._refresh_slots()
+        return list(self.slots.keys())
+
+    def snapshot(self) -> Dict[str, Dict[str, Any]]:
+        """Read every product on the board"""
+        result = {}
+        for product_id in self.products():
+            ticker = self.read(product_id)
+            if ticker:
+                result[product_id] = ticker
+        return result
+
+    def close(self):
+        """Detach from the segment"""
+        self.buf = None
+        self.shm.close()
+
+    def unlink(self):
+        """Destroy the segment (owner only), first marking it retired so attached readers reopen"""
+        if self.owner:
+            if self.buf is not None:
+                _U32.pack_into(self.buf, _RETIRED_OFFSET, 1)
+            self.shm.unlink()
+
+
+# Lazily attached reader for processes that don't own the feed, shared by every thread
+_reader_lock = threading.Lock()
+_reader_board: Optional[PriceBoard] = None
+_reader_checked = 0.0
+# The reader swapped out last time, kept open until the next swap so threads still
+# inside a read on it never hit a closed segment
+_retired_reader: Optional[PriceBoard] = None
+
+
+def get_price_board(name: str = DEFAULT_BOARD_NAME) -> Optional[PriceBoard]:
+    """
+    Attach to the shared price board, or None if no feed process has created it.
+    The cached reader is dropped once its segment is retired or replaced, so a
+    restarted feed is picked up instead of serving frozen prices.
+    """
+    global _reader_board, _reader_checked, _retired_reader
+    with _reader_lock:
+        now = time.monotonic()
+        if _reader_board is not None and (_reader_board.retired() or
+                                          now - _reader_checked >= REOPEN_CHECK_INTERVAL):
+            _reader_checked = now
+            if not _reader_board.is_current():
+                if _retired_reader is not None:
+                    _retired_reader.close()
+                _retired_reader, _reader_board = _reader_board, None
+        if _reader_board is None:
+            try:
+                _reader_board = PriceBoard(name=name)
+            except (FileNotFoundError, ValueError):
+                return None
+            _reader_checked = now
+        return _reader_board
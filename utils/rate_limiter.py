@@ -1,22 +1,152 @@
 """
 Universal rate limiter for all APIs
-Implements token bucket algorithm with Redis backend
+Implements token bucket algorithm with Redis backend, or GCRA per API
 """
+import asyncio
+import atexit
+import heapq
+import itertools
+import os
 import time
 import redis
-from typing import Dict, Optional, Callable
+from typing import Dict, Optional, Callable, Any, Mapping
+from email.utils import parsedate_to_datetime
 from functools import wraps
 from datetime import datetime, timedelta
 import threading
 
+# Refill and consume in one atomic step on the Redis server, timed by the server's clock.
+# ARGV: max_tokens, refill_rate, requested[, wanted, refund]. Grants between requested and
+# wanted tokens (a lease) after crediting back `refund` unused leased tokens.
+# Returns {granted, wait}; wait is a string because Lua numbers come back as integers.
+TOKEN_BUCKET_SCRIPT = """
+local max_tokens = tonumber(ARGV[1])
+local refill_rate = tonumber(ARGV[2])
+local requested = tonumber(ARGV[3])
+local wanted = tonumber(ARGV[4]) or requested
+local refund = tonumber(ARGV[5]) or 0
+local time = redis.call('TIME')
+local now = tonumber(time[1]) + tonumber(time[2]) / 1000000
+local bucket = redis.call('HMGET', KEYS[1], 'tokens', 'last_refill')
+local tokens = tonumber(bucket[1]) or max_tokens
+local last_refill = tonumber(bucket[2]) or now
+tokens = math.min(max_tokens, tokens + refund + math.max(0, now - last_refill) * refill_rate)
+local granted = 0
+local wait = 0
+if tokens >= requested then
+    granted = math.max(requested, math.min(wanted, math.floor(tokens)))
+    tokens = tokens - granted
+else
+    wait = (requested - tokens) / refill_rate
+end
+redis.call('HSET', KEYS[1], 'tokens', tokens, 'last_refill', now,
+           'max_tokens', max_tokens, 'refill_rate', refill_rate)
+redis.call('EXPIRE', KEYS[1], 3600)
+return {granted, tostring(wait)}
+"""
+
+# GCRA: one theoretical arrival time (TAT) per key, read and written in one atomic step.
+# ARGV: burst tolerance (max_tokens / refill_rate), increment (requested / refill_rate).
+# Returns {granted, wait} like TOKEN_BUCKET_SCRIPT.
+GCRA_SCRIPT = """
+local tolerance = tonumber(ARGV[1])
+local increment = tonumber(ARGV[2])
+local time = redis.call('TIME')
+local now = tonumber(time[1]) + tonumber(time[2]) / 1000000
+local tat = math.max(tonumber(redis.call('GET', KEYS[1])) or now, now)
+local new_tat = tat + increment
+local wait = new_tat - tolerance - now
+if wait > 0 then
+    return {0, tostring(wait)}
+end
+redis.call('SET', KEYS[1], tostring(new_tat), 'PX', math.ceil((new_tat - now) * 1000) + 1)
+return {1, '0'}
+"""
+
+TOKEN_BUCKET = 'token_bucket'
+GCRA = 'gcra'
+
+# acquire() priorities: lower goes first
+PRIORITY_CRITICAL = 0  # Order placement / cancellation
+PRIORITY_NORMAL = 10
+PRIORITY_BACKGROUND = 20  # Indicator, sentiment and history refreshes
+
+COINBASE_RATE_LIMIT = 30  # Coinbase REST requests/second
+
+
+class RateLimitExceeded(Exception):
+    """acquire() deadline passed before tokens were available"""
+
+
+class _WaitQueue:
+    """Waiters for one bucket, ordered by (priority, arrival)"""
+    
+    def __init__(self):
+        self.cond = threading.Condition()
+        self.heap = []
+        self.counter = itertools.count()
+
+# get_limits_status() snapshot lifetime (seconds) and SCAN/pipeline batch size
+STATUS_CACHE_TTL = 2.0
+STATUS_SCAN_COUNT = 500
+
+# AIMD tuning for learned rates
+AIMD_DECREASE = 0.5  # Rate multiplier on a 429
+AIMD_INCREASE = 0.02  # Fraction of the configured rate added per successful response
+AIMD_FLOOR = 0.1  # Never below this fraction of the configured rate
+# Never above the configured rate, unless X-RateLimit-Limit reports a different limit
+
+
+def _header_number(value: Optional[str]) -> Optional[float]:
+    """Leading number of a header value ('100', '100, 100;w=60'), None if absent"""
+    if value is None:
+        return None
+    head = str(value).split(',')[0].split(';')[0].strip()
+    try:
+        return float(head)
+    except ValueError:
+        return None
+
+
+def _retry_after(value: Optional[str]) -> Optional[float]:
+    """Retry-After as seconds (delta-seconds or HTTP-date)"""
+    seconds = _header_number(value)
+    if seconds is not None or value is None:
+        return seconds
+    try:
+        return max(parsedate_to_datetime(value).timestamp() - time.time(), 0.0)
+    except (TypeError, ValueError):
+        return None
+
 class RateLimiter:
     """Token bucket rate limiter with fallback to in-memory"""
     
-    def __init__(self, use_redis: bool = True):
+    def __init__(self, use_redis: bool = True, lease_size: int = 0, lease_ttl: float = 1.0):
         self.use_redis = use_redis
         self.redis_client = None
         self.local_buckets: Dict[str, Dict] = {}
-        self.lock = threading.Lock()
+        self.lock = threading.RLock()
+        
+        # Hierarchical mode: lease up to lease_size tokens (at most a tenth of a bucket) from
+        # Redis and serve consume() locally until they run out or lease_ttl passes
+        self.lease_size = lease_size
+        self.lease_ttl = lease_ttl
+        self.leases: Dict[str, Dict] = {}
+        self.lease_locks: Dict[str, threading.Lock] = {}
+        self.lease_hits = 0
+        self.lease_refills = 0
+        
+        self.wait_queues: Dict[str, _WaitQueue] = {}
+        self.status_snapshot: Optional[tuple] = None  # (taken_at, status)
+        
+        # Per-API algorithm (default TOKEN_BUCKET); GCRA keeps one TAT per key
+        self.algorithms: Dict[str, str] = {}
+        self.local_tats: Dict[str, float] = {}
+        self.gcra_limits: Dict[str, tuple] = {}  # key -> (max_tokens, refill_rate), for status
+        
+        # Adaptive (AIMD) rates learned per API from responses; see record_response()
+        self.configured: Dict[str, tuple] = {}
+        self.adaptive: Dict[str, Dict[str, Any]] = {}
         
         if use_redis:
             try:
@@ -27,61 +157,47 @@ class RateLimiter:
                     socket_connect_timeout=1
                 )
                 self.redis_client.ping()
+                # Loaded once; calls go out as EVALSHA (re-loaded automatically after a flush)
+                self.consume_script = self.redis_client.register_script(TOKEN_BUCKET_SCRIPT)
+                self.gcra_script = self.redis_client.register_script(GCRA_SCRIPT)
             except:
                 print("Redis not available, using in-memory rate limiting")
                 self.use_redis = False
+        
+        if self.use_redis and lease_size > 0:
+            threading.Thread(target=self._reap_leases, name="RateLimitLeases", daemon=True).start()
+            atexit.register(self.release_leases)
     
     def _get_bucket_key(self, api_name: str, endpoint: str = "default") -> str:
         """Generate bucket key"""
         return f"rate_limit:{api_name}:{endpoint}"
     
+    def _get_gcra_key(self, api_name: str, endpoint: str = "default") -> str:
+        """GCRA TAT key (a plain string, so kept apart from token bucket hashes)"""
+        return f"gcra:{api_name}:{endpoint}"
+    
+    def set_algorithm(self, api_name: str, algorithm: str):
+        """Limit api_name with TOKEN_BUCKET or GCRA (same max_tokens/refill_rate meaning)"""
+        if algorithm not in (TOKEN_BUCKET, GCRA):
+            raise ValueError(f"Unknown rate limit algorithm: {algorithm}")
+        self.algorithms[api_name] = algorithm
+    
     def _get_bucket(self, key: str, max_tokens: int, refill_rate: float) -> Dict:
-        """Get or create token bucket"""
-        if self.use_redis and self.redis_client:
-            # Redis implementation
-            data = self.redis_client.hgetall(key)
-            if not data:
-                # Initialize bucket
-                bucket = {
+        """Get or create an in-memory token bucket (Redis buckets live in consume_script)"""
+        with self.lock:
+            if key not in self.local_buckets:
+                self.local_buckets[key] = {
                     "tokens": max_tokens,
                     "last_refill": time.time(),
                     "max_tokens": max_tokens,
                     "refill_rate": refill_rate
                 }
-                self.redis_client.hset(key, mapping={
-                    k: str(v) for k, v in bucket.items()
-                })
-                self.redis_client.expire(key, 3600)  # 1 hour expiry
-                return bucket
-            else:
-                return {
-                    "tokens": float(data.get("tokens", max_tokens)),
-                    "last_refill": float(data.get("last_refill", time.time())),
-                    "max_tokens": int(data.get("max_tokens", max_tokens)),
-                    "refill_rate": float(data.get("refill_rate", refill_rate))
-                }
-        else:
-            # In-memory implementation
-            with self.lock:
-                if key not in self.local_buckets:
-                    self.local_buckets[key] = {
-                        "tokens": max_tokens,
-                        "last_refill": time.time(),
-                        "max_tokens": max_tokens,
-                        "refill_rate": refill_rate
-                    }
-                return self.local_buckets[key].copy()
+            return self.local_buckets[key].copy()
     
     def _save_bucket(self, key: str, bucket: Dict):
-        """Save bucket state"""
-        if self.use_redis and self.redis_client:
-            self.redis_client.hset(key, mapping={
-                k: str(v) for k, v in bucket.items()
-            })
-            self.redis_client.expire(key, 3600)
-        else:
-            with self.lock:
-                self.local_buckets[key] = bucket
+        """Save in-memory bucket state"""
+        with self.lock:
+            self.local_buckets[key] = bucket
     
     def consume(self, api_name: str, tokens: int = 1, 
                endpoint: str = "default", max_tokens: int = 10, 
@@ -91,134 +207,390 @@ class RateLimiter:
         Returns: (allowed, wait_time_seconds)
         """
         key = self._get_bucket_key(api_name, endpoint)
+        max_tokens, refill_rate, blocked = self._adapt(api_name, max_tokens, refill_rate)
+        if blocked > 0:
+            return False, blocked
+        if self.algorithms.get(api_name) == GCRA:
+            return self._consume_gcra(self._get_gcra_key(api_name, endpoint), tokens, max_tokens, refill_rate)
         
-        # Get current bucket state
-        bucket = self._get_bucket(key, max_tokens, refill_rate)
-        
-        # Refill tokens based on time passed
-        now = time.time()
-        time_passed = now - bucket["last_refill"]
-        tokens_to_add = time_passed * bucket["refill_rate"]
+        if self.use_redis and self.redis_client:
+            if self.lease_size > 0:
+                return self._consume_leased(key, tokens, max_tokens, refill_rate)
+            # One round trip; concurrent processes can't both spend the same tokens
+            granted, wait_time = self.consume_script(keys=[key], args=[max_tokens, refill_rate, tokens])
+            return bool(granted), float(wait_time)
         
-        bucket["tokens"] = min(
-            bucket["max_tokens"],
-            bucket["tokens"] + tokens_to_add
-        )
-        bucket["last_refill"] = now
+        with self.lock:
+            # Get current bucket state
+            bucket = self._get_bucket(key, max_tokens, refill_rate)
+            
+            # Limits may have been re-learned since the bucket was created
+            bucket["max_tokens"] = max_tokens
+            bucket["refill_rate"] = refill_rate
+            
+            # Refill tokens based on time passed
+            now = time.time()
+            time_passed = now - bucket["last_refill"]
+            tokens_to_add = time_passed * bucket["refill_rate"]
+            
+            bucket["tokens"] = min(
+                bucket["max_tokens"],
+                bucket["tokens"] + tokens_to_add
+            )
+            bucket["last_refill"] = now
+            
+            # Check if we can consume
+            if bucket["tokens"] >= tokens:
+                bucket["tokens"] -= tokens
+                self._save_bucket(key, bucket)
+                return True, 0.0
+            else:
+                # Calculate wait time
+                tokens_needed = tokens - bucket["tokens"]
+                wait_time = tokens_needed / bucket["refill_rate"]
+                self._save_bucket(key, bucket)
+                return False, wait_time
+    
+    def _consume_gcra(self, key: str, tokens: int, max_tokens: int,
+                      refill_rate: float) -> tuple[bool, float]:
+        """
+        Generic Cell Rate Algorithm: allows a burst of max_tokens, then refill_rate per
+        second, storing only the theoretical arrival time. Leases don't apply.
+        """
+        interval = 1.0 / refill_rate
+        tolerance = max_tokens * interval
+        self.gcra_limits[key] = (max_tokens, refill_rate)
+        if self.use_redis and self.redis_client:
+            granted, wait_time = self.gcra_script(keys=[key], args=[tolerance, tokens * interval])
+            return bool(granted), float(wait_time)
         
-        # Check if we can consume
-        if bucket["tokens"] >= tokens:
-            bucket["tokens"] -= tokens
-            self._save_bucket(key, bucket)
+        with self.lock:
+            now = time.time()
+            new_tat = max(self.local_tats.get(key, now), now) + tokens * interval
+            wait_time = new_tat - tolerance - now
+            if wait_time > 0:
+                return False, wait_time
+            self.local_tats[key] = new_tat
             return True, 0.0
-        else:
-            # Calculate wait time
-            tokens_needed = tokens - bucket["tokens"]
-            wait_time = tokens_needed / bucket["refill_rate"]
-            self._save_bucket(key, bucket)
-            return False, wait_time
+    
+    def _consume_leased(self, key: str, tokens: int, max_tokens: int,
+                        refill_rate: float) -> tuple[bool, float]:
+        """Spend from this process's lease; go to Redis only to renew it"""
+        with self.lock:
+            lock = self.lease_locks.setdefault(key, threading.Lock())
+        with lock:
+            now = time.time()
+            lease = self.leases.get(key)
+            if lease and lease["expires"] > now and lease["tokens"] >= tokens:
+                lease["tokens"] -= tokens
+                self.lease_hits += 1
+                return True, 0.0
+            
+            # Renew, handing back whatever is left of the old lease in the same call
+            refund = lease["tokens"] if lease else 0
+            wanted = max(tokens, min(self.lease_size, max_tokens // 10))
+            granted, wait_time = self.consume_script(
+                keys=[key], args=[max_tokens, refill_rate, tokens, wanted, refund])
+            granted = int(granted)
+            self.lease_refills += 1
+            if not granted:
+                self.leases.pop(key, None)
+                return False, float(wait_time)
+            self.leases[key] = {"tokens": granted - tokens, "expires": now + self.lease_ttl,
+                                "max_tokens": max_tokens, "refill_rate": refill_rate}
+            return True, 0.0
+    
+    def release_leases(self, expired_only: bool = False) -> int:
+        """Return unused leased tokens to Redis - every lease (e.g. at shutdown) or only expired ones"""
+        if not (self.use_redis and self.redis_client):
+            return 0
+        with self.lock:
+            keys = list(self.leases)
+        returned = 0
+        for key in keys:
+            with self.lease_locks[key]:
+                lease = self.leases.get(key)
+                if lease is None or (expired_only and lease["expires"] > time.time()):
+                    continue
+                del self.leases[key]
+                if lease["tokens"] > 0:
+                    self.consume_script(keys=[key], args=[lease["max_tokens"], lease["refill_rate"],
+                                                          0, 0, lease["tokens"]])
+                    returned += lease["tokens"]
+        return returned
+    
+    def _reap_leases(self):
+        """Background loop: hand back expired leases so idle keys don't sit on tokens"""
+        while True:
+            time.sleep(self.lease_ttl)
+            try:
+                self.release_leases(expired_only=True)
+            except redis.RedisError as e:
+                print(f"Lease release failed: {e}")
+    
+    def _adapt(self, api_name: str, max_tokens: int, refill_rate: float) -> tuple:
+        """Configured limits scaled to the learned rate, plus any server-imposed cooldown"""
+        if api_name not in self.configured:
+            with self.lock:
+                self.configured.setdefault(api_name, (max_tokens, refill_rate))
+        state = self.adaptive.get(api_name)
+        if state is None:
+            return max_tokens, refill_rate, 0.0
+        
+        with self.lock:
+            scale = state["scale"]
+            blocked = state["blocked_until"] - time.time()
+        return max(1, int(round(max_tokens * scale))), refill_rate * scale, max(blocked, 0.0)
+    
+    def _ceiling(self, api_name: str, state: Dict[str, Any]) -> float:
+        """Highest scale of the configured rate: 1.0, or the X-RateLimit-Limit header's share of it"""
+        if state["limit"] and api_name in self.configured:
+            # The header limit applies to the configured window
+            return state["limit"] / self.configured[api_name][0]
+        return 1.0
+    
+    def _state(self, api_name: str) -> Dict[str, Any]:
+        """Adaptive state of an API (caller holds self.lock)"""
+        state = self.adaptive.get(api_name)
+        if state is None:
+            state = self.adaptive[api_name] = {
+                "scale": 1.0, "limit": None, "blocked_until": 0.0, "successes": 0, "rate_limited": 0
+            }
+        return state
+    
+    def record_response(self, api_name: str, status_code: int, headers: Optional[Mapping[str, str]] = None):
+        """
+        Learn an API's effective rate from a response: additive increase on success up to
+        the configured (or X-RateLimit-Limit) rate, multiplicative decrease on 429, and a
+        cooldown from Retry-After or an exhausted X-RateLimit-Remaining.
+        The rate is kept as a fraction of the configured one, so responses that arrive
+        before the first consume() count too.
+        """
+        headers = headers or {}
+        now = time.time()
+        with self.lock:
+            state = self._state(api_name)
+            limit = _header_number(headers.get("X-RateLimit-Limit"))
+            if limit:
+                state["limit"] = limit
+            
+            wait = _retry_after(headers.get("Retry-After"))
+            remaining = _header_number(headers.get("X-RateLimit-Remaining"))
+            reset = _header_number(headers.get("X-RateLimit-Reset"))
+            if wait is None and remaining == 0 and reset is not None:
+                wait = reset - now if reset > 1e9 else reset  # Epoch or delta seconds
+            if wait:
+                state["blocked_until"] = max(state["blocked_until"], now + wait)
+            
+            ceiling = self._ceiling(api_name, state)
+            if status_code == 429:
+                state["rate_limited"] += 1
+                state["scale"] = max(state["scale"] * AIMD_DECREASE, AIMD_FLOOR)
+            elif status_code < 400:
+                state["successes"] += 1
+                state["scale"] = min(state["scale"] + AIMD_INCREASE, ceiling)
+            else:
+                return
+            state["scale"] = min(state["scale"], ceiling)
+    
+    def block(self, api_name: str, seconds: float):
+        """Hold every bucket of api_name for `seconds` (a 429 that carried no Retry-After)"""
+        with self.lock:
+            state = self._state(api_name)
+            state["blocked_until"] = max(state["blocked_until"], time.time() + seconds)
+    
+    def cooldown(self, api_name: str) -> float:
+        """Seconds left on a server-imposed cooldown (Retry-After / exhausted X-RateLimit-Remaining)"""
+        with self.lock:
+            state = self.adaptive.get(api_name)
+            return max(state["blocked_until"] - time.time(), 0.0) if state else 0.0
+    
+    def get_learned_rates(self) -> Dict[str, Dict[str, float]]:
+        """Current learned rate per API vs. its configured rate (requests/second)"""
+        now = time.time()
+        with self.lock:
+            rates = {}
+            for api_name, state in self.adaptive.items():
+                configured = self.configured.get(api_name, (None, None))[1]
+                rates[api_name] = {
+                    "configured_rate": configured,
+                    "learned_rate": None if configured is None else configured * state["scale"],
+                    "ceiling": None if configured is None else configured * self._ceiling(api_name, state),
+                    "cooldown": round(max(state["blocked_until"] - now, 0.0), 3),
+                    "successes": state["successes"],
+                    "rate_limited": state["rate_limited"]
+                }
+            return rates
+    
+    def get_lease_stats(self) -> Dict[str, float]:
+        """How often consume() was served locally vs. renewing a lease from Redis"""
+        with self.lock:
+            return {
+                "lease_hits": self.lease_hits,
+                "lease_refills": self.lease_refills,
+                "leased_tokens": sum(lease["tokens"] for lease in self.leases.values())
+            }
+    
+    def acquire(self, api_name: str, tokens: int = 1, endpoint: str = "default",
+                max_tokens: int = 10, refill_rate: float = 1.0,
+                priority: int = PRIORITY_NORMAL, timeout: Optional[float] = None) -> bool:
+        """
+        Block until tokens are granted; False if `timeout` seconds pass first.
+        Waiters on a bucket are served in (priority, arrival) order: only the head of
+        the queue polls the bucket, so woken threads can't stampede past the limit.
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        key = self._get_bucket_key(api_name, endpoint)
+        with self.lock:
+            queue = self.wait_queues.setdefault(key, _WaitQueue())
+        
+        with queue.cond:
+            entry = (priority, next(queue.counter))
+            heapq.heappush(queue.heap, entry)
+            try:
+                while True:
+                    wait_time = None  # Not at the head: sleep until the queue changes
+                    if queue.heap[0] == entry:
+                        allowed, wait_time = self.consume(api_name, tokens, endpoint, max_tokens, refill_rate)
+                        if allowed:
+                            return True
+                    if deadline is not None:
+                        remaining = deadline - time.monotonic()
+                        if remaining <= 0:
+                            return False
+                        wait_time = remaining if wait_time is None else min(wait_time, remaining)
+                    queue.cond.wait(wait_time)
+            finally:
+                queue.heap.remove(entry)
+                heapq.heapify(queue.heap)
+                queue.cond.notify_all()
+    
+    async def acquire_async(self, api_name: str, tokens: int = 1, endpoint: str = "default",
+                            max_tokens: int = 10, refill_rate: float = 1.0,
+                            priority: int = PRIORITY_NORMAL, timeout: Optional[float] = None) -> bool:
+        """acquire() for coroutines; waits in the same queue without blocking the event loop"""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(
+            None, lambda: self.acquire(api_name, tokens, endpoint, max_tokens, refill_rate, priority, timeout))
     
     def rate_limit(self, api_name: str, max_calls: int = 10, 
-                  per_seconds: float = 60.0, cost: int = 1):
+                  per_seconds: float = 60.0, cost: int = 1,
+                  priority: int = PRIORITY_NORMAL, timeout: Optional[float] = None,
+                  bucket: str = "default"):
         """
-        Decorator for rate limiting functions
+        Decorator for rate limiting functions. Waits its turn via acquire();
+        raises RateLimitExceeded only if a timeout is given and passes.
+        Every function decorated for an API shares one bucket and wait queue (pass
+        `bucket` to split them), so priorities order calls across functions.
         """
         def decorator(func: Callable) -> Callable:
             @wraps(func)
             def wrapper(*args, **kwargs):
-                # Calculate refill rate
-                refill_rate = max_calls / per_seconds
-                
-                # Try to consume tokens
-                allowed, wait_time = self.consume(
-                    api_name=api_name,
-                    tokens=cost,
-                    endpoint=func.__name__,
-                    max_tokens=max_calls,
-                    refill_rate=refill_rate
-                )
-                
-                if allowed:
-                    return func(*args, **kwargs)
-                else:
-                    # Wait and retry
-                    if wait_time < 60:  # Don't wait more than 1 minute
-                        time.sleep(wait_time)
-                        return func(*args, **kwargs)
-                    else:
-                        raise Exception(f"Rate limit exceeded for {api_name}. Wait {wait_time:.1f}s")
+                if not self.acquire(api_name, cost, bucket, max_calls,
+                                    max_calls / per_seconds, priority, timeout):
+                    raise RateLimitExceeded(f"Rate limit exceeded for {api_name}: no token within {timeout}s")
+                return func(*args, **kwargs)
             
             return wrapper
         return decorator
     
-    def get_limits_status(self) -> Dict[str, Dict]:
-        """Get current status of all rate limits"""
-        status = {}
-        
+    def _gcra_tokens(self, tat: float, now: float, max_tokens: int, refill_rate: float) -> tuple:
+        """(tokens available, max_tokens) equivalent of a TAT"""
+        return max(0.0, max_tokens - max(0.0, tat - now) * refill_rate), max_tokens
+    
+    def get_limits_status(self, max_age: float = STATUS_CACHE_TTL) -> Dict[str, Dict]:
+        """
+        Current status of all rate limits. Served from a snapshot up to `max_age`
+        seconds old, so dashboard polling doesn't touch Redis on every request.
+        """
+        with self.lock:
+            snapshot = self.status_snapshot
+        if snapshot is not None and time.time() - snapshot[0] < max_age:
+            return dict(snapshot[1])
+        status = self._collect_status()
+        with self.lock:
+            self.status_snapshot = (time.time(), status)
+        return dict(status)
+    
+    def _collect_status(self) -> Dict[str, Dict]:
+        """Read every bucket: incremental SCAN plus pipelined HMGETs on Redis (never KEYS)"""
+        buckets = []
+        now = time.time()
         if self.use_redis and self.redis_client:
-            # Get all rate limit keys
-            keys = self.redis_client.keys("rate_limit:*")
-            for key in keys:
-                bucket = self.redis_client.hgetall(key)
-                if bucket:
-                    parts = key.split(":")
-                    api_name = parts[1] if len(parts) > 1 else "unknown"
-                    endpoint = parts[2] if len(parts) > 2 else "default"
-                    
-                    status[f"{api_name}:{endpoint}"] = {
-                        "tokens": float(bucket.get("tokens", 0)),
-                        "max_tokens": int(bucket.get("max_tokens", 0)),
-                        "percentage": (float(bucket.get("tokens", 0)) / 
-                                     int(bucket.get("max_tokens", 1))) * 100
-                    }
+            keys = self.redis_client.scan_iter(match="rate_limit:*", count=STATUS_SCAN_COUNT)
+            while True:
+                batch = list(itertools.islice(keys, STATUS_SCAN_COUNT))
+                if not batch:
+                    break
+                pipe = self.redis_client.pipeline(transaction=False)
+                for key in batch:
+                    pipe.hmget(key, "tokens", "max_tokens")
+                for key, values in zip(batch, pipe.execute(raise_on_error=False)):
+                    if isinstance(values, list) and values[0] is not None:
+                        buckets.append((key, float(values[0]), int(float(values[1] or 0))))
+            
+            # A TAT alone doesn't carry limits: report the GCRA keys this process has used
+            gcra_keys = list(self.gcra_limits)
+            pipe = self.redis_client.pipeline(transaction=False)
+            for key in gcra_keys:
+                pipe.get(key)
+            for key, tat in zip(gcra_keys, pipe.execute(raise_on_error=False) if gcra_keys else []):
+                tat = float(tat) if isinstance(tat, str) else now
+                buckets.append((key, *self._gcra_tokens(tat, now, *self.gcra_limits[key])))
         else:
             # In-memory status
             with self.lock:
-                for key, bucket in self.local_buckets.items():
-                    parts = key.split(":")
-                    api_name = parts[1] if len(parts) > 1 else "unknown"
-                    endpoint = parts[2] if len(parts) > 2 else "default"
-                    
-                    status[f"{api_name}:{endpoint}"] = {
-                        "tokens": bucket["tokens"],
-                        "max_tokens": bucket["max_tokens"],
-                        "percentage": (bucket["tokens"] / bucket["max_tokens"]) * 100
-                    }
+                buckets = [(key, bucket["tokens"], bucket["max_tokens"])
+                           for key, bucket in self.local_buckets.items()]
+                buckets += [(key, *self._gcra_tokens(self.local_tats.get(key, now), now, *limits))
+                            for key, limits in self.gcra_limits.items()]
         
+        status = {}
+        for key, tokens, max_tokens in buckets:
+            parts = key.split(":", 2)
+            api_name = parts[1] if len(parts) > 1 else "unknown"
+            endpoint = parts[2] if len(parts) > 2 else "default"
+            status[f"{api_name}:{endpoint}"] = {
+                "tokens": tokens,
+                "max_tokens": max_tokens,
+                "percentage": (tokens / (max_tokens or 1)) * 100
+            }
         return status
 
 # Global rate limiter instance
-rate_limiter = RateLimiter(use_redis=True)
+rate_limiter = RateLimiter(use_redis=True, lease_size=int(os.getenv('RATE_LIMIT_LEASE_SIZE', 0)))
+for _api in filter(None, os.getenv('RATE_LIMIT_GCRA_APIS', '').split(',')):
+    rate_limiter.set_algorithm(_api.strip(), GCRA)
 
 # Convenience decorators for each API
-def coinbase_limit(cost: int = 1):
+def coinbase_limit(cost: int = 1, priority: int = PRIORITY_NORMAL):
     """Rate limit for Coinbase (30 requests/second)"""
-    return rate_limiter.rate_limit("coinbase", max_calls=30, per_seconds=1, cost=cost)
+    return rate_limiter.rate_limit("coinbase", max_calls=COINBASE_RATE_LIMIT, per_seconds=1, cost=cost, priority=priority)
 
-def taapi_limit(cost: int = 1):
+def taapi_limit(cost: int = 1, priority: int = PRIORITY_NORMAL):
     """Rate limit for TAAPI (15 requests/15 seconds)"""
-    return rate_limiter.rate_limit("taapi", max_calls=15, per_seconds=15, cost=cost)
+    return rate_limiter.rate_limit("taapi", max_calls=15, per_seconds=15, cost=cost, priority=priority)
 
-def twitter_limit(cost: int = 1):
+def twitter_limit(cost: int = 1, priority: int = PRIORITY_NORMAL):
     """Rate limit for Twitter (100 requests/15 minutes)"""
-    return rate_limiter.rate_limit("twitter", max_calls=100, per_seconds=900, cost=cost)
+    return rate_limiter.rate_limit("twitter", max_calls=100, per_seconds=900, cost=cost, priority=priority)
 
-def scrapingbee_limit(cost: int = 1):
+def scrapingbee_limit(cost: int = 1, priority: int = PRIORITY_NORMAL):
     """Rate limit for ScrapingBee (10 concurrent requests)"""
-    return rate_limiter.rate_limit("scrapingbee", max_calls=10, per_seconds=1, cost=cost)
+    return rate_limiter.rate_limit("scrapingbee", max_calls=10, per_seconds=1, cost=cost, priority=priority)
 
-def grok_limit(cost: int = 1):
+def grok_limit(cost: int = 1, priority: int = PRIORITY_NORMAL):
     """Rate limit for Grok (20 requests/minute)"""
-    return rate_limiter.rate_limit("grok", max_calls=20, per_seconds=60, cost=cost)
+    return rate_limiter.rate_limit("grok", max_calls=20, per_seconds=60, cost=cost, priority=priority)
 
-def perplexity_limit(cost: int = 1):
+def perplexity_limit(cost: int = 1, priority: int = PRIORITY_NORMAL):
     """Rate limit for Perplexity (20 requests/minute)"""
-    return rate_limiter.rate_limit("perplexity", max_calls=20, per_seconds=60, cost=cost)
+    return rate_limiter.rate_limit("perplexity", max_calls=20, per_seconds=60, cost=cost, priority=priority)
 
-def anthropic_limit(cost: int = 1):
+def anthropic_limit(cost: int = 1, priority: int = PRIORITY_NORMAL):
     """Rate limit for Anthropic (50 requests/minute)"""
-    return rate_limiter.rate_limit("anthropic", max_calls=50, per_seconds=60, cost=cost)
+    return rate_limiter.rate_limit("anthropic", max_calls=50, per_seconds=60, cost=cost, priority=priority)
 
-def coindesk_limit(cost: int = 1):
+def coindesk_limit(cost: int = 1, priority: int = PRIORITY_NORMAL):
     """Rate limit for CoinDesk (100 requests/hour)"""
-    return rate_limiter.rate_limit("coindesk", max_calls=100, per_seconds=3600, cost=cost) 
\ No newline at end of file
+    return rate_limiter.rate_limit("coindesk", max_calls=100, per_seconds=3600, cost=cost, priority=priority) 
\ No newline at end of file
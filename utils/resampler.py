@@ -0,0 +1,167 @@
+"""
+Multi-timeframe resampler
+Derives every higher interval (5m through 1d) from stored 1m candles, so each
+symbol needs one base series. History is aggregated in one vectorized pass;
+live 1m closes update the open higher-timeframe bars incrementally and emit each
+one as a 'candle' when its bucket completes, keeping 15m/30m/1h streams live.
+"""
+import threading
+import time
+from typing import Callable, Dict, List, Optional, Any, Tuple
+import numpy as np
+from utils.db import log_trade
+from utils.candle_store import candle_store, CandleStore, INTERVAL_SECONDS, FIELDS, to_product_id
+
+BASE_INTERVAL = '1m'
+BASE_SECONDS = INTERVAL_SECONDS[BASE_INTERVAL]
+
+
+def aggregate(candles: Dict[str, np.ndarray], seconds: int) -> Dict[str, np.ndarray]:
+    """Group ascending base candles into `seconds` buckets (OHLCV rules) via reduceat"""
+    start = candles['start'].astype(np.int64)
+    if not len(start):
+        return {field: np.empty(0) for field in FIELDS}
+    bucket = start // seconds * seconds
+    first = np.flatnonzero(np.r_[True, bucket[1:] != bucket[:-1]])
+    last = np.r_[first[1:] - 1, len(start) - 1]
+    return {
+        'start': bucket[first].astype(float),
+        'open': candles['open'][first],
+        'high': np.maximum.reduceat(candles['high'], first),
+        'low': np.minimum.reduceat(candles['low'], first),
+        'close': candles['close'][last],
+        'volume': np.add.reduceat(candles['volume'], first)
+    }
+
+
+class Resampler:
+    """Higher-timeframe candles from the 1m base series, stored and emitted as they close"""
+
+    def __init__(self, store: CandleStore = candle_store, intervals: Optional[List[str]] = None):
+        self.store = store
+        self.intervals = intervals or [i for i, s in INTERVAL_SECONDS.items() if s > BASE_SECONDS]
+        self.partials: Dict[Tuple[str, str], Dict[str, Any]] = {}
+        self.cache: Dict[Tuple[str, str], Tuple[Optional[int], Dict[str, np.ndarray]]] = {}
+        self.callbacks: List[Callable[[Dict[str, Any]], None]] = []
+        self.lock = threading.Lock()
+        self.emitted = 0
+
+    def register_callback(self, callback: Callable[[Dict[str, Any]], None]):
+        """Called with each completed higher-timeframe candle"""
+        self.callbacks.append(callback)
+
+    def _complete(self, candles: Dict[str, np.ndarray], seconds: int, now: float,
+                  first_start: Optional[float]) -> Dict[str, np.ndarray]:
+        """Drop buckets that are still open or that start before the base data does"""
+        keep = candles['start'] + seconds <= int(now) // BASE_SECONDS * BASE_SECONDS
+        if first_start is not None:
+            keep &= candles['start'] >= first_start
+        return {field: values[keep] for field, values in candles.items()}
+
+    def resample(self, symbol: str, interval: str, limit: Optional[int] = None,
+                 now: Optional[float] = None) -> Dict[str, np.ndarray]:
+        """
+        Completed `interval` candles computed from stored 1m candles, cached until a
+        newer 1m candle is stored. Same layout as CandleStore.get_candles.
+        """
+        seconds = INTERVAL_SECONDS[interval]
+        key = (to_product_id(symbol), interval)
+        last_base = self.store.last_start(symbol, BASE_INTERVAL)
+        cached = self.cache.get(key)
+        if cached is None or cached[0] != last_base or (limit and len(cached[1]['start']) < limit):
+            since = None
+            if limit is not None and last_base is not None:
+                since = (last_base // seconds - limit) * seconds  # limit buckets plus the open one
+            base = self.store.get_candles(symbol, BASE_INTERVAL, start=since)
+            # Without an aligned lower bound the oldest bucket may be partial
+            first = base['start'][0] if since is None and len(base['start']) else None
+            cached = (last_base, self._complete(aggregate(base, seconds), seconds,
+                                                now if now is not None else time.time(), first))
+            self.cache[key] = cached
+        candles = cached[1]
+        return candles if limit is None else {field: values[-limit:] for field, values in candles.items()}
+
+    def catch_up(self, symbol: str, interval: str, now: Optional[float] = None,
+                 start: Optional[int] = None) -> int:
+        """
+        Store completed `interval` candles newer than the newest stored one, or every
+        bucket from `start` (a bucket boundary) when given; returns candles written
+        """
+        seconds = INTERVAL_SECONDS[interval]
+        if start is None:
+            last = self.store.last_start(symbol, interval)
+            since = None if last is None else last + seconds
+        else:
+            last, since = None, start
+        base = self.store.get_candles(symbol, BASE_INTERVAL, start=since)
+        if not len(base['start']):
+            return 0
+        # A fresh series must not start with a partial bucket
+        first = start if start is not None else base['start'][0] if last is None else None
+        bars = self._complete(aggregate(base, seconds), seconds, now if now is not None else time.time(), first)
+        rows = np.column_stack([bars[field] for field in FIELDS])
+        return self.store.save_candles(symbol, interval, rows)
+
+    def on_candle(self, candle: Dict[str, Any]):
+        """1m candle-close callback: fold into open higher-timeframe bars, emit the ones that complete"""
+        if candle.get('interval') != BASE_INTERVAL:
+            return
+        product_id = to_product_id(candle['product_id'])
+        start = int(candle['start'])
+        completed = []
+        with self.lock:
+            for interval in self.intervals:
+                seconds = INTERVAL_SECONDS[interval]
+                bucket = start // seconds * seconds
+                key = (product_id, interval)
+                partial = self.partials.get(key)
+                if partial is not None and partial['start'] != bucket:
+                    if bucket < partial['start']:
+                        continue  # Late 1m candle for an emitted bar
+                    completed.append(partial)  # Its last minutes had no trades
+                    partial = None
+                if partial is None:
+                    partial = self._open_bar(product_id, interval, bucket, start)
+                if partial['open'] is None:
+                    partial['open'] = candle['open']
+                partial['high'] = max(partial['high'], candle['high'])
+                partial['low'] = min(partial['low'], candle['low'])
+                partial['close'] = candle['close']
+                partial['volume'] += candle['volume']
+                if start + BASE_SECONDS >= bucket + seconds:
+                    completed.append(partial)
+                    self.partials.pop(key, None)
+                else:
+                    self.partials[key] = partial
+
+        for bar in completed:
+            self.store.save_candles(product_id, bar['interval'], [bar])
+            self.emitted += 1
+            for callback in self.callbacks:
+                try:
+                    callback(dict(bar))
+                except Exception as e:
+                    log_trade('resampler', 'error', f"Callback error: {str(e)}")
+
+    def _open_bar(self, product_id: str, interval: str, bucket: int, start: int) -> Dict[str, Any]:
+        """New bar for a bucket, seeded with stored 1m candles from before `start` (e.g. after a restart)"""
+        bar = {'product_id': product_id, 'interval': interval, 'start': bucket,
+               'open': None, 'high': -np.inf, 'low': np.inf, 'close': None, 'volume': 0.0}
+        earlier = self.store.get_candles(product_id, BASE_INTERVAL, start=bucket, end=start)
+        if len(earlier['start']):
+            seed = aggregate(earlier, INTERVAL_SECONDS[interval])
+            bar.update(open=float(seed['open'][0]), high=float(seed['high'][0]), low=float(seed['low'][0]),
+                       close=float(seed['close'][0]), volume=float(seed['volume'][0]))
+        return bar
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Open bars and candles emitted"""
+        return {
+            'open_bars': len(self.partials),
+            'emitted': self.emitted,
+            'cached_series': len(self.cache)
+        }
+
+
+# Global resampler fed by closed 1m candles
+resampler = Resampler()
@@ -365,12 +365,13 @@ def get_combined_sentiment(coin: str = 'BTC', master_pass: Optional[str] = None)
 def analyze_volume_surge(symbol: str, threshold: float = 2.0) -> bool:
     """
     Detect if there's a volume surge (2x normal volume).
-    Used by Bot 4 for ML-based trading.
+    Used by Bot 4 for ML-based trading. Returns False until the feed has
+    seen enough trades for the symbol.
     """
     try:
-        # This would typically use exchange data
-        # For now, return False to avoid false signals
-        return False
+        # Short-window vs long-window traded volume from the live WebSocket feed
+        from utils.microstructure import feature_engine
+        return feature_engine.is_volume_surge(symbol, threshold)
     except Exception as e:
         print(f"Error analyzing volume surge: {e}")
         return False 
\ No newline at end of file
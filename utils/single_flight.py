@@ -0,0 +1,91 @@
+"""
+Single-flight request coalescing
+When several bot threads ask for the same resource at the same moment, only the
+first caller performs the request; the others wait for it and receive a copy of
+its result (or its exception).
+"""
+import copy
+import json
+import threading
+from typing import Any, Callable, Dict, Iterable, Optional
+
+
+def normalize_key(*parts: Any, params: Any = None, body: Any = None,
+                  exclude: Iterable[str] = ('secret',)) -> str:
+    """
+    Canonical request key: parts joined, then params (dict or pair list) sorted with
+    excluded names dropped, then the JSON body with sorted keys.
+    """
+    excluded = set(exclude)
+    items = params.items() if isinstance(params, dict) else (params or [])
+    param_str = '&'.join(f"{k}={v}" for k, v in sorted((str(k), str(v)) for k, v in items if k not in excluded))
+    key = '|'.join(str(part) for part in parts) + '?' + param_str
+    if body is not None:
+        key += '|' + json.dumps(body, sort_keys=True, default=str)
+    return key
+
+
+class _Call:
+    """One in-flight call and the callers waiting on it"""
+
+    __slots__ = ('event', 'result', 'error', 'waiters')
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.result = None
+        self.error: Optional[BaseException] = None
+        self.waiters = 0
+
+
+class SingleFlight:
+    """Deduplicates concurrent calls that share a key"""
+
+    def __init__(self):
+        self.calls: Dict[str, _Call] = {}
+        self.lock = threading.Lock()
+        self.executed = 0
+        self.shared = 0
+
+    def do(self, key: str, fn: Callable[[], Any]) -> Any:
+        """Run fn once per key at a time; concurrent callers share the outcome"""
+        with self.lock:
+            call = self.calls.get(key)
+            if call is not None:
+                call.waiters += 1
+                self.shared += 1
+                leader = False
+            else:
+                call = self.calls[key] = _Call()
+                self.executed += 1
+                leader = True
+
+        if not leader:
+            call.event.wait()
+            if call.error is not None:
+                raise call.error
+            # Waiters get their own copy so one caller mutating a response can't affect another
+            return copy.deepcopy(call.result)
+
+        try:
+            call.result = fn()
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self.lock:
+                del self.calls[key]  # No new waiters can join after this
+            call.event.set()
+        return copy.deepcopy(call.result) if call.waiters else call.result
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Requests executed vs. served from another caller's flight"""
+        with self.lock:
+            return {
+                'executed': self.executed,
+                'shared': self.shared,
+                'in_flight': len(self.calls)
+            }
+
+
+# Global group shared by every API connection
+single_flight = SingleFlight()
@@ -0,0 +1,582 @@
+"""
+Incremental streaming indicators
+Stateful RSI, MACD, Bollinger Bands, ATR, Stochastic and SMA/EMA that update in
+O(1) per closed candle (Stochastic via monotonic deques), can preview the
+in-progress bar without committing it, and serialize for warm restarts.
+Values match utils/indicators.py on the same candle history.
+"""
+import math
+import threading
+import time
+from collections import deque
+from typing import Dict, Optional, Any, Tuple
+from utils.candle_store import candle_store, CandleStore, INTERVAL_SECONDS, to_product_id
+from utils.db import log_trade
+
+# Candles replayed from the store when a stream is first requested
+WARMUP_CANDLES = 500
+
+
+class EMAState:
+    """SMA-seeded exponential smoothing of a scalar series"""
+
+    def __init__(self, period: int, alpha: Optional[float] = None):
+        self.period = period
+        self.alpha = alpha if alpha is not None else 2.0 / (period + 1)
+        self.count = 0
+        self.seed_sum = 0.0
+        self.value: Optional[float] = None
+
+    def step(self, x: float) -> Tuple[int, float, Optional[float]]:
+        """Next (count, seed_sum, value) without committing"""
+        count = self.count + 1
+        if count < self.period:
+            return count, self.seed_sum + x, None
+        if count == self.period:
+            return count, 0.0, (self.seed_sum + x) / self.period
+        return count, 0.0, self.value + self.alpha * (x - self.value)
+
+    def update(self, x: float) -> Optional[float]:
+        """Commit a value"""
+        self.count, self.seed_sum, self.value = self.step(x)
+        return self.value
+
+    def peek(self, x: float) -> Optional[float]:
+        """Value if x were committed"""
+        return self.step(x)[2]
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {'count': self.count, 'seed_sum': self.seed_sum, 'value': self.value}
+
+    def load(self, state: Dict[str, Any]):
+        self.count = state['count']
+        self.seed_sum = state['seed_sum']
+        self.value = state['value']
+
+
+class RollingWindow:
+    """Fixed-length window with running sum and sum of squares"""
+
+    def __init__(self, period: int):
+        self.period = period
+        self.values = deque(maxlen=period)
+        self.total = 0.0
+        self.total_sq = 0.0
+        self.since_resum = 0
+
+    def update(self, x: float):
+        """Push a value, dropping the oldest when full"""
+        if len(self.values) == self.period:
+            old = self.values[0]
+            self.total -= old
+            self.total_sq -= old * old
+        self.values.append(x)
+        self.total += x
+        self.total_sq += x * x
+
+        # Re-sum once per window length so rounding error can't accumulate
+        self.since_resum += 1
+        if self.since_resum >= self.period:
+            self.total = math.fsum(self.values)
+            self.total_sq = math.fsum(v * v for v in self.values)
+            self.since_resum = 0
+
+    def sums_with(self, x: Optional[float]) -> Tuple[int, float, float]:
+        """(count, sum, sum of squares) as if x were pushed (x=None: as is)"""
+        if x is None:
+            return len(self.values), self.total, self.total_sq
+        if len(self.values) == self.period:
+            old = self.values[0]
+            return self.period, self.total - old + x, self.total_sq - old * old + x * x
+        return len(self.values) + 1, self.total + x, self.total_sq + x * x
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {'values': list(self.values)}
+
+    def load(self, state: Dict[str, Any]):
+        self.values = deque(state['values'], maxlen=self.period)
+        self.total = math.fsum(self.values)
+        self.total_sq = math.fsum(v * v for v in self.values)
+        self.since_resum = 0
+
+
+class MonotonicWindow:
+    """Sliding-window max (or min) in amortized O(1) using a monotonic deque"""
+
+    def __init__(self, period: int, maximum: bool = True):
+        self.period = period
+        self.sign = 1.0 if maximum else -1.0
+        self.entries = deque()  # (index, value), values decreasing by sign
+        self.index = 0
+
+    def update(self, x: float):
+        """Push a value and expire entries outside the window"""
+        while self.entries and self.sign * self.entries[-1][1] <= self.sign * x:
+            self.entries.pop()
+        self.entries.append((self.index, x))
+        self.index += 1
+        while self.entries[0][0] <= self.index - 1 - self.period:
+            self.entries.popleft()
+
+    def extreme_with(self, x: float) -> float:
+        """Window extreme if x were pushed"""
+        # The deque holds suffix extremes, so the first entry that survives expiry is the answer
+        for index, value in self.entries:
+            if index > self.index - self.period:
+                return value if self.sign * value > self.sign * x else x
+        return x
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {'entries': [list(e) for e in self.entries], 'index': self.index}
+
+    def load(self, state: Dict[str, Any]):
+        self.entries = deque(tuple(e) for e in state['entries'])
+        self.index = state['index']
+
+
+class StreamingIndicator:
+    """Base class: one indicator over one candle stream"""
+
+    name = ''
+
+    def __init__(self, **params):
+        self.params = params
+        self.candles = 0
+        self.last_start: Optional[float] = None
+        self.value: Optional[Dict[str, float]] = None
+
+    def update(self, candle: Dict[str, Any]) -> Optional[Dict[str, float]]:
+        """Commit a closed candle; repeated or older candles are ignored"""
+        start = candle.get('start')
+        if start is not None and self.last_start is not None and start <= self.last_start:
+            return self.value
+        self.value = self._update(candle)
+        self.last_start = start
+        self.candles += 1
+        return self.value
+
+    def peek(self, candle: Dict[str, Any]) -> Optional[Dict[str, float]]:
+        """Value including an in-progress candle, without committing it"""
+        return self._peek(candle)
+
+    def _update(self, candle: Dict[str, Any]) -> Optional[Dict[str, float]]:
+        raise NotImplementedError
+
+    def _peek(self, candle: Dict[str, Any]) -> Optional[Dict[str, float]]:
+        raise NotImplementedError
+
+    def _parts(self) -> Dict[str, Any]:
+        """Sub-states to serialize"""
+        return {}
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Serializable state"""
+        return {
+            'candles': self.candles,
+            'last_start': self.last_start,
+            'value': self.value,
+            'parts': {name: part.to_dict() for name, part in self._parts().items()},
+            'extra': self._extra()
+        }
+
+    def load(self, state: Dict[str, Any]):
+        """Restore to_dict output"""
+        self.candles = state['candles']
+        self.last_start = state['last_start']
+        self.value = state['value']
+        for name, part in self._parts().items():
+            part.load(state['parts'][name])
+        self._load_extra(state.get('extra') or {})
+
+    def _extra(self) -> Dict[str, Any]:
+        return {}
+
+    def _load_extra(self, extra: Dict[str, Any]):
+        pass
+
+
+class StreamingMA(StreamingIndicator):
+    """SMA or EMA of closes"""
+
+    def __init__(self, kind: str = 'sma', period: int = 30):
+        super().__init__(period=period)
+        self.name = kind
+        self.window = RollingWindow(period) if kind == 'sma' else None
+        self.ema = EMAState(period) if kind == 'ema' else None
+
+    def _result(self, count: int, total: float, value: Optional[float]) -> Optional[Dict[str, float]]:
+        if self.ema is not None:
+            return {'value': value} if value is not None else None
+        return {'value': total / count} if count == self.window.period else None
+
+    def _update(self, candle):
+        if self.ema is not None:
+            return self._result(0, 0.0, self.ema.update(candle['close']))
+        self.window.update(candle['close'])
+        count, total, _ = self.window.sums_with(None)
+        return self._result(count, total, None)
+
+    def _peek(self, candle):
+        if self.ema is not None:
+            return self._result(0, 0.0, self.ema.peek(candle['close']))
+        count, total, _ = self.window.sums_with(candle['close'])
+        return self._result(count, total, None)
+
+    def _parts(self):
+        return {'ema': self.ema} if self.ema is not None else {'window': self.window}
+
+
+class StreamingRSI(StreamingIndicator):
+    """Wilder RSI"""
+
+    name = 'rsi'
+
+    def __init__(self, period: int = 14):
+        super().__init__(period=period)
+        self.gain = EMAState(period, 1.0 / period)
+        self.loss = EMAState(period, 1.0 / period)
+        self.prev_close: Optional[float] = None
+
+    @staticmethod
+    def _rsi(gain: Optional[float], loss: Optional[float]) -> Optional[Dict[str, float]]:
+        if gain is None or loss is None:
+            return None
+        if loss == 0:
+            return {'value': 50.0 if gain == 0 else 100.0}
+        return {'value': 100.0 - 100.0 / (1.0 + gain / loss)}
+
+    def _update(self, candle):
+        close = candle['close']
+        if self.prev_close is None:
+            self.prev_close = close
+            return None
+        delta = close - self.prev_close
+        self.prev_close = close
+        return self._rsi(self.gain.update(max(delta, 0.0)), self.loss.update(max(-delta, 0.0)))
+
+    def _peek(self, candle):
+        if self.prev_close is None:
+            return None
+        delta = candle['close'] - self.prev_close
+        return self._rsi(self.gain.peek(max(delta, 0.0)), self.loss.peek(max(-delta, 0.0)))
+
+    def _parts(self):
+        return {'gain': self.gain, 'loss': self.loss}
+
+    def _extra(self):
+        return {'prev_close': self.prev_close}
+
+    def _load_extra(self, extra):
+        self.prev_close = extra.get('prev_close')
+
+
+class StreamingMACD(StreamingIndicator):
+    """EMA(fast) - EMA(slow) with an EMA signal line"""
+
+    name = 'macd'
+
+    def __init__(self, fast: int = 12, slow: int = 26, signal: int = 9):
+        super().__init__(optInFastPeriod=fast, optInSlowPeriod=slow, optInSignalPeriod=signal)
+        self.fast = EMAState(fast)
+        self.slow = EMAState(slow)
+        self.signal = EMAState(signal)
+
+    @staticmethod
+    def _macd(line: Optional[float], signal: Optional[float]) -> Optional[Dict[str, float]]:
+        if line is None or signal is None:
+            return None
+        return {'valueMACD': line, 'valueMACDSignal': signal, 'valueMACDHist': line - signal}
+
+    def _update(self, candle):
+        fast = self.fast.update(candle['close'])
+        slow = self.slow.update(candle['close'])
+        if slow is None:
+            return None
+        line = fast - slow
+        return self._macd(line, self.signal.update(line))
+
+    def _peek(self, candle):
+        fast = self.fast.peek(candle['close'])
+        slow = self.slow.peek(candle['close'])
+        if slow is None:
+            return None
+        line = fast - slow
+        return self._macd(line, self.signal.peek(line))
+
+    def _parts(self):
+        return {'fast': self.fast, 'slow': self.slow, 'signal': self.signal}
+
+
+class StreamingBBands(StreamingIndicator):
+    """Bollinger Bands from a rolling mean and population variance"""
+
+    name = 'bbands'
+
+    def __init__(self, period: int = 20, stddev: float = 2.0):
+        super().__init__(period=period, stddev=stddev)
+        self.stddev = stddev
+        self.window = RollingWindow(period)
+
+    def _bands(self, count: int, total: float, total_sq: float) -> Optional[Dict[str, float]]:
+        if count < self.window.period:
+            return None
+        mean = total / count
+        width = math.sqrt(max(total_sq / count - mean * mean, 0.0)) * self.stddev
+        return {'valueUpperBand': mean + width, 'valueMiddleBand': mean, 'valueLowerBand': mean - width}
+
+    def _update(self, candle):
+        self.window.update(candle['close'])
+        return self._bands(*self.window.sums_with(None))
+
+    def _peek(self, candle):
+        return self._bands(*self.window.sums_with(candle['close']))
+
+    def _parts(self):
+        return {'window': self.window}
+
+
+class StreamingATR(StreamingIndicator):
+    """Wilder ATR"""
+
+    name = 'atr'
+
+    def __init__(self, period: int = 14):
+        super().__init__(period=period)
+        self.tr = EMAState(period, 1.0 / period)
+        self.prev_close: Optional[float] = None
+
+    def _true_range(self, candle) -> float:
+        return max(candle['high'] - candle['low'], abs(candle['high'] - self.prev_close),
+                   abs(candle['low'] - self.prev_close))
+
+    def _update(self, candle):
+        if self.prev_close is None:
+            self.prev_close = candle['close']
+            return None
+        value = self.tr.update(self._true_range(candle))
+        self.prev_close = candle['close']
+        return {'value': value} if value is not None else None
+
+    def _peek(self, candle):
+        if self.prev_close is None:
+            return None
+        value = self.tr.peek(self._true_range(candle))
+        return {'value': value} if value is not None else None
+
+    def _parts(self):
+        return {'tr': self.tr}
+
+    def _extra(self):
+        return {'prev_close': self.prev_close}
+
+    def _load_extra(self, extra):
+        self.prev_close = extra.get('prev_close')
+
+
+class StreamingStoch(StreamingIndicator):
+    """Slow stochastic with monotonic-deque highest high / lowest low"""
+
+    name = 'stoch'
+
+    def __init__(self, k_period: int = 14, k_smooth: int = 3, d_period: int = 3):
+        super().__init__(kPeriod=k_period, kSmooth=k_smooth, dPeriod=d_period)
+        self.k_period = k_period
+        self.highest = MonotonicWindow(k_period, maximum=True)
+        self.lowest = MonotonicWindow(k_period, maximum=False)
+        self.fast_k = RollingWindow(k_smooth)
+        self.slow_k = RollingWindow(d_period)
+
+    @staticmethod
+    def _fast_k(close: float, highest: float, lowest: float) -> float:
+        span = highest - lowest
+        return (close - lowest) / span * 100.0 if span > 0 else 0.0
+
+    def _update(self, candle):
+        self.highest.update(candle['high'])
+        self.lowest.update(candle['low'])
+        if self.highest.index < self.k_period:
+            return None
+        self.fast_k.update(self._fast_k(candle['close'], self.highest.entries[0][1],
+                                        self.lowest.entries[0][1]))
+        count, total, _ = self.fast_k.sums_with(None)
+        if count < self.fast_k.period:
+            return None
+        slow_k = total / count
+        self.slow_k.update(slow_k)
+        count, total, _ = self.slow_k.sums_with(None)
+        if count < self.slow_k.period:
+            return None
+        return {'valueK': slow_k, 'valueD': total / count}
+
+    def _peek(self, candle):
+        if self.highest.index + 1 < self.k_period:
+            return None
+        fast_k = self._fast_k(candle['close'], self.highest.extreme_with(candle['high']),
+                              self.lowest.extreme_with(candle['low']))
+        count, total, _ = self.fast_k.sums_with(fast_k)
+        if count < self.fast_k.period:
+            return None
+        slow_k = total / count
+        count, total, _ = self.slow_k.sums_with(slow_k)
+        if count < self.slow_k.period:
+            return None
+        return {'valueK': slow_k, 'valueD': total / count}
+
+    def _parts(self):
+        return {'highest': self.highest, 'lowest': self.lowest,
+                'fast_k': self.fast_k, 'slow_k': self.slow_k}
+
+
+class StreamingVolume(StreamingIndicator):
+    """Candle volume"""
+
+    name = 'volume'
+
+    def _update(self, candle):
+        return {'value': float(candle['volume'])}
+
+    def _peek(self, candle):
+        return {'value': float(candle['volume'])}
+
+
+def create_indicator(indicator: str, **params) -> StreamingIndicator:
+    """Build a streaming indicator from TAAPI-style parameters"""
+    if indicator in ('sma', 'ema'):
+        return StreamingMA(indicator, int(params.get('period', 30)))
+    if indicator == 'rsi':
+        return StreamingRSI(int(params.get('period', 14)))
+    if indicator == 'macd':
+        return StreamingMACD(int(params.get('optInFastPeriod', 12)), int(params.get('optInSlowPeriod', 26)),
+                             int(params.get('optInSignalPeriod', 9)))
+    if indicator == 'bbands':
+        return StreamingBBands(int(params.get('period', 20)), float(params.get('stddev', 2)))
+    if indicator == 'atr':
+        return StreamingATR(int(params.get('period', 14)))
+    if indicator == 'stoch':
+        return StreamingStoch(int(params.get('kPeriod', 14)), int(params.get('kSmooth', 3)),
+                              int(params.get('dPeriod', 3)))
+    if indicator == 'volume':
+        return StreamingVolume()
+    raise ValueError(f"Unsupported indicator: {indicator}")
+
+
+def stream_key(indicator: str, product_id: str, interval: str, params: Dict[str, Any]) -> str:
+    """Stable key for (product, interval, indicator, params)"""
+    param_str = ','.join(f"{k}={params[k]}" for k in sorted(params))
+    return f"{product_id}|{interval}|{indicator}|{param_str}"
+
+
+class StreamingIndicatorEngine:
+    """
+    Streaming indicators keyed by (product, interval, indicator, params).
+    Streams are created on first request, warmed from the candle store and then
+    advanced by candle callbacks. A candle that arrives after missed ones (reconnect,
+    restored snapshot) rebuilds the stream from the store instead of being folded
+    in as if it were consecutive.
+    """
+
+    def __init__(self, store: CandleStore = candle_store, warmup: int = WARMUP_CANDLES):
+        self.store = store
+        self.warmup = warmup
+        self.streams: Dict[str, StreamingIndicator] = {}
+        self.routes: Dict[Tuple[str, str], list] = {}  # (product_id, interval) -> stream keys
+        self.meta: Dict[str, Tuple[str, str, str]] = {}  # key -> (indicator, product_id, interval)
+        self.lock = threading.Lock()
+        self.rebuilds = 0
+
+    def _add(self, key: str, indicator: str, product_id: str, interval: str,
+             stream: StreamingIndicator):
+        self.streams[key] = stream
+        self.meta[key] = (indicator, product_id, interval)
+        self.routes.setdefault((product_id, interval), []).append(key)
+
+    def get_stream(self, indicator: str, symbol: str, interval: str, **params) -> StreamingIndicator:
+        """Get or create (and warm) a stream"""
+        product_id = to_product_id(symbol)
+        stream = create_indicator(indicator, **params)
+        key = stream_key(indicator, product_id, interval, stream.params)  # Normalized, defaults filled in
+        with self.lock:
+            if key in self.streams:
+                return self.streams[key]
+            self._warm(stream, product_id, interval)
+            self._add(key, indicator, product_id, interval, stream)
+            return stream
+
+    def _warm(self, stream: StreamingIndicator, product_id: str, interval: str):
+        """Replay the latest stored candles into a new stream"""
+        history = self.store.get_candles(product_id, interval, limit=self.warmup)
+        for i in range(len(history['close'])):
+            stream.update({field: float(history[field][i]) for field in history})
+
+    def _rebuild(self, key: str, start: float, seconds: int) -> StreamingIndicator:
+        """
+        Replace a stream that missed the candles before `start`: replay the store, or
+        start cold (None until warmed up again) if the store is missing them too
+        """
+        indicator, product_id, interval = self.meta[key]
+        params = self.streams[key].params
+        stream = create_indicator(indicator, **params)
+        self._warm(stream, product_id, interval)
+        if stream.last_start is None or start - stream.last_start > seconds:
+            stream = create_indicator(indicator, **params)
+        self.streams[key] = stream
+        self.rebuilds += 1
+        return stream
+
+    def on_candle(self, candle: Dict[str, Any]):
+        """Candle-close callback: advance every stream for this product/interval"""
+        route = (to_product_id(candle['product_id']), candle['interval'])
+        seconds = INTERVAL_SECONDS.get(candle['interval'])
+        with self.lock:
+            for key in self.routes.get(route, []):
+                try:
+                    stream = self.streams[key]
+                    if seconds and stream.last_start is not None and candle['start'] - stream.last_start > seconds:
+                        stream = self._rebuild(key, candle['start'], seconds)
+                    stream.update(candle)
+                except Exception as e:
+                    log_trade('indicators', 'error', f"Streaming update failed for {key}: {str(e)}")
+
+    def get_indicator(self, indicator: str, symbol: str, interval: str,
+                      current: Optional[Dict[str, Any]] = None, **params) -> Optional[Dict[str, float]]:
+        """
+        Latest committed value, None if warming up or stale.
+        Pass the in-progress candle as `current` to include it.
+        """
+        stream = self.get_stream(indicator, symbol, interval, **params)
+        with self.lock:
+            if current is not None:
+                return stream.peek(current)
+            seconds = INTERVAL_SECONDS.get(interval)
+            if stream.last_start is None or (seconds and stream.last_start < time.time() - 2 * seconds):
+                return None
+            return stream.value
+
+    def get_state(self) -> Dict[str, Any]:
+        """Serializable state of every stream (see utils/market_snapshot.py)"""
+        with self.lock:
+            return {
+                key: {
+                    'indicator': indicator,
+                    'product_id': product_id,
+                    'interval': interval,
+                    'params': stream.params,
+                    'state': stream.to_dict()
+                }
+                for key, stream in self.streams.items()
+                for indicator, product_id, interval in [self.meta[key]]
+            }
+
+    def load_state(self, state: Dict[str, Any]):
+        """Restore get_state output"""
+        with self.lock:
+            for key, entry in state.items():
+                if key in self.streams:
+                    continue
+                stream = create_indicator(entry['indicator'], **entry['params'])
+                stream.load(entry['state'])
+                self._add(key, entry['indicator'], entry['product_id'], entry['interval'], stream)
+
+
+# Global engine fed by candle callbacks
+streaming_indicators = StreamingIndicatorEngine()
@@ -1,65 +1,25 @@
 import requests
-import time
 from typing import Dict, List, Optional, Any
 from utils.db import get_key, increment_api_call, log_trade
+from utils.taapi_cache import taapi_cache
+from utils.single_flight import single_flight, normalize_key
+from utils.taapi_client import taapi_client
 
 # TAAPI base URL
 BASE_URL = 'https://api.taapi.io'
 
-# Rate limiting
-last_request_time = 0
-MIN_REQUEST_INTERVAL = 1.0  # 1 second between requests (increased from 0.5)
-MAX_RETRIES = 3
-INITIAL_BACKOFF = 5  # 5 seconds initial backoff for 429 errors
-
-def _rate_limit():
-    """Ensure we don't exceed rate limits"""
-    global last_request_time
-    current_time = time.time()
-    elapsed = current_time - last_request_time
-    
-    if elapsed < MIN_REQUEST_INTERVAL:
-        time.sleep(MIN_REQUEST_INTERVAL - elapsed)
-    
-    last_request_time = time.time()
-
 def _handle_request_with_retry(url: str, method: str = 'GET', **kwargs) -> Optional[requests.Response]:
-    """Handle API request with exponential backoff for rate limits"""
-    backoff = INITIAL_BACKOFF
-    
-    for attempt in range(MAX_RETRIES):
-        try:
-            _rate_limit()
-            
-            if method == 'GET':
-                response = requests.get(url, **kwargs)
-            else:
-                response = requests.post(url, **kwargs)
-            
-            if response.status_code == 429:
-                # Rate limit hit - exponential backoff
-                wait_time = backoff * (2 ** attempt)
-                print(f"TAAPI rate limit hit. Waiting {wait_time} seconds...")
-                log_trade('taapi', 'rate_limit', f'429 error, waiting {wait_time}s')
-                time.sleep(wait_time)
-                continue
-                
-            elif response.status_code == 401:
-                print("Invalid TAAPI key—check .env")
-                log_trade('taapi', 'auth_error', 'Invalid API key')
-                return None
-                
-            response.raise_for_status()
-            return response
-            
-        except requests.exceptions.RequestException as e:
-            if attempt == MAX_RETRIES - 1:
-                print(f"TAAPI request failed after {MAX_RETRIES} attempts: {str(e)}")
-                log_trade('taapi', 'error', f'Request failed: {str(e)}')
-            else:
-                time.sleep(backoff * (2 ** attempt))
-    
-    return None
+    """Rate-limited request; 429 backoff is scheduled by the shared client, not slept here"""
+    return taapi_client.request(method, url, **kwargs)
+
+def _fetch_json(url: str, method: str = 'GET', **kwargs) -> Optional[Any]:
+    """Request with retries, count the call and decode JSON; None on failure"""
+    response = _handle_request_with_retry(url, method, **kwargs)
+    if not response:
+        return None
+    # Increment API call counter on success
+    increment_api_call('taapi')
+    return response.json()
 
 def get_indicator(indicator: str, params: Dict[str, Any], master_pass: str = '') -> Optional[Dict]:
     """
@@ -90,17 +50,24 @@ def get_indicator(indicator: str, params: Dict[str, Any], master_pass: str = '')
             else:
                 return {'value': 0.0}
         
-        # Add secret to params
-        params['secret'] = api_key
+        # Values only change at candle close - serve repeats from the shared cache
+        cache_key = taapi_cache.make_key(indicator, params.get('exchange', ''), params.get('symbol', ''),
+                                         params.get('interval', ''), params)
+        cached = taapi_cache.get(cache_key)
+        if cached is not None:
+            return cached
         
-        # Make request with retry logic
+        # Secret goes on a copy so it never leaks into the caller's params
+        query = dict(params, secret=api_key)
+        
+        # Make request with retry logic; concurrent identical requests share one call
         url = f"{BASE_URL}/{indicator}"
-        response = _handle_request_with_retry(url, params=params, timeout=10)
+        result = single_flight.do(normalize_key('TAAPI', 'GET', url, params=query),
+                                  lambda: _fetch_json(url, params=query, timeout=10))
         
-        if response:
-            # Increment API call counter on success
-            increment_api_call('taapi')
-            return response.json()
+        if result is not None:
+            taapi_cache.set(cache_key, result, taapi_cache.expires_at(params.get('interval', ''), params))
+            return result
         else:
             # Return default values on failure
             if indicator == 'rsi':
@@ -115,17 +82,37 @@ def get_indicator(indicator: str, params: Dict[str, Any], master_pass: str = '')
         log_trade('taapi', 'error', f'{indicator} error: {str(e)}')
         return None
 
+def build_constructs(queries: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """
+    Group flat queries into TAAPI bulk constructs, one per (exchange, symbol, interval).
+    Each query has exchange, symbol, interval, indicator and optional id plus indicator params.
+    """
+    constructs = {}
+    for query in queries:
+        target = (query.get('exchange', 'binance'), query['symbol'], query['interval'])
+        if target not in constructs:
+            constructs[target] = {
+                'exchange': target[0],
+                'symbol': target[1],
+                'interval': target[2],
+                'indicators': []
+            }
+        constructs[target]['indicators'].append(
+            {k: v for k, v in query.items() if k not in ('exchange', 'symbol', 'interval')}
+        )
+    return list(constructs.values())
+
 def get_bulk(queries: List[Dict[str, Any]], master_pass: str = '') -> Optional[Dict]:
     """
     Get multiple indicators in a single request (more efficient).
-    Max 20 indicators per request, max 3 symbols per request.
+    Max 20 indicators per request, max 3 symbols per request (see build_bulk_query).
     
     Args:
         queries: List of query dicts with indicator configs
         master_pass: Master password for decrypting API key
         
     Returns:
-        JSON response with results for all queries
+        JSON response with results for all queries ({'data': [{'id', 'result', 'errors'}, ...]})
     """
     try:
         # Get API key
@@ -137,28 +124,31 @@ def get_bulk(queries: List[Dict[str, Any]], master_pass: str = '') -> Optional[D
         # Make request with retry logic
         url = f"{BASE_URL}/bulk"
         headers = {'Content-Type': 'application/json'}
-        params = {'secret': api_key}
+        constructs = build_constructs(queries)
         
-        response = _handle_request_with_retry(
+        return _fetch_json(
             url, 
             method='POST',
-            json={'requests': queries}, 
-            params=params, 
+            json={
+                'secret': api_key,
+                'construct': constructs[0] if len(constructs) == 1 else constructs
+            }, 
             headers=headers, 
             timeout=30
         )
         
-        if response:
-            increment_api_call('taapi')
-            return response.json()
-        
-        return None
-        
     except Exception as e:
         print(f"Error getting TAAPI bulk data: {str(e)}")
         log_trade('taapi', 'error', f'Bulk request error: {str(e)}')
         return None
 
+def demux_bulk(response: Optional[Dict]) -> Dict[str, Optional[Dict]]:
+    """Map a bulk response back to query ids; failed indicators map to None"""
+    results = {}
+    for item in (response or {}).get('data', []):
+        results[item.get('id')] = None if item.get('errors') else item.get('result')
+    return results
+
 def get_pattern(symbol: str, interval: str, exchange: str = 'coinbase', master_pass: str = '') -> Optional[Dict]:
     """
     Get candlestick pattern recognition for a symbol.
@@ -172,6 +162,13 @@ def get_pattern(symbol: str, interval: str, exchange: str = 'coinbase', master_p
     Returns:
         Dict with pattern values (e.g., {'valueCDLHAMMER': 100} for bullish hammer)
     """
+    # Detected locally from stored (Coinbase) candles when there's fresh history
+    from utils.indicators import LOCAL_EXCHANGES
+    from utils.patterns import get_pattern as get_local_pattern
+    local = get_local_pattern(symbol, interval) if exchange.lower() in LOCAL_EXCHANGES else None
+    if local is not None:
+        return local
+    
     params = {
         'exchange': exchange,
         'symbol': symbol,
@@ -219,10 +216,10 @@ def build_bulk_query(indicators: List[Dict[str, Any]]) -> List[List[Dict[str, An
     Returns:
         List of bulk query batches
     """
-    # Group by symbol
+    # Group by construct target - each (exchange, symbol, interval) counts as a symbol
     symbol_groups = {}
     for ind in indicators:
-        symbol = ind.get('symbol', '')
+        symbol = (ind.get('exchange', ''), ind.get('symbol', ''), ind.get('interval', ''))
         if symbol not in symbol_groups:
             symbol_groups[symbol] = []
         symbol_groups[symbol].append(ind)
@@ -0,0 +1,144 @@
+"""
+Micro-batching TAAPI client
+Individual indicator requests arriving within a short window are collected and
+sent through /bulk in as few calls as TAAPI's limits allow, then demultiplexed
+back to each caller's Future. Identical requests in a window share one slot, and
+cached values never leave the process.
+"""
+import copy
+import threading
+import time
+from concurrent.futures import Future
+from typing import Callable, Dict, List, Optional, Any, Tuple
+from utils.db import log_trade
+from utils.taapi import get_bulk, build_bulk_query, demux_bulk
+from utils.taapi_cache import taapi_cache
+
+
+def completed(value: Any) -> Future:
+    """Future that already holds a value"""
+    future = Future()
+    future.set_result(value)
+    return future
+
+
+def follow(shared: Future) -> Future:
+    """Per-caller Future resolving to its own copy of a shared Future's result"""
+    own = Future()
+
+    def resolve(done: Future):
+        error = done.exception()
+        if error is not None:
+            own.set_exception(error)
+        else:
+            own.set_result(copy.deepcopy(done.result()))
+
+    shared.add_done_callback(resolve)
+    return own
+
+
+class TaapiBatcher:
+    """Collects get_indicator calls for `window` seconds and fetches them via /bulk"""
+
+    def __init__(self, window: float = 0.05, timeout: float = 120.0,
+                 bulk: Callable[[List[Dict[str, Any]]], Optional[Dict]] = get_bulk):
+        self.window = window
+        self.timeout = timeout
+        self.bulk = bulk
+        self.pending: List[Tuple[str, Dict[str, Any], Future]] = []
+        self.pending_keys: Dict[str, Future] = {}
+        self.cond = threading.Condition()
+        self.thread = None
+        self.submitted = 0
+        self.coalesced = 0
+        self.cache_hits = 0
+        self.bulk_requests = 0
+
+    def submit(self, indicator: str, exchange: str, symbol: str, interval: str, **params) -> Future:
+        """Queue a request; the Future resolves to the TAAPI result dict (None on failure)"""
+        key = taapi_cache.make_key(indicator, exchange, symbol, interval, params)
+        cached = taapi_cache.get(key)  # Already a private copy
+        if cached is not None:
+            with self.cond:
+                self.cache_hits += 1
+            return completed(cached)
+
+        with self.cond:
+            self.submitted += 1
+            future = self.pending_keys.get(key)
+            if future is not None:
+                # Coalesced callers share the fetch, never the result object
+                self.coalesced += 1
+                return follow(future)
+            future = self.pending_keys[key] = Future()
+            query = dict(params, indicator=indicator, exchange=exchange, symbol=symbol, interval=interval)
+            self.pending.append((key, query, future))
+            if self.thread is None or not self.thread.is_alive():
+                self.thread = threading.Thread(target=self._run, name="TaapiBatcher", daemon=True)
+                self.thread.start()
+            self.cond.notify()
+        return follow(future)
+
+    def get_indicator(self, indicator: str, exchange: str, symbol: str, interval: str, **params) -> Optional[Dict]:
+        """Blocking call with TaapiConnection.get_indicator's signature"""
+        return self.submit(indicator, exchange, symbol, interval, **params).result(self.timeout)
+
+    def _run(self):
+        """Drain the queue one window at a time"""
+        while True:
+            with self.cond:
+                while not self.pending:
+                    self.cond.wait()
+            # Let the rest of a burst (e.g. one bot's whole feature vector) arrive
+            time.sleep(self.window)
+            with self.cond:
+                batch, self.pending, self.pending_keys = self.pending, [], {}
+            try:
+                self._flush(batch)
+            except Exception as e:
+                log_trade('taapi', 'error', f"Batch flush failed: {str(e)}")
+            finally:
+                # Never leave a caller waiting
+                for _, _, future in batch:
+                    if not future.done():
+                        future.set_result(None)
+
+    def _flush(self, batch: List[Tuple[str, Dict[str, Any], Future]]):
+        """Send a drained window as bulk requests and resolve every Future"""
+        slots = {}
+        queries = []
+        for i, (key, query, future) in enumerate(batch):
+            query_id = f"q{i}"
+            slots[query_id] = (key, query, future)
+            queries.append(dict(query, id=query_id))
+
+        for group in build_bulk_query(queries):
+            try:
+                with self.cond:
+                    self.bulk_requests += 1
+                results = demux_bulk(self.bulk(group))
+            except Exception as e:
+                log_trade('taapi', 'error', f"Bulk batch failed: {str(e)}")
+                results = {}
+
+            for query in group:
+                key, original, future = slots[query['id']]
+                result = results.get(query['id'])
+                if result is not None:
+                    taapi_cache.set(key, result, taapi_cache.expires_at(original['interval'], original))
+                future.set_result(result)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Requests received vs. HTTP calls made"""
+        with self.cond:
+            return {
+                'submitted': self.submitted,
+                'coalesced': self.coalesced,
+                'cache_hits': self.cache_hits,
+                'bulk_requests': self.bulk_requests,
+                'pending': len(self.pending)
+            }
+
+
+# Global batcher shared by bots
+taapi_batcher = TaapiBatcher()
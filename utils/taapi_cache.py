@@ -0,0 +1,164 @@
+"""
+Candle-boundary TAAPI response cache
+An indicator value only changes meaningfully when its candle closes, so cached
+responses expire at the next boundary of their interval (optionally sooner for
+in-progress values). In-process LRU shared by all bot threads, with Redis as an
+optional second level shared across processes.
+"""
+import copy
+import json
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Dict, Optional, Any
+from utils.candle_store import INTERVAL_SECONDS
+from utils.db import log_trade
+
+# Parameters that never affect the response
+IGNORED_PARAMS = ('secret',)
+
+# Expiry for intervals we can't align to (e.g. '1w')
+DEFAULT_TTL = 60.0
+
+
+class TaapiCache:
+    """LRU cache of TAAPI responses keyed by (indicator, exchange, symbol, interval, params)"""
+
+    def __init__(self, max_entries: int = 2048, live_ttl: Optional[float] = None,
+                 use_redis: bool = True, prefix: str = 'taapi_cache'):
+        self.max_entries = max_entries
+        self.live_ttl = live_ttl  # Cap for in-progress (backtrack=0) values; None = until candle close
+        self.prefix = prefix
+        self.entries: OrderedDict = OrderedDict()  # key -> (expires_at, response)
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.shared_hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+        self.redis_client = None
+        if use_redis:
+            try:
+                from utils.market_data_bus import get_redis_client
+                self.redis_client = get_redis_client()
+                self.redis_client.ping()
+            except Exception:
+                self.redis_client = None
+
+    @staticmethod
+    def make_key(indicator: str, exchange: str, symbol: str, interval: str,
+                 params: Optional[Dict[str, Any]] = None) -> str:
+        """Cache key; secrets and the identifying fields are excluded from the param list"""
+        extra = {k: v for k, v in (params or {}).items()
+                 if k not in IGNORED_PARAMS and k not in ('exchange', 'symbol', 'interval')}
+        param_str = '&'.join(f"{k}={extra[k]}" for k in sorted(extra))
+        return f"{indicator}|{exchange}|{symbol}|{interval}|{param_str}"
+
+    def expires_at(self, interval: str, params: Optional[Dict[str, Any]] = None,
+                   now: Optional[float] = None) -> float:
+        """Next candle boundary for the interval, or sooner for live values if live_ttl is set"""
+        now = now or time.time()
+        seconds = INTERVAL_SECONDS.get(interval)
+        if not seconds:
+            return now + DEFAULT_TTL
+        boundary = (now // seconds + 1) * seconds
+        if self.live_ttl and int((params or {}).get('backtrack', 0)) == 0:
+            return min(boundary, now + self.live_ttl)
+        return boundary
+
+    def get(self, key: str) -> Optional[Any]:
+        """Cached response or None; counts a hit or a miss"""
+        now = time.time()
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None:
+                if entry[0] > now:
+                    self.entries.move_to_end(key)
+                    self.hits += 1
+                    return copy.deepcopy(entry[1])
+                del self.entries[key]
+
+        shared = self._get_shared(key, now)
+        with self.lock:
+            if shared is not None:
+                self.shared_hits += 1
+                self._store(key, shared['expires_at'], shared['value'])
+                return copy.deepcopy(shared['value'])
+            self.misses += 1
+        return None
+
+    def set(self, key: str, value: Any, expires_at: float):
+        """Store a copy of a response until expires_at (callers may mutate theirs)"""
+        with self.lock:
+            self._store(key, expires_at, copy.deepcopy(value))
+        self._set_shared(key, value, expires_at)
+
+    def _store(self, key: str, expires_at: float, value: Any):
+        """Insert and evict least recently used entries (lock held)"""
+        self.entries[key] = (expires_at, value)
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+            self.evictions += 1
+
+    def _get_shared(self, key: str, now: float) -> Optional[Dict[str, Any]]:
+        """Second-level lookup in Redis"""
+        if not self.redis_client:
+            return None
+        try:
+            raw = self.redis_client.get(f"{self.prefix}:{key}")
+        except Exception:
+            return None
+        if not raw:
+            return None
+        shared = json.loads(raw)
+        return shared if shared['expires_at'] > now else None
+
+    def _set_shared(self, key: str, value: Any, expires_at: float):
+        """Publish to Redis with a matching expiry"""
+        if not self.redis_client:
+            return
+        ttl_ms = int((expires_at - time.time()) * 1000)
+        if ttl_ms <= 0:
+            return
+        try:
+            self.redis_client.set(f"{self.prefix}:{key}",
+                                  json.dumps({'expires_at': expires_at, 'value': value}), px=ttl_ms)
+        except Exception as e:
+            log_trade('taapi_cache', 'warning', f"Shared cache write failed: {str(e)}")
+
+    def get_or_fetch(self, indicator: str, exchange: str, symbol: str, interval: str,
+                     params: Optional[Dict[str, Any]], fetch: Callable[[], Optional[Any]]) -> Optional[Any]:
+        """Cached response, or fetch() and cache it; failed fetches (None) are not cached"""
+        key = self.make_key(indicator, exchange, symbol, interval, params)
+        cached = self.get(key)
+        if cached is not None:
+            return cached
+
+        value = fetch()
+        if value is not None:
+            self.set(key, value, self.expires_at(interval, params))
+        return value
+
+    def clear(self):
+        """Drop all local entries"""
+        with self.lock:
+            self.entries.clear()
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Hit/miss counters"""
+        with self.lock:
+            lookups = self.hits + self.shared_hits + self.misses
+            return {
+                'entries': len(self.entries),
+                'hits': self.hits,
+                'shared_hits': self.shared_hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'hit_rate': round((self.hits + self.shared_hits) / lookups, 4) if lookups else 0.0,
+                'shared': self.redis_client is not None
+            }
+
+
+# Global cache shared by TaapiConnection and utils/taapi
+taapi_cache = TaapiCache()
@@ -0,0 +1,156 @@
+"""
+Thread-safe TAAPI HTTP client
+Replaces the module-global one-request-per-second gate: calls run on a bounded
+worker pool, draw from the shared TAAPI token bucket at the plan's real rate,
+and 429 retries are scheduled on a timer (honouring Retry-After) instead of
+sleeping on the calling bot's thread. Each call reports its queue wait.
+"""
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Dict, Optional
+import requests
+from utils.db import log_trade
+from utils.rate_limiter import rate_limiter, PRIORITY_BACKGROUND
+
+# Plan limits (TAAPI counts requests per 15 s window); override per plan in .env
+DEFAULT_RATE_LIMIT = 15
+DEFAULT_RATE_PERIOD = 15.0
+DEFAULT_MAX_CONCURRENCY = 4
+
+MAX_RETRIES = 3
+INITIAL_BACKOFF = 5  # Seconds before the first 429 retry, doubled each attempt
+
+
+class TaapiClient:
+    """Rate-limited, bounded-parallel TAAPI requests with scheduled backoff"""
+
+    def __init__(self, rate_limit: Optional[int] = None, period: Optional[float] = None,
+                 max_concurrency: Optional[int] = None, max_retries: int = MAX_RETRIES,
+                 initial_backoff: float = INITIAL_BACKOFF):
+        self.rate_limit = rate_limit or int(os.getenv('TAAPI_RATE_LIMIT', DEFAULT_RATE_LIMIT))
+        self.period = period or float(os.getenv('TAAPI_RATE_PERIOD', DEFAULT_RATE_PERIOD))
+        self.max_concurrency = max_concurrency or int(os.getenv('TAAPI_MAX_CONCURRENCY', DEFAULT_MAX_CONCURRENCY))
+        self.max_retries = max_retries
+        self.initial_backoff = initial_backoff
+
+        self.executor = ThreadPoolExecutor(max_workers=self.max_concurrency, thread_name_prefix='taapi')
+        self.session = requests.Session()
+
+        self.stats_lock = threading.Lock()
+        self.calls = 0
+        self.retries = 0
+        self.rate_limited = 0
+        self.failures = 0
+        self.waits = deque(maxlen=1000)
+
+    def _acquire_token(self):
+        """Block this worker until the TAAPI bucket has a token; a 429 cooldown holds the bucket too"""
+        # Indicator refreshes yield to critical calls queued on the same limiter
+        rate_limiter.acquire('taapi', max_tokens=self.rate_limit, refill_rate=self.rate_limit / self.period, priority=PRIORITY_BACKGROUND)
+
+    def submit(self, method: str, url: str, **kwargs) -> Future:
+        """
+        Queue a request. The Future resolves to the Response, or None after a 401 or
+        exhausted retries; its queue_wait attribute holds seconds spent waiting to send.
+        """
+        future = Future()
+        future.queue_wait = 0.0
+        self._schedule(future, method, url, kwargs, 0, time.time())
+        return future
+
+    def request(self, method: str, url: str, **kwargs) -> Optional[requests.Response]:
+        """Blocking request; the caller only waits on its own result"""
+        return self.submit(method, url, **kwargs).result()
+
+    def _schedule(self, future: Future, method: str, url: str, kwargs: Dict[str, Any],
+                  attempt: int, queued_at: float, delay: float = 0.0):
+        """Run an attempt now, or after delay without holding a worker"""
+        if delay > 0:
+            timer = threading.Timer(delay, self._schedule,
+                                    args=(future, method, url, kwargs, attempt, time.time() + delay))
+            timer.daemon = True
+            timer.start()
+            return
+        self.executor.submit(self._attempt, future, method, url, kwargs, attempt, queued_at)
+
+    def _attempt(self, future: Future, method: str, url: str, kwargs: Dict[str, Any],
+                 attempt: int, queued_at: float):
+        """One HTTP attempt on a worker thread"""
+        try:
+            self._acquire_token()
+            wait = time.time() - queued_at
+            future.queue_wait += wait
+            with self.stats_lock:
+                self.calls += 1
+                self.waits.append(wait)
+
+            try:
+                response = self.session.request(method, url, **kwargs)
+            except requests.exceptions.RequestException as e:
+                self._retry(future, method, url, kwargs, attempt, self.initial_backoff * (2 ** attempt), str(e))
+                return
+
+            rate_limiter.record_response('taapi', response.status_code, response.headers)
+            if response.status_code == 429:
+                # The limiter already holds the account for Retry-After; otherwise back off exponentially
+                backoff = rate_limiter.cooldown('taapi')
+                if not backoff:
+                    backoff = self.initial_backoff * (2 ** attempt)
+                    rate_limiter.block('taapi', backoff)
+                with self.stats_lock:
+                    self.rate_limited += 1
+                log_trade('taapi', 'rate_limit', f'429 error, retrying in {backoff}s')
+                self._retry(future, method, url, kwargs, attempt, backoff, '429 Too Many Requests')
+                return
+
+            if response.status_code == 401:
+                print("Invalid TAAPI key—check .env")
+                log_trade('taapi', 'auth_error', 'Invalid API key')
+                future.set_result(None)
+                return
+
+            try:
+                response.raise_for_status()
+            except requests.exceptions.HTTPError as e:
+                self._retry(future, method, url, kwargs, attempt, self.initial_backoff * (2 ** attempt), str(e))
+                return
+            future.set_result(response)
+        except Exception as e:
+            if not future.done():
+                future.set_exception(e)
+
+    def _retry(self, future: Future, method: str, url: str, kwargs: Dict[str, Any],
+               attempt: int, delay: float, error: str):
+        """Schedule the next attempt, or resolve to None when retries are exhausted"""
+        if attempt + 1 >= self.max_retries:
+            with self.stats_lock:
+                self.failures += 1
+            print(f"TAAPI request failed after {self.max_retries} attempts: {error}")
+            log_trade('taapi', 'error', f'Request failed: {error}')
+            future.set_result(None)
+            return
+        with self.stats_lock:
+            self.retries += 1
+        self._schedule(future, method, url, kwargs, attempt + 1, time.time(), delay)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Call counts and queue-wait distribution (seconds)"""
+        with self.stats_lock:
+            waits = sorted(self.waits)
+            return {
+                'calls': self.calls,
+                'retries': self.retries,
+                'rate_limited': self.rate_limited,
+                'failures': self.failures,
+                'cooldown_remaining': round(rate_limiter.cooldown('taapi'), 3),
+                'queue_wait_avg': round(sum(waits) / len(waits), 4) if waits else 0.0,
+                'queue_wait_p95': round(waits[int(len(waits) * 0.95) - 1 if len(waits) > 1 else 0], 4) if waits else 0.0,
+                'queue_wait_max': round(waits[-1], 4) if waits else 0.0
+            }
+
+
+# Global client shared by utils/taapi and TaapiConnection
+taapi_client = TaapiClient()
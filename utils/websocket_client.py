@@ -4,21 +4,102 @@ Implements reconnection logic and error handling
 """
 import websocket
 import json
+import os
 import threading
 import time
+from bisect import bisect_left, insort
+from collections import deque
+from datetime import datetime
 from typing import List, Callable, Optional, Dict, Any
 from utils.db import log_trade
 from utils.rate_limiter import rate_limiter
+from utils.feed_telemetry import FeedTelemetry, DEFAULT_MAX_AGE, DEFAULT_MAX_LAG
+
+DEFAULT_PRODUCTS = ['BTC-USD', 'ETH-USD', 'SOL-USD', 'ADA-USD']
+CANDLE_SECONDS = 60  # Candles are built locally at 1-minute resolution
+MAX_CANDLES = 1440  # One day of closed 1m candles per product
+MAX_TRADES = 1000  # Recent trades kept per product
+
+class OrderBook:
+    """Level 2 order book for one product with O(1) top-of-book"""
+    
+    def __init__(self):
+        self.bids: Dict[float, float] = {}
+        self.asks: Dict[float, float] = {}
+        # Sorted ascending: best bid is last, best ask is first
+        self.bid_prices: List[float] = []
+        self.ask_prices: List[float] = []
+        
+    def apply_snapshot(self, bids: List[List[str]], asks: List[List[str]]):
+        """Replace the book from a level2 snapshot"""
+        self.bids = {float(p): float(s) for p, s in bids if float(s) > 0}
+        self.asks = {float(p): float(s) for p, s in asks if float(s) > 0}
+        self.bid_prices = sorted(self.bids)
+        self.ask_prices = sorted(self.asks)
+        
+    def update(self, side: str, price: float, size: float):
+        """Apply one level2 change ('buy' side is bids)"""
+        levels, prices = (self.bids, self.bid_prices) if side == 'buy' else (self.asks, self.ask_prices)
+        if size > 0:
+            if price not in levels:
+                insort(prices, price)
+            levels[price] = size
+        elif price in levels:
+            del levels[price]
+            del prices[bisect_left(prices, price)]
+            
+    def best_bid(self) -> Optional[tuple]:
+        """Best bid as (price, size)"""
+        if not self.bid_prices:
+            return None
+        price = self.bid_prices[-1]
+        return price, self.bids[price]
+    
+    def best_ask(self) -> Optional[tuple]:
+        """Best ask as (price, size)"""
+        if not self.ask_prices:
+            return None
+        price = self.ask_prices[0]
+        return price, self.asks[price]
+    
+    def to_dict(self, depth: int = 50) -> Dict[str, List[List[float]]]:
+        """Serializable top of the book for snapshots"""
+        return self.top(depth)
+    
+    @classmethod
+    def from_dict(cls, state: Dict[str, List[List[float]]]) -> 'OrderBook':
+        """Rebuild a book from to_dict output"""
+        book = cls()
+        book.apply_snapshot(state.get('bids', []), state.get('asks', []))
+        return book
+    
+    def top(self, depth: int = 10) -> Dict[str, List[List[float]]]:
+        """Top levels on each side, best first"""
+        return {
+            'bids': [[p, self.bids[p]] for p in reversed(self.bid_prices[-depth:])],
+            'asks': [[p, self.asks[p]] for p in self.ask_prices[:depth]]
+        }
 
 class CoinbaseWebSocket:
     """Real-time WebSocket connection to Coinbase"""
     
-    def __init__(self, products: List[str] = None, channels: List[str] = None):
+    def __init__(self, products: List[str] = None, channels: List[str] = None,
+                 compression: bool = False):
         self.url = "wss://ws-feed.exchange.coinbase.com"
-        self.products = products or ['BTC-USD', 'ETH-USD', 'SOL-USD', 'ADA-USD']
+        # Negotiate permessage-deflate (needs the optional `websockets` package)
+        self.compression = compression
+        self.compressed = False
         self.channels = channels or ['ticker', 'level2', 'matches']
         self.ws = None
         self.running = False
+        self.connected = False
+        
+        # Reference-counted subscriptions: a product stays subscribed while
+        # any holder (bot or static list) still needs it
+        self.subscription_lock = threading.Lock()
+        self.product_refs: Dict[str, int] = {}
+        for product_id in (products if products is not None else DEFAULT_PRODUCTS):
+            self.product_refs[product_id] = self.product_refs.get(product_id, 0) + 1
         self.callbacks = {}
         self.reconnect_count = 0
         self.max_reconnect_attempts = 10
@@ -27,29 +108,49 @@ class CoinbaseWebSocket:
         # Price cache for latest prices
         self.price_cache = {}
         
+        # Optional cross-process price board (see utils/price_board.py)
+        self.price_board = None
+        
+        # Market state built from level2 and matches
+        self.order_books: Dict[str, OrderBook] = {}
+        self.trades: Dict[str, deque] = {}
+        self.candles: Dict[str, deque] = {}
+        self.open_candles: Dict[str, Dict[str, Any]] = {}
+        
+        # Feed latency and health
+        self.telemetry = FeedTelemetry()
+        
     def on_message(self, ws, message):
         """Handle incoming WebSocket messages"""
+        receive_ts = time.time()
+        if not self.compressed:
+            # Compressed connections are metered in utils/ws_compression.py
+            size = len(message.encode()) if isinstance(message, str) else len(message)
+            self.telemetry.record_bytes(size, size)
         try:
             data = json.loads(message)
             msg_type = data.get('type')
+            exchange_ts = parse_exchange_time(data.get('time'))
             
             # Handle different message types
             if msg_type == 'ticker':
                 self._handle_ticker(data)
+            elif msg_type == 'snapshot':
+                self._handle_snapshot(data)
             elif msg_type == 'l2update':
                 self._handle_level2(data)
-            elif msg_type == 'match':
-                self._handle_match(data)
+            elif msg_type in ('match', 'last_match'):
+                self._handle_match(data, exchange_ts)
             elif msg_type == 'error':
                 log_trade('websocket', 'error', f"Coinbase WS error: {data.get('message')}")
                 
             # Call registered callbacks
-            if msg_type in self.callbacks:
-                for callback in self.callbacks[msg_type]:
-                    try:
-                        callback(data)
-                    except Exception as e:
-                        log_trade('websocket', 'error', f"Callback error: {str(e)}")
+            self._dispatch(msg_type, data)
+            
+            self.telemetry.record(
+                data.get('product_id'), receive_ts, time.time(), exchange_ts,
+                data.get('trade_id') if msg_type in ('match', 'last_match') else None
+            )
                         
         except json.JSONDecodeError as e:
             log_trade('websocket', 'error', f"JSON decode error: {str(e)}")
@@ -64,6 +165,7 @@ class CoinbaseWebSocket:
         """Handle WebSocket close"""
         log_trade('websocket', 'info', f"WebSocket closed: {close_status_code} - {close_msg}")
         self.running = False
+        self.connected = False
         
         # Attempt reconnection if not manually closed
         if self.reconnect_count < self.max_reconnect_attempts:
@@ -77,15 +179,22 @@ class CoinbaseWebSocket:
         log_trade('websocket', 'info', "WebSocket connected")
         self.reconnect_count = 0
         
-        # Subscribe to channels
-        subscribe_message = {
-            "type": "subscribe",
-            "product_ids": self.products,
-            "channels": self.channels
-        }
-        
-        ws.send(json.dumps(subscribe_message))
-        log_trade('websocket', 'info', f"Subscribed to {self.products} channels: {self.channels}")
+        # Subscribe to whatever is currently referenced; later changes are
+        # sent incrementally by acquire_products/release_products
+        with self.subscription_lock:
+            self.connected = True
+            products = self.products
+            if not products:
+                log_trade('websocket', 'info', "No products referenced yet - waiting for subscribers")
+                return
+            
+            subscribe_message = {
+                "type": "subscribe",
+                "product_ids": products,
+                "channels": self.channels
+            }
+            ws.send(json.dumps(subscribe_message))
+        log_trade('websocket', 'info', f"Subscribed to {products} channels: {self.channels}")
     
     def _handle_ticker(self, data: Dict[str, Any]):
         """Handle ticker updates"""
@@ -98,25 +207,113 @@ class CoinbaseWebSocket:
                 'time': data.get('time'),
                 'best_bid': float(data.get('best_bid', 0)),
                 'best_ask': float(data.get('best_ask', 0)),
-                'volume_24h': float(data.get('volume_24h', 0))
+                'volume_24h': float(data.get('volume_24h', 0)),
+                'best_bid_size': float(data.get('best_bid_size', 0)),
+                'best_ask_size': float(data.get('best_ask_size', 0))
             }
+            
+            if self.price_board:
+                ticker = self.price_cache[product_id]
+                try:
+                    self.price_board.publish(
+                        product_id, price, ticker['best_bid'], ticker['best_ask'],
+                        ticker['volume_24h'], parse_exchange_time(ticker['time'])
+                    )
+                except Exception as e:
+                    log_trade('websocket', 'error', f"Price board publish error: {str(e)}")
+    
+    def _handle_snapshot(self, data: Dict[str, Any]):
+        """Handle level 2 order book snapshot"""
+        product_id = data.get('product_id')
+        if product_id:
+            book = self.order_books.setdefault(product_id, OrderBook())
+            book.apply_snapshot(data.get('bids', []), data.get('asks', []))
     
     def _handle_level2(self, data: Dict[str, Any]):
         """Handle level 2 order book updates"""
-        # Process order book updates for advanced strategies
-        pass
+        book = self.order_books.get(data.get('product_id'))
+        if book is None:
+            return  # Updates before the snapshot can't be applied
+        for side, price, size in data.get('changes', []):
+            book.update(side, float(price), float(size))
+    
+    def _handle_match(self, data: Dict[str, Any], exchange_ts: Optional[float] = None):
+        """Handle trade matches: keep recent trades and build 1m candles"""
+        product_id = data.get('product_id')
+        if not product_id:
+            return
+        
+        ts = exchange_ts or time.time()
+        price = float(data.get('price', 0))
+        size = float(data.get('size', 0))
+        # Maker side 'sell' means the taker bought
+        sign = 1 if data.get('side') == 'sell' else -1
+        
+        if product_id not in self.trades:
+            self.trades[product_id] = deque(maxlen=MAX_TRADES)
+        self.trades[product_id].append((ts, price, size, sign))
+        
+        self._update_candle(product_id, ts, price, size)
+    
+    def _update_candle(self, product_id: str, ts: float, price: float, size: float):
+        """Fold a trade into the open 1m candle, closing it on minute rollover"""
+        start = ts - (ts % CANDLE_SECONDS)
+        candle = self.open_candles.get(product_id)
+        
+        if candle and start < candle['start']:
+            return  # Late trade for an already closed candle
+        
+        if candle and start > candle['start']:
+            if product_id not in self.candles:
+                self.candles[product_id] = deque(maxlen=MAX_CANDLES)
+            self.candles[product_id].append(candle)
+            self._dispatch('candle', candle)
+            candle = None
+        
+        if candle is None:
+            self.open_candles[product_id] = {
+                'product_id': product_id,
+                'interval': '1m',
+                'start': start,
+                'open': price,
+                'high': price,
+                'low': price,
+                'close': price,
+                'volume': size
+            }
+        else:
+            candle['high'] = max(candle['high'], price)
+            candle['low'] = min(candle['low'], price)
+            candle['close'] = price
+            candle['volume'] += size
     
-    def _handle_match(self, data: Dict[str, Any]):
-        """Handle trade matches"""
-        # Process executed trades for market analysis
-        pass
+    def _dispatch(self, msg_type: str, data: Dict[str, Any]):
+        """Call callbacks registered for a message type"""
+        for callback in self.callbacks.get(msg_type, []):
+            try:
+                callback(data)
+            except Exception as e:
+                log_trade('websocket', 'error', f"Callback error: {str(e)}")
     
     def register_callback(self, msg_type: str, callback: Callable):
-        """Register a callback for specific message types"""
+        """Register a callback for specific message types (plus synthetic 'candle')"""
         if msg_type not in self.callbacks:
             self.callbacks[msg_type] = []
         self.callbacks[msg_type].append(callback)
     
+    def unregister_callback(self, msg_type: str, callback: Callable):
+        """Remove a previously registered callback"""
+        if callback in self.callbacks.get(msg_type, []):
+            self.callbacks[msg_type].remove(callback)
+    
+    def attach_price_board(self, board):
+        """Mirror every ticker into a shared-memory price board"""
+        self.price_board = board
+        # Seed with anything already cached (e.g. restored from a snapshot)
+        for product_id, ticker in dict(self.price_cache).items():
+            board.publish(product_id, ticker['price'], ticker['best_bid'], ticker['best_ask'],
+                          ticker['volume_24h'], parse_exchange_time(ticker['time']))
+        
     def get_price(self, product_id: str) -> Optional[float]:
         """Get latest cached price for a product"""
         if product_id in self.price_cache:
@@ -127,10 +324,92 @@ class CoinbaseWebSocket:
         """Get full ticker data for a product"""
         return self.price_cache.get(product_id)
     
+    def get_book_top(self, product_id: str) -> Optional[Dict[str, Any]]:
+        """Get top-of-book from the level2 book, falling back to ticker best bid/ask"""
+        book = self.order_books.get(product_id)
+        bid = book.best_bid() if book else None
+        ask = book.best_ask() if book else None
+        if bid and ask:
+            return {'bid': bid[0], 'bid_size': bid[1], 'ask': ask[0], 'ask_size': ask[1]}
+        
+        ticker = self.price_cache.get(product_id)
+        if ticker and ticker['best_bid'] and ticker['best_ask']:
+            return {
+                'bid': ticker['best_bid'],
+                'bid_size': ticker['best_bid_size'],
+                'ask': ticker['best_ask'],
+                'ask_size': ticker['best_ask_size']
+            }
+        return None
+    
+    def get_candles(self, product_id: str) -> List[Dict[str, Any]]:
+        """Get closed 1m candles for a product, oldest first"""
+        return list(self.candles.get(product_id, []))
+    
+    def get_market_state(self) -> Dict[str, Any]:
+        """Serializable market state for warm restarts (see utils/market_snapshot.py)"""
+        return {
+            'price_cache': dict(self.price_cache),
+            'order_books': {pid: book.to_dict() for pid, book in dict(self.order_books).items()},
+            'trades': {pid: list(trades) for pid, trades in dict(self.trades).items()},
+            'candles': {pid: list(candles) for pid, candles in dict(self.candles).items()},
+            'open_candles': {pid: dict(c) for pid, c in dict(self.open_candles).items()}
+        }
+    
+    def load_market_state(self, state: Dict[str, Any], now: Optional[float] = None):
+        """
+        Restore get_market_state output; live messages overwrite it as they arrive.
+        Open candles whose minute has already ended are dropped: they missed trades and
+        would overwrite complete stored bars when closed.
+        """
+        self.price_cache.update(state.get('price_cache', {}))
+        for product_id, book in state.get('order_books', {}).items():
+            self.order_books[product_id] = OrderBook.from_dict(book)
+        for product_id, trades in state.get('trades', {}).items():
+            self.trades[product_id] = deque((tuple(t) for t in trades), maxlen=MAX_TRADES)
+        for product_id, candles in state.get('candles', {}).items():
+            self.candles[product_id] = deque(candles, maxlen=MAX_CANDLES)
+        now = now if now is not None else time.time()
+        for product_id, candle in state.get('open_candles', {}).items():
+            if candle['start'] + CANDLE_SECONDS > now:
+                self.open_candles[product_id] = candle
+    
+    def _run_compressed(self, connect_compressed):
+        """Receive loop for permessage-deflate connections (websockets sync client)"""
+        conn = None
+        try:
+            conn = connect_compressed(self.url, self.telemetry)
+            self.ws = conn
+            self.compressed = bool(conn.protocol.extensions)
+            if not self.compressed:
+                log_trade('websocket', 'warning', "Server declined permessage-deflate")
+            self.on_open(conn)
+            for message in conn:
+                self.on_message(conn, message)
+        except Exception as e:
+            self.on_error(conn, e)
+        finally:
+            self.compressed = False
+            close_code = getattr(conn, 'close_code', None) if conn else None
+            close_reason = getattr(conn, 'close_reason', None) if conn else None
+            self.on_close(conn, close_code, close_reason)
+    
     def connect(self):
         """Connect to WebSocket"""
         self.running = True
         
+        if self.compression:
+            try:
+                from utils.ws_compression import connect_compressed
+            except ImportError:
+                log_trade('websocket', 'warning', "websockets package not installed - connecting uncompressed")
+            else:
+                wst = threading.Thread(target=self._run_compressed, args=(connect_compressed,))
+                wst.daemon = True
+                wst.start()
+                log_trade('websocket', 'info', "WebSocket thread started (permessage-deflate)")
+                return
+        
         websocket.enableTrace(False)  # Disable debug output
         
         self.ws = websocket.WebSocketApp(
@@ -155,30 +434,140 @@ class CoinbaseWebSocket:
             self.ws.close()
             log_trade('websocket', 'info', "WebSocket disconnected")
     
+    @property
+    def products(self) -> List[str]:
+        """Products with at least one reference"""
+        return [p for p, refs in self.product_refs.items() if refs > 0]
+    
+    def _send_subscription(self, msg_type: str, products: List[str]):
+        """Send a subscribe/unsubscribe message if the socket is open"""
+        if not products or not (self.ws and self.connected):
+            return  # on_open subscribes to the current set
+        message = {
+            "type": msg_type,
+            "product_ids": products,
+            "channels": self.channels
+        }
+        self.ws.send(json.dumps(message))
+        log_trade('websocket', 'info', f"{msg_type.capitalize()}d {products}")
+    
+    def acquire_products(self, products: List[str]) -> List[str]:
+        """
+        Take a reference on products (BTC/USD or BTC-USD format).
+        Returns the products that were newly subscribed.
+        """
+        added = []
+        with self.subscription_lock:
+            for product_id in dict.fromkeys(p.replace('/', '-') for p in products):
+                refs = self.product_refs.get(product_id, 0)
+                self.product_refs[product_id] = refs + 1
+                if refs == 0:
+                    added.append(product_id)
+            self._send_subscription('subscribe', added)
+        return added
+    
+    def release_products(self, products: List[str]) -> List[str]:
+        """
+        Drop a reference on products.
+        Returns the products that were unsubscribed because nothing needs them.
+        """
+        removed = []
+        with self.subscription_lock:
+            for product_id in dict.fromkeys(p.replace('/', '-') for p in products):
+                refs = self.product_refs.get(product_id, 0)
+                if refs <= 1:
+                    self.product_refs.pop(product_id, None)
+                    if refs == 1:
+                        removed.append(product_id)
+                else:
+                    self.product_refs[product_id] = refs - 1
+            self._send_subscription('unsubscribe', removed)
+        
+        # Nothing for these products is kept current once unsubscribed
+        for product_id in removed:
+            self.order_books.pop(product_id, None)
+            self.open_candles.pop(product_id, None)
+            self.price_cache.pop(product_id, None)
+            self.trades.pop(product_id, None)
+            self.telemetry.forget(product_id)
+        return removed
+    
     def add_products(self, products: List[str]):
         """Add products to subscription"""
-        if self.ws and self.running:
-            subscribe_message = {
-                "type": "subscribe",
-                "product_ids": products,
-                "channels": self.channels
-            }
-            self.ws.send(json.dumps(subscribe_message))
-            self.products.extend(products)
+        self.acquire_products(products)
 
-# Global WebSocket instance
-coinbase_ws = CoinbaseWebSocket()
+def parse_exchange_time(value: Optional[str]) -> Optional[float]:
+    """Convert a Coinbase ISO-8601 timestamp to epoch seconds"""
+    if not value:
+        return None
+    try:
+        return datetime.fromisoformat(value.replace('Z', '+00:00')).timestamp()
+    except ValueError:
+        return None
+
+# Global WebSocket instance - subscriptions come from running bots
+coinbase_ws = CoinbaseWebSocket(products=[])
 
-def start_websocket():
+def start_websocket(publish_board: bool = True):
     """Start the global WebSocket connection"""
+    if os.getenv('COINBASE_WS_COMPRESSION', '').lower() in ('1', 'true', 'yes'):
+        coinbase_ws.compression = True
+    if publish_board and not coinbase_ws.price_board:
+        try:
+            from utils.price_board import PriceBoard
+            coinbase_ws.attach_price_board(PriceBoard(create=True))
+        except Exception as e:
+            log_trade('websocket', 'warning', f"Shared price board unavailable: {str(e)}")
     coinbase_ws.connect()
 
 def stop_websocket():
     """Stop the global WebSocket connection"""
     coinbase_ws.disconnect()
+    if coinbase_ws.price_board:
+        coinbase_ws.price_board.unlink()
+        coinbase_ws.price_board.close()
+        coinbase_ws.price_board = None
+
+def _read_realtime(product_id: str, max_age: float = DEFAULT_MAX_AGE,
+                   max_lag: float = DEFAULT_MAX_LAG) -> tuple:
+    """
+    (price, fresh) from the first fresh source: this process's WebSocket, the shared
+    price board, then the Redis market data bus. With none fresh, the first stale price
+    found is returned with fresh=False (e.g. a restored snapshot before the feed runs).
+    """
+    stale = (None, False)
+    price = coinbase_ws.get_price(product_id)
+    if price is not None:
+        if coinbase_ws.connected and not coinbase_ws.telemetry.is_stale(product_id, max_age, max_lag):
+            return price, True
+        stale = (price, False)
+    
+    from utils.price_board import get_price_board
+    board = get_price_board()
+    ticker = board.read(product_id) if board else None
+    if ticker:
+        # Board ts is the exchange time of the ticker, so its age includes feed lag
+        if time.time() - ticker['time'] <= max_age:
+            return ticker['price'], True
+        if stale[0] is None:
+            stale = (ticker['price'], False)
+    
+    from utils import market_data_bus
+    subscriber = market_data_bus.subscriber
+    price = subscriber.get_price(product_id) if subscriber else None
+    if price is not None:
+        if subscriber.is_fresh(product_id, max_age):
+            return price, True
+        if stale[0] is None:
+            stale = (price, False)
+    return stale
+
+def is_feed_fresh(symbol: str, max_age: float = DEFAULT_MAX_AGE,
+                  max_lag: float = DEFAULT_MAX_LAG) -> bool:
+    """Staleness guard: True if the source get_realtime_price reads for symbol is recent enough to trade on"""
+    return _read_realtime(symbol.replace('/', '-'), max_age, max_lag)[1]
 
 def get_realtime_price(symbol: str) -> Optional[float]:
-    """Get real-time price from WebSocket"""
+    """Get real-time price from WebSocket, the shared price board or the Redis market data bus"""
     # Convert symbol format (BTC/USD -> BTC-USD)
-    product_id = symbol.replace('/', '-')
-    return coinbase_ws.get_price(product_id) 
\ No newline at end of file
+    return _read_realtime(symbol.replace('/', '-'))[0]
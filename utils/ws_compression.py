@@ -0,0 +1,64 @@
+"""
+Metered permessage-deflate (RFC 7692) for the Coinbase WebSocket feed
+websocket-client can't negotiate compression, so compressed connections use the
+`websockets` sync client with a deflate extension that reports wire bytes,
+decoded bytes and decompression CPU time to FeedTelemetry.
+"""
+import time
+from typing import Sequence
+
+from websockets.extensions.base import Extension, ClientExtensionFactory
+from websockets.extensions.permessage_deflate import ClientPerMessageDeflateFactory
+from websockets.frames import DATA_OPCODES
+from websockets.sync.client import connect
+
+
+class MeteredExtension(Extension):
+    """Wraps a negotiated extension and measures what decode() does"""
+
+    def __init__(self, inner: Extension, telemetry):
+        self.inner = inner
+        self.name = inner.name
+        self.telemetry = telemetry
+
+    def decode(self, frame, *, max_size=None):
+        """Decode an incoming frame, recording compressed vs decoded size"""
+        if frame.opcode not in DATA_OPCODES:
+            return self.inner.decode(frame, max_size=max_size)
+        start = time.thread_time()
+        decoded = self.inner.decode(frame, max_size=max_size)
+        self.telemetry.record_bytes(len(frame.data), len(decoded.data), time.thread_time() - start)
+        return decoded
+
+    def encode(self, frame):
+        """Encode an outgoing frame (subscribe messages only - not metered)"""
+        return self.inner.encode(frame)
+
+
+class MeteredDeflateFactory(ClientExtensionFactory):
+    """permessage-deflate offer whose negotiated extension is metered"""
+
+    name = ClientPerMessageDeflateFactory.name
+
+    def __init__(self, telemetry, **deflate_params):
+        self.inner = ClientPerMessageDeflateFactory(**deflate_params)
+        self.telemetry = telemetry
+
+    def get_request_params(self):
+        """Same offer as the stock factory"""
+        return self.inner.get_request_params()
+
+    def process_response_params(self, params, accepted_extensions: Sequence[Extension]):
+        """Accept the server's parameters and wrap the resulting extension"""
+        return MeteredExtension(self.inner.process_response_params(params, accepted_extensions),
+                                self.telemetry)
+
+
+def connect_compressed(url: str, telemetry, max_size: int = 2 ** 24):
+    """Open a sync WebSocket connection offering metered permessage-deflate"""
+    return connect(
+        url,
+        extensions=[MeteredDeflateFactory(telemetry)],
+        compression=None,  # Our factory replaces the default deflate offer
+        max_size=max_size
+    )